@@ -0,0 +1,111 @@
+"""
+Latency of cheap endpoints while other users abuse expensive ones.
+
+In a throwaway database, ``--abusers`` threads, four per abusive user, keep
+downloading CSV exports and ``limit=all`` listings of ``--rows`` transactions,
+without waiting for a 429's Retry-After. Meanwhile one normal user loads
+``/api/auth/check`` and a 50-row transaction list in a loop. Runs with
+``ADMISSION_CONTROL=0`` and then with admission control on
+(src/services/admission.py). Each run is a fresh process. Reports the
+normal user's latencies, and how many of the abusers' requests were served
+and how many were refused with a 429.
+
+    python benchmarks/bench_admission.py [--abusers 8] [--seconds 30] [--rows 5000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def signup(app, name, rows):
+    client = app.test_client()
+    response = client.post('/api/auth/signup', json={'username': name, 'email': f'{name}@example.com', 'password': 'bench-password'})
+    assert response.status_code == 201, response.get_data(as_text=True)
+    if rows:
+        assert client.post('/api/transactions/bulk', json=[
+            {'amount': '5.00', 'transaction_type': 'expense', 'category_id': 1 + i % 6, 'description': f'row {i}',
+             'date': f'2025-{1 + i % 12:02d}-{1 + i % 28:02d}'} for i in range(rows)]).status_code == 201
+    return client
+
+
+def abuser(client, stop, served, refused):
+    urls = ('/api/transactions/download/csv', '/api/transactions?limit=all')
+    i = 0
+    while not stop.is_set():
+        response = client.get(urls[i % 2])
+        (refused if response.status_code == 429 else served).append(response.status_code)
+        i += 1
+
+
+def normal_user(client, stop, latencies):
+    urls = ('/api/auth/check', '/api/transactions?limit=50')
+    i = 0
+    while not stop.is_set():
+        url = urls[i % 2]
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies[url].append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+        i += 1
+
+
+def run(admission, abusers, seconds, rows):
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'app.db')}", SHARD_COUNT='0', PURGE_WORKER='0',
+                      PASSWORD_HASH_WORKERS='0', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000', ADMISSION_CONTROL=admission)
+    from src.main import app
+
+    normal = signup(app, 'normal', 200)
+    abuser_clients = [signup(app, f'abuser-{i}', rows) for i in range((abusers + 3) // 4)]
+
+    stop = threading.Event()
+    latencies = {'/api/auth/check': [], '/api/transactions?limit=50': []}
+    served, refused = [], []
+    threads = [threading.Thread(target=abuser, args=(abuser_clients[i // 4], stop, served, refused)) for i in range(abusers)]
+    threads.append(threading.Thread(target=normal_user, args=(normal, stop, latencies)))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    label = 'on' if admission == '1' else 'off'
+    for url, values in latencies.items():
+        print(f'{label:>9}  {url:<28}{len(values) / seconds:>7.1f}/s{percentile(values, 50) * 1000:>9.1f}ms'
+              f'{percentile(values, 99) * 1000:>9.1f}ms')
+    print(f'{label:>9}  {"abusers":<28}{len(served) / seconds:>7.1f}/s served, {len(refused) / seconds:.1f}/s refused')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--abusers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--single', choices=('0', '1'), help=argparse.SUPPRESS)  # one run, in this process
+    args = parser.parse_args()
+
+    if args.single is not None:
+        run(args.single, args.abusers, args.seconds, args.rows)
+        return
+    print(f'abuser threads: {args.abusers}  rows per abuser: {args.rows:,}  {args.seconds:.0f}s per run')
+    print(f"{'admission':>9}  {'':<28}{'rate':>9}{'p50':>11}{'p99':>11}")
+    for admission in ('0', '1'):
+        subprocess.run([sys.executable, __file__, '--single', admission, '--abusers', str(args.abusers),
+                        '--seconds', str(args.seconds), '--rows', str(args.rows)], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Anomaly detection cost for one user with many expenses.
+
+Times the vectorized scans in src/services/anomalies.py on synthetic
+columns, and, with --load, the one-off column query against a throwaway
+SQLite file (paid once per data version, then cached).
+
+    python benchmarks/bench_anomalies.py [--rows 1000000] [--categories 12] [--load]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.anomalies import _EXPENSE_COLUMNS_SQL, flag_months, flag_transactions, rows_to_columns  # noqa: E402
+
+
+def synthetic_columns(rows, categories, years=5, seed=7):
+    rng = np.random.default_rng(seed)
+    category = np.sort(rng.integers(-1, categories, rows))
+    month = np.empty(rows, dtype=np.int64)
+    for c in np.unique(category):  # dates ascend within each category, like the real query
+        mask = category == c
+        month[mask] = np.sort(rng.integers(2020 * 12, (2020 + years) * 12, mask.sum()))
+    amount = rng.lognormal(7, 0.6, rows).astype(np.int64) + 1
+    amount[rng.integers(0, rows, rows // 1000)] *= 10  # a few outliers
+    return np.arange(1, rows + 1), amount, category, month
+
+
+def best_of(runs, fn):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def bench_load(ids, amounts, categories, months):
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        conn.execute('CREATE TABLE "transaction" (id INTEGER PRIMARY KEY, user_id INTEGER, amount_minor INTEGER, '
+                     'category_id INTEGER, transaction_type TEXT, date DATE)')
+        conn.execute('CREATE INDEX ix_transaction_user_date ON "transaction" (user_id, date)')
+        conn.execute('CREATE TABLE transaction_archive (id INTEGER, user_id INTEGER, amount_minor INTEGER, '
+                     'category_id INTEGER, transaction_type TEXT, date DATE, PRIMARY KEY (user_id, date, id)) WITHOUT ROWID')
+        dates = [f'{m // 12:04d}-{m % 12 + 1:02d}-15' for m in months.tolist()]
+        conn.executemany('INSERT INTO "transaction" VALUES (?, 1, ?, ?, \'expense\', ?)',
+                         zip(ids.tolist(), amounts.tolist(), [c if c >= 0 else None for c in categories.tolist()], dates))
+        conn.commit()
+        sql = str(_EXPENSE_COLUMNS_SQL).replace(':user_id', '1')
+        seconds, _ = best_of(1, lambda: rows_to_columns(conn.execute(sql).fetchall()))
+        conn.close()
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=12)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--load', action='store_true', help='also time the column query against SQLite')
+    args = parser.parse_args()
+
+    ids, amounts, categories, months = synthetic_columns(args.rows, args.categories)
+    tx_seconds, (flagged, _) = best_of(args.runs, lambda: flag_transactions(amounts, categories, 5.0))
+    month_seconds, flagged_months = best_of(args.runs, lambda: flag_months(amounts, categories, months, 3.0, 6))
+
+    print(f'rows: {args.rows:,}  categories: {args.categories}')
+    print(f'transactions scan: {tx_seconds * 1000:8.1f} ms  ({len(flagged)} flagged)')
+    print(f'months scan:       {month_seconds * 1000:8.1f} ms  ({len(flagged_months)} flagged)')
+    print(f'total compute:     {(tx_seconds + month_seconds) * 1000:8.1f} ms')
+    if args.load:
+        print(f'column load:       {bench_load(ids, amounts, categories, months) * 1000:8.1f} ms  (once per data version)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Open connections and list latency, WSGI mode against the async mode.
+
+Both modes run under uvicorn with ``--threads`` threads for Flask requests.
+In ``wsgi`` mode the whole Flask app runs on those threads (a2wsgi), like a
+threaded WSGI server. In ``async`` mode it is src/asgi.py's app, which serves
+the event stream and transaction list on the event loop. For each
+``--streams`` count, that many live update streams are opened and held
+while ``--clients`` clients load the transaction list (``--rows``
+transactions per user) for ``--seconds``. Each mode runs in a fresh server
+process. Reports streams held, list requests per second, p50/p99, and list
+requests that failed or timed out after ``--timeout`` seconds.
+
+    python benchmarks/bench_asgi.py [--streams 0 50 500] [--clients 8] [--threads 10] [--seconds 10] [--rows 500]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float('nan')
+
+
+def serve(mode, port, threads):
+    import uvicorn
+    if mode == 'async':
+        from src.asgi import app
+    else:
+        from a2wsgi import WSGIMiddleware
+        from src.main import app as flask_app
+        app = WSGIMiddleware(flask_app, workers=threads)
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='error', timeout_keep_alive=60)
+
+
+async def signup(httpx, base, name, rows):
+    client = httpx.AsyncClient(base_url=base, timeout=60, limits=httpx.Limits(max_connections=None))
+    response = await client.post('/api/auth/signup', json={'username': name, 'email': f'{name}@example.com',
+                                                           'password': 'bench-password'})
+    assert response.status_code == 201, response.text
+    if rows:
+        response = await client.post('/api/transactions/bulk', json=[
+            {'amount': '5.00', 'transaction_type': 'expense', 'category_id': 1 + i % 6, 'description': f'row {i}',
+             'date': f'2026-{1 + i % 6:02d}-{1 + i % 28:02d}'} for i in range(rows)])
+        assert response.status_code == 201, response.text
+    return client
+
+
+async def hold_stream(client, opened, stop):
+    try:
+        async with client.stream('GET', '/api/events/stream') as response:
+            if response.status_code != 200:
+                return
+            async for _ in response.aiter_lines():
+                opened.append(1)
+                break
+            await stop.wait()
+    except Exception:
+        pass  # counted as not held
+
+
+async def list_transactions(client, stop, timeout, latencies, errors):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = await client.get('/api/transactions?limit=50', timeout=timeout)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+                continue
+        except Exception:
+            errors.append('timeout')
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def measure(base, streams, clients, seconds, rows, timeout):
+    import httpx
+    streamer = await signup(httpx, base, 'streamer', 0)
+    readers = [await signup(httpx, base, f'reader-{i}', rows) for i in range(clients)]
+
+    stop = asyncio.Event()
+    opened = []
+    holders = [asyncio.ensure_future(hold_stream(streamer, opened, stop)) for _ in range(streams)]
+    deadline = time.monotonic() + timeout
+    while len(opened) < streams and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+
+    latencies, errors = [], []
+    loops = [asyncio.ensure_future(list_transactions(client, stop, timeout, latencies, errors)) for client in readers]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*loops)
+    for holder in holders:
+        holder.cancel()  # streams still waiting for a thread never get a response
+    await asyncio.gather(*holders, return_exceptions=True)
+    return len(opened), latencies, errors
+
+
+def run(mode, streams, clients, threads, seconds, rows, timeout):
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'app.db')}", SHARD_COUNT='0', PURGE_WORKER='0',
+               PASSWORD_HASH_WORKERS='0', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000', PDF_RENDER_WORKERS='0',
+               ASGI_WSGI_THREADS=str(threads))
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen([sys.executable, __file__, '--serve', mode, '--port', str(port), '--threads', str(threads)],
+                              env=env, cwd=ROOT)
+    try:
+        for _ in range(300):
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        held, latencies, errors = asyncio.run(measure(f'http://127.0.0.1:{port}', streams, clients, seconds, rows, timeout))
+    finally:
+        server.kill()  # uvicorn would wait for the open streams to end before exiting on SIGTERM
+        server.wait()
+    print(f'{mode:>8}{streams:>8}{held:>7}{len(latencies) / seconds:>9.1f}/s{percentile(latencies, 50) * 1000:>8.1f}ms'
+          f'{percentile(latencies, 99) * 1000:>8.1f}ms{len(errors):>8}', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--streams', type=int, nargs='+', default=[0, 50, 500])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=10)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--timeout', type=float, default=5)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--serve', choices=('wsgi', 'async'), help=argparse.SUPPRESS)  # the server process
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.threads)
+        return
+    print(f'threads: {args.threads}  list clients: {args.clients}  rows per client: {args.rows:,}  '
+          f'{args.seconds:.0f}s per run  timeout: {args.timeout:.0f}s')
+    print(f"{'mode':>8}{'streams':>8}{'held':>7}{'lists':>11}{'p50':>10}{'p99':>10}{'failed':>8}")
+    for streams in args.streams:
+        for mode in ('wsgi', 'async'):
+            run(mode, streams, args.clients, args.threads, args.seconds, args.rows, args.timeout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Request latency while an online backup runs.
+
+Fills a throwaway database with ``--rows`` transactions of other users, then for
+``--seconds`` issues a mix of writes and reads through the app: once with no
+backup running, then while another process takes backups in a loop, once for
+each ``--pages`` setting (-1 copies the whole file in one step). The app runs
+in WAL mode; ``--journal-mode delete`` shows the rollback-journal behaviour,
+where every backup is a single step that holds off writers for the whole copy.
+
+    python benchmarks/bench_backup.py [--rows 300000] [--seconds 10] [--pages -1 256 64] [--journal-mode wal]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BACKUP_LOOP = r'''
+import sys, time
+from src.services.backup import create_backup
+db_path, backup_dir, pages = sys.argv[1], sys.argv[2], int(sys.argv[3])
+while True:
+    started = time.monotonic()
+    create_backup([db_path], backup_dir, pages_per_step=pages, verify=False, keep=1, log=lambda _: None)
+    print(f'{time.monotonic() - started:.3f}', flush=True)
+'''
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def measure(client, seconds):
+    latencies = []
+    body = {'amount': '12.34', 'transaction_type': 'expense', 'category_id': 1, 'description': 'bench', 'date': '2026-01-15'}
+    stop = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < stop:
+        started = time.perf_counter()
+        if i % 2:
+            client.post('/api/transactions', json=body)
+        else:
+            client.get('/api/transactions?limit=20')
+        latencies.append(time.perf_counter() - started)
+        i += 1
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--pages', type=int, nargs='+', default=[-1, 256, 64])
+    parser.add_argument('--journal-mode', choices=['wal', 'delete'], default='wal')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.join(tmp, 'app.db')
+    os.environ.update(DATABASE_URL=f'sqlite:///{db_path}', SHARD_COUNT='0',
+                      PASSWORD_HASH_WORKERS='0', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    from src.main import app
+    from src.extensions import db
+
+    client = app.test_client()
+    client.post('/api/auth/signup', json={'username': 'bench', 'email': 'bench@example.com', 'password': 'bench-password'})
+    rng = random.Random(5)
+    with app.app_context():
+        db.engine.dispose()  # leaving WAL mode needs the only connection
+    conn = sqlite3.connect(db_path)
+    conn.execute(f'PRAGMA journal_mode={args.journal_mode}')
+    # Bulk rows belong to other users, so the measured requests stay cheap and only the backup varies.
+    conn.executemany(
+        'INSERT INTO "transaction" (user_id, amount_minor, description, transaction_type, date, created_at, category_id) '
+        "VALUES (?, ?, ?, 'expense', ?, '2026-01-01 12:00:00.000000', 1)",
+        ((rng.randint(2, 1000), rng.randint(100, 500_000), f'merchant {rng.randint(1, 5000)} {rng.random()}', f'20{rng.randint(18, 25)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}')
+         for _ in range(args.rows)))
+    conn.commit()
+    conn.close()
+    print(f'database: {os.path.getsize(db_path) / 1e6:.0f} MB, {args.journal_mode} mode, {args.seconds:g}s per run')
+    print(f"{'backup':>14}{'requests':>10}{'p50':>9}{'p99':>9}{'max':>9}{'backups':>9}")
+
+    runs = [None] + args.pages
+    for pages in runs:
+        loop = None
+        if pages is not None:
+            loop = subprocess.Popen([sys.executable, '-c', BACKUP_LOOP, db_path, os.path.join(tmp, 'backups'), str(pages)],
+                                    cwd=ROOT, stdout=subprocess.PIPE, text=True)
+            time.sleep(0.5)
+        latencies = measure(client, args.seconds)
+        completed = ''
+        if loop is not None:
+            loop.terminate()
+            completed = len(loop.communicate()[0].split())
+        label = 'none' if pages is None else ('whole file' if pages < 0 else f'{pages} pages')
+        print(f'{label:>14}{len(latencies):>10}{percentile(latencies, 50) * 1000:>7.1f}ms'
+              f'{percentile(latencies, 99) * 1000:>7.1f}ms{max(latencies) * 1000:>7.0f}ms{completed:>9}')
+
+
+if __name__ == '__main__':
+    main()
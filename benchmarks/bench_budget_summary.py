@@ -0,0 +1,113 @@
+"""
+Budget summary latency as a user's budget count grows.
+
+Fills a throwaway database with ``--rows`` expenses of one user spread over
+``--categories`` categories and two years, then for each ``--budgets`` count
+creates that many weekly, monthly and yearly budgets overlapping one month
+and times the month's summary: the single-pass evaluator in
+src/services/budget_summary.py against one SUM query per budget.
+
+    python benchmarks/bench_budget_summary.py [--rows 200000] [--categories 200] [--budgets 10 50 100 200 400]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MONTH = date(2026, 3, 1)
+WEEKS = [date(2026, 2, 23) + timedelta(weeks=i) for i in range(6)]  # every week that overlaps the month
+
+
+def best_of(runs, fn):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def budget_rows(count, categories):
+    """``count`` budgets overlapping MONTH: per category a monthly, a yearly and weekly ones, until enough."""
+    rows = []
+    for category_id in categories:
+        rows.append((category_id, 'monthly', MONTH))
+        rows.append((category_id, 'yearly', date(2026, 1, 1)))
+        rows.extend((category_id, 'weekly', week) for week in WEEKS)
+        if len(rows) >= count:
+            break
+    return rows[:count]
+
+
+def per_budget_query(db, Budget, Transaction, user_id):
+    """The straightforward alternative: one SUM over the budget's window for every budget."""
+    from sqlalchemy import func
+    totals = {}
+    budgets = Budget.query.filter(Budget.user_id == user_id).all()
+    for budget in budgets:
+        totals[budget.id] = db.session.query(func.coalesce(func.sum(Transaction.amount_minor), 0)).filter(
+            Transaction.user_id == user_id,
+            Transaction.category_id == budget.category_id,
+            Transaction.transaction_type == 'expense',
+            Transaction.date >= budget.budget_month,
+            Transaction.date < budget.period_end,
+        ).scalar()
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--categories', type=int, default=200)
+    parser.add_argument('--budgets', type=int, nargs='+', default=[10, 50, 100, 200, 400])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.join(tmp, 'app.db')
+    os.environ.update(DATABASE_URL=f'sqlite:///{db_path}', SHARD_COUNT='0',
+                      PASSWORD_HASH_WORKERS='0', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    from src.main import app
+    from src.extensions import db
+    from src.models.budget import Budget
+    from src.models.transaction import Transaction
+    from src.services.budget_summary import build_month_summary
+
+    client = app.test_client()
+    client.post('/api/auth/signup', json={'username': 'bench', 'email': 'bench@example.com', 'password': 'bench-password'})
+    rng = random.Random(11)
+    conn = sqlite3.connect(db_path)
+    conn.executemany('INSERT INTO category (name) VALUES (?)', ((f'bench {i}',) for i in range(args.categories)))
+    categories = [row[0] for row in conn.execute('SELECT id FROM category ORDER BY id')][:args.categories]
+    conn.executemany(
+        'INSERT INTO "transaction" (user_id, amount_minor, description, transaction_type, date, created_at, category_id) '
+        "VALUES (1, ?, 'bench', 'expense', ?, '2026-01-01 12:00:00.000000', ?)",
+        ((rng.randint(100, 50_000), (date(2024, 4, 1) + timedelta(days=rng.randint(0, 729))).isoformat(), rng.choice(categories))
+         for _ in range(args.rows)))
+    conn.commit()
+    print(f'rows: {args.rows:,}  categories: {len(categories)}  month: {MONTH:%Y-%m}')
+    print(f"{'budgets':>8}{'single pass':>14}{'per budget':>13}")
+
+    for count in args.budgets:
+        conn.execute('DELETE FROM budget')
+        conn.executemany('INSERT INTO budget (user_id, category_id, amount_minor, period, budget_month) VALUES (1, ?, 100000, ?, ?)',
+                         ((c, period, start.isoformat()) for c, period, start in budget_rows(count, categories)))
+        conn.commit()
+        with app.app_context():
+            summary = build_month_summary(1, MONTH.year, MONTH.month)
+            assert len(summary) == count
+            single = best_of(args.runs, lambda: build_month_summary(1, MONTH.year, MONTH.month))
+            naive = best_of(args.runs, lambda: per_budget_query(db, Budget, Transaction, 1))
+        print(f'{count:>8}{single * 1000:>12.1f}ms{naive * 1000:>11.1f}ms')
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
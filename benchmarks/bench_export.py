@@ -0,0 +1,76 @@
+"""
+CSV vs. Parquet vs. Arrow IPC transaction exports for one large history.
+
+Creates a throwaway database with ``--rows`` transactions for one user and
+times each export endpoint through the app (producing the file) and the
+matching reader (parsing it back into columns). Requires pyarrow.
+
+    python benchmarks/bench_export.py [--rows 200000]
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def parse_csv(data):
+    rows = list(csv.reader(io.StringIO(data.decode())))
+    return rows[1:rows.index([])]  # drop the header and the summary block
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200_000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'app.db')}", SHARD_COUNT='0',
+                      PASSWORD_HASH_WORKERS='0', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    import pyarrow.ipc
+    import pyarrow.parquet
+    from src.main import app
+
+    client = app.test_client()
+    client.post('/api/auth/signup', json={'username': 'bench', 'email': 'bench@example.com', 'password': 'bench-password'})
+    rng = random.Random(3)
+    start = date(2018, 1, 1)
+    conn = sqlite3.connect(os.path.join(tmp, 'app.db'))
+    conn.executemany(
+        'INSERT INTO "transaction" (user_id, amount_minor, description, transaction_type, date, created_at, category_id) '
+        'VALUES (1, ?, ?, ?, ?, ?, ?)',
+        ((rng.randint(100, 500_000), f'merchant {rng.randint(1, 500)}', rng.choice(('income', 'expense', 'expense')),
+          (start + timedelta(days=rng.randint(0, 3000))).isoformat(), '2026-01-01 12:00:00.000000', rng.randint(1, 8))
+         for _ in range(args.rows)))
+    conn.commit()
+    conn.close()
+
+    readers = {
+        'csv': parse_csv,
+        'parquet': lambda data: pyarrow.parquet.read_table(pyarrow.BufferReader(data)),
+        'arrow': lambda data: pyarrow.ipc.open_stream(data).read_all(),
+    }
+    print(f'{args.rows:,} transactions')
+    print(f"{'format':>8}{'size':>12}{'produce':>12}{'parse':>12}")
+    for fmt, reader in readers.items():
+        produce, data = timed(lambda: client.get(f'/api/transactions/download/{fmt}').data)
+        parse, _ = timed(lambda: reader(data))
+        print(f'{fmt:>8}{len(data) / 1e6:>10.1f}MB{produce * 1000:>10.0f}ms{parse * 1000:>10.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Writes per second and write latency, with and without group commit.
+
+In a throwaway database, ``--clients`` threads, one per user, each create
+transactions one request at a time for ``--seconds``. Runs with
+``GROUP_COMMIT=0`` (each request commits its own write) and then with group
+commit on (src/services/group_commit.py) for each ``--delays`` value of
+``GROUP_COMMIT_MAX_DELAY_MS``. Each run is a fresh process. Reports writes
+per second, p50/p99 latency of the successful writes, the average number
+of writes per commit, and how many writes failed.
+
+    python benchmarks/bench_group_commit.py [--clients 1 16 64] [--delays 0 2 10] [--seconds 10]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def signup(app, name):
+    client = app.test_client()
+    response = client.post('/api/auth/signup', json={'username': name, 'email': f'{name}@example.com', 'password': 'bench-password'})
+    assert response.status_code == 201, response.get_data(as_text=True)
+    return client
+
+
+def writer(client, stop, latencies, failed):
+    i = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.post('/api/transactions', json={
+            'amount': '5.00', 'transaction_type': 'expense', 'category_id': 1 + i % 6, 'description': f'row {i}',
+            'date': f'2026-{1 + i % 12:02d}-{1 + i % 28:02d}'})
+        if response.status_code == 201:
+            latencies.append(time.perf_counter() - started)
+        else:
+            failed.append(response.status_code)  # e.g. the write lock wasn't free within the busy timeout
+        i += 1
+
+
+def run(delay, clients, seconds):
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'app.db')}", SHARD_COUNT='0', PURGE_WORKER='0',
+                      PASSWORD_HASH_WORKERS='0', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000', ADMISSION_CONTROL='0',
+                      GROUP_COMMIT='0' if delay == 'off' else '1', GROUP_COMMIT_MAX_DELAY_MS='0' if delay == 'off' else delay)
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from src.main import app
+
+    commits = []
+    event.listen(Session, 'after_commit', lambda session: commits.append(1))
+    users = [signup(app, f'writer-{i}') for i in range(clients)]
+    commits.clear()
+
+    stop = threading.Event()
+    latencies, failed = [[] for _ in users], []
+    threads = [threading.Thread(target=writer, args=(client, stop, values, failed))
+               for client, values in zip(users, latencies)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies = [value for values in latencies for value in values]
+    per_commit = len(latencies) / max(len(commits), 1)
+    label = 'off' if delay == 'off' else f'{delay}ms'
+    print(f'{label:>8}{clients:>9}{len(latencies) / seconds:>10.1f}/s{percentile(latencies, 50) * 1000:>9.1f}ms'
+          f'{percentile(latencies, 99) * 1000:>9.1f}ms{per_commit:>11.1f}{len(failed):>8}', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--delays', nargs='+', default=['0', '2', '10'])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--single', help=argparse.SUPPRESS)  # one run, in this process: 'off' or a delay
+    args = parser.parse_args()
+
+    if args.single is not None:
+        run(args.single, args.clients[0], args.seconds)
+        return
+    print(f'{args.seconds:.0f}s per run')
+    print(f"{'group':>8}{'clients':>9}{'writes':>12}{'p50':>11}{'p99':>11}{'per commit':>11}{'failed':>8}")
+    for clients in args.clients:
+        for delay in ['off'] + args.delays:
+            subprocess.run([sys.executable, __file__, '--single', delay, '--clients', str(clients),
+                            '--seconds', str(args.seconds)], check=True)
+
+
+if __name__ == '__main__':
+    main()
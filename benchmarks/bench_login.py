@@ -0,0 +1,111 @@
+"""
+Login throughput vs. latency of other routes, with and without the hashing pool.
+
+Runs the app on a threaded local server against a throwaway database. A set
+of threads log in as fast as they can while another set polls
+``/api/auth/check``; we report logins/s and p50/p99 of the check calls. Each
+mode runs in a fresh interpreter so the app picks up its own config.
+
+    python benchmarks/bench_login.py [--seconds 10] [--login-threads 16]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = r'''
+import http.cookiejar, json, statistics, sys, threading, time, urllib.request
+from werkzeug.serving import WSGIRequestHandler, make_server
+from src.main import app
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+seconds, login_threads, check_threads = float(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f'http://127.0.0.1:{server.server_port}'
+
+def client():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+def post(opener, path, body):
+    req = urllib.request.Request(base + path, json.dumps(body).encode(), {'Content-Type': 'application/json'})
+    try:
+        return opener.open(req).status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+creds = {'username': 'bench', 'password': 'bench-password'}
+post(client(), '/api/auth/signup', dict(creds, email='bench@example.com'))
+checker = client()
+post(checker, '/api/auth/login', creds)
+
+stop = time.monotonic() + seconds
+logins, rejected, latencies = [0], [0], []
+lock = threading.Lock()
+
+def login_loop():
+    opener = client()
+    while time.monotonic() < stop:
+        status = post(opener, '/api/auth/login', creds)
+        with lock:
+            if status == 200:
+                logins[0] += 1
+            elif status == 503:
+                rejected[0] += 1
+                time.sleep(0.05)
+
+def check_loop():
+    while time.monotonic() < stop:
+        started = time.perf_counter()
+        checker.open(base + '/api/auth/check').read()
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+threads = [threading.Thread(target=login_loop) for _ in range(login_threads)]
+threads += [threading.Thread(target=check_loop) for _ in range(check_threads)]
+for t in threads: t.start()
+for t in threads: t.join()
+server.shutdown()
+q = statistics.quantiles(latencies, n=100)
+print(json.dumps({'logins_per_s': logins[0] / seconds, 'rejected_503': rejected[0],
+                  'check_p50_ms': q[49] * 1000, 'check_p99_ms': q[98] * 1000}))
+'''
+
+
+def run(mode_env, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}", **mode_env)
+        out = subprocess.run(
+            [sys.executable, '-c', WORKER, str(args.seconds), str(args.login_threads), str(args.check_threads)],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True, check=True,
+        ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--login-threads', type=int, default=16)
+    parser.add_argument('--check-threads', type=int, default=4)
+    parser.add_argument('--workers', default='', help='PASSWORD_HASH_WORKERS for the pooled run (default: half the CPUs)')
+    args = parser.parse_args()
+
+    modes = {
+        'inline': {'PASSWORD_HASH_WORKERS': '0'},
+        'pool': {'PASSWORD_HASH_WORKERS': args.workers} if args.workers else {},
+    }
+    print(f"{'mode':<8}{'logins/s':>10}{'503s':>8}{'check p50 ms':>14}{'check p99 ms':>14}")
+    for name, env in modes.items():
+        r = run(env, args)
+        print(f"{name:<8}{r['logins_per_s']:>10.1f}{r['rejected_503']:>8}{r['check_p50_ms']:>14.1f}{r['check_p99_ms']:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
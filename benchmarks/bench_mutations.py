@@ -0,0 +1,136 @@
+"""
+Write throughput of the PUT and DELETE routes under concurrency.
+
+In a throwaway database, each of ``--threads`` threads logs in as its own
+user, who has a budget, a savings goal, a recurring transaction and
+``--rows`` transactions. The threads then cycle through PUTs on all four
+(amounts, descriptions, schedules) and DELETEs of transactions for
+``--seconds``. It reports requests per second, latency, and the SQL
+statements executed per request. Each thread count is a fresh process.
+
+    python benchmarks/bench_mutations.py [--threads 1 4 16] [--seconds 10] [--rows 300]
+"""
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def setup_user(app, index, rows):
+    client = app.test_client()
+    response = client.post('/api/auth/signup', json={'username': f'user-{index}', 'email': f'user-{index}@example.com',
+                                                     'password': 'bench-password'})
+    assert response.status_code == 201, response.get_data(as_text=True)
+    client.post('/api/budgets', json={'category_id': 1, 'amount': '5000', 'budget_month_str': '2026-03', 'period': 'monthly'})
+    client.post('/api/savings-goals', json={'name': 'bench', 'target_amount': '1000'})
+    client.post('/api/recurring-transactions', json={'description': 'rent', 'amount': '500', 'transaction_type': 'expense',
+                                                     'frequency': 'monthly', 'interval': 1, 'start_date_str': '2026-01-01'})
+    client.post('/api/transactions/bulk', json=[
+        {'amount': '10.00', 'transaction_type': 'expense', 'category_id': 1 + i % 2, 'description': f'row {i}',
+         'date': f'2026-03-{1 + i % 28:02d}'} for i in range(rows)])
+    ids = {
+        'budget': client.get('/api/budgets').get_json()[0]['id'],
+        'goal': client.get('/api/savings-goals').get_json()[0]['id'],
+        'recurring': client.get('/api/recurring-transactions').get_json()[0]['id'],
+        'transactions': [t['id'] for t in client.get('/api/transactions').get_json()],
+    }
+    return client, ids
+
+
+def operations(ids):
+    transactions = itertools.cycle(ids['transactions'][len(ids['transactions']) // 2:])
+    deletable = iter(ids['transactions'][:len(ids['transactions']) // 2])
+    for i in itertools.count():
+        kind = i % 6
+        if kind == 0:
+            yield 'put', f'/api/transactions/{next(transactions)}', {'amount': f'{10 + i % 50}.25', 'category_id': 1 + i % 2}
+        elif kind == 1:
+            yield 'put', f'/api/transactions/{next(transactions)}', {'description': f'edited {i}'}
+        elif kind == 2:
+            yield 'put', f"/api/budgets/{ids['budget']}", {'amount': str(4000 + i % 100)}
+        elif kind == 3:
+            yield 'put', f"/api/savings-goals/{ids['goal']}", {'current_amount': str(i % 500), 'priority': 'high'}
+        elif kind == 4:
+            yield 'put', f"/api/recurring-transactions/{ids['recurring']}", {'interval': 1 + i % 3}
+        else:
+            transaction_id = next(deletable, None)
+            if transaction_id is not None:
+                yield 'delete', f'/api/transactions/{transaction_id}', None
+
+
+def worker(client, ids, stop, latencies, errors):
+    for method, url, body in operations(ids):
+        if stop.is_set():
+            return
+        started = time.perf_counter()
+        response = getattr(client, method)(url, json=body)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors.append((url, response.status_code))
+
+
+def run(threads, seconds, rows):
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'app.db')}", SHARD_COUNT='0', PURGE_WORKER='0',
+                      PASSWORD_HASH_WORKERS='0', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    from sqlalchemy import event
+    from src.main import app
+    from src.services.sharding import all_engines
+
+    users = [setup_user(app, i, rows) for i in range(threads)]
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    with app.app_context():
+        for engine in all_engines():
+            event.listen(engine, 'before_cursor_execute', count)
+
+    stop = threading.Event()
+    latencies, errors = [], []
+    pool = [threading.Thread(target=worker, args=(client, ids, stop, latencies, errors)) for client, ids in users]
+    for thread in pool:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in pool:
+        thread.join()
+
+    # Session loads and saves go through the same engine; they are counted too.
+    print(f'{threads:>8}{len(latencies) / seconds:>9.1f}/s{percentile(latencies, 50) * 1000:>8.1f}ms'
+          f'{percentile(latencies, 99) * 1000:>8.1f}ms{statements[0] / len(latencies):>12.1f}{len(errors):>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=300)
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)  # one run, in this process
+    args = parser.parse_args()
+
+    if args.single is not None:
+        run(args.single, args.seconds, args.rows)
+        return
+    print(f'{args.seconds:.0f}s per run, {args.rows} transactions per user')
+    print(f"{'threads':>8}{'requests':>11}{'p50':>10}{'p99':>10}{'statements':>12}{'errors':>8}")
+    for threads in args.threads:
+        subprocess.run([sys.executable, __file__, '--single', str(threads), '--seconds', str(args.seconds),
+                        '--rows', str(args.rows)], check=True)
+
+
+if __name__ == '__main__':
+    main()
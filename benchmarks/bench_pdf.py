@@ -0,0 +1,77 @@
+"""
+PDF report rendering time by number of worker processes.
+
+Renders a ``--rows`` transaction report with src/services/pdf_report.py:
+in one pass (0 workers, the path small reports take) and then chunked over
+each ``--workers`` count. Each run is a fresh process. It reports wall
+time, pages and the peak RSS of the largest rendering process. Needs
+WeasyPrint with its system libraries (Pango) and pypdf.
+
+    python benchmarks/bench_pdf.py [--rows 20000] [--workers 0 1 2 4] [--chunk-pages 50]
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def report_rows(count):
+    rng = random.Random(9)
+    day = date(2026, 6, 30)
+    for i in range(count):
+        if i % 40 == 0:
+            day -= timedelta(days=1)
+        yield (day.isoformat(), f'merchant {rng.randint(1, 5000)}', rng.randint(100, 500_000),
+               rng.choice(('income', 'expense', 'expense')), rng.choice(('Food', 'Bills', 'Shopping', None)))
+
+
+def peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def run(workers, rows, chunk_pages):
+    import pypdf
+    from src.services.pdf_report import PdfRenderer, iter_file
+
+    renderer = PdfRenderer(workers=workers, chunk_pages=chunk_pages)
+    renderer.start()
+    started = time.perf_counter()
+    path = renderer.render(report_rows(rows), {'report_date': date.today().isoformat(), 'filters': []},
+                           {'count': rows, 'income_minor': 0, 'expense_minor': 0})
+    seconds = time.perf_counter() - started
+    pages = len(pypdf.PdfReader(path).pages)
+    for _ in iter_file(path):
+        pass
+    renderer.shutdown()  # RUSAGE_CHILDREN covers the workers once they have exited
+    print(f'{workers:>8}{seconds:>9.2f}s{pages:>8}{peak_rss_mb():>8.0f} MB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--chunk-pages', type=int, default=50)
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)  # one run, in this process
+    args = parser.parse_args()
+
+    if args.single is not None:
+        run(args.single, args.rows, args.chunk_pages)
+        return
+    print(f'rows: {args.rows:,}  cpus: {os.cpu_count()}  chunk: {args.chunk_pages} pages')
+    print(f"{'workers':>8}{'seconds':>10}{'pages':>8}{'peak RSS':>11}")
+    for workers in args.workers:
+        subprocess.run([sys.executable, __file__, '--single', str(workers), '--rows', str(args.rows),
+                        '--chunk-pages', str(args.chunk_pages)], check=True)
+
+
+if __name__ == '__main__':
+    main()
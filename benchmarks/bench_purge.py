@@ -0,0 +1,117 @@
+"""
+Request latency while a large account is deleted.
+
+Gives one user ``--rows`` transactions in a throwaway database, then deletes
+that account from another process while a second user keeps writing and
+reading through the app. Either the ORM deletes the user and its cascades in
+one transaction, or a purge job (src/services/purge.py) runs with
+``--batch-size`` and ``--pause``. Latencies are those of the second user's
+requests while the deletion runs.
+
+    python benchmarks/bench_purge.py [--rows 100000] [--batch-size 500] [--pause 0.05]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DELETER = r'''
+import sys, time
+from src.main import app
+from src.extensions import db
+from src.models.user import User
+from src.services.purge import run_job, schedule_purge
+mode, user_id, batch_size, pause = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4])
+with app.app_context():
+    print('ready', flush=True)
+    sys.stdin.readline()
+    started = time.monotonic()
+    if mode == 'orm':
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+    else:
+        job = schedule_purge(user_id, 'account')
+        db.session.commit()
+        run_job(job.id, batch_size=batch_size, pause=pause)
+    print(f'{time.monotonic() - started:.3f}', flush=True)
+'''
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def fill(db_path, user_id, rows):
+    rng = random.Random(3)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO "transaction" (user_id, amount_minor, description, transaction_type, date, created_at, category_id) '
+        "VALUES (?, ?, 'bench', 'expense', ?, '2026-01-01 12:00:00.000000', ?)",
+        ((user_id, rng.randint(100, 50_000), f'20{rng.randint(18, 25)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}', rng.randint(1, 6))
+         for _ in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def measure(client, deleter):
+    """Issues requests until the deleter reports its duration; returns (latencies, seconds)."""
+    body = {'amount': '12.34', 'transaction_type': 'expense', 'category_id': 1, 'description': 'bench', 'date': '2026-01-15'}
+    os.set_blocking(deleter.stdout.fileno(), False)
+    latencies, i = [], 0
+    while True:
+        line = deleter.stdout.readline()
+        if line:
+            return latencies, float(line)
+        started = time.perf_counter()
+        if i % 2:
+            client.post('/api/transactions', json=body)
+        else:
+            client.get('/api/transactions?limit=20')
+        latencies.append(time.perf_counter() - started)
+        i += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--pause', type=float, default=0.05)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.join(tmp, 'app.db')
+    os.environ.update(DATABASE_URL=f'sqlite:///{db_path}', SHARD_COUNT='0', PURGE_WORKER='0',
+                      PASSWORD_HASH_WORKERS='0', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    from src.main import app
+
+    print(f'rows: {args.rows:,}  batch size: {args.batch_size}  pause: {args.pause}s')
+    print(f"{'deletion':>10}{'seconds':>9}{'requests':>10}{'p50':>9}{'p99':>9}{'max':>9}")
+    for mode in ('orm', 'purge'):
+        owner, other = app.test_client(), app.test_client()
+        user_id = owner.post('/api/auth/signup', json={'username': f'owner-{mode}', 'email': f'owner-{mode}@example.com',
+                                                       'password': 'bench-password'}).get_json()['user']['id']
+        other.post('/api/auth/signup', json={'username': f'other-{mode}', 'email': f'other-{mode}@example.com', 'password': 'bench-password'})
+        fill(db_path, user_id, args.rows)
+        deleter = subprocess.Popen([sys.executable, '-c', DELETER, mode, str(user_id), str(args.batch_size), str(args.pause)],
+                                   cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        assert deleter.stdout.readline().strip() == 'ready'
+        deleter.stdin.write('go\n')
+        deleter.stdin.flush()
+        latencies, seconds = measure(other, deleter)
+        deleter.wait()
+        print(f'{mode:>10}{seconds:>8.2f}s{len(latencies):>10}{percentile(latencies, 50) * 1000:>7.1f}ms'
+              f'{percentile(latencies, 99) * 1000:>7.1f}ms{max(latencies) * 1000:>7.0f}ms')
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute('SELECT count(*) FROM "transaction" WHERE user_id = ?', (user_id,)).fetchone()[0] == 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Read latency under a write-heavy load, with and without read routing.
+
+In a throwaway database, ``--writers`` threads keep adding transactions
+while ``--readers`` threads load the dashboard and the transaction list for
+users with ``--rows`` transactions each. Every thread has its own user and
+client. Run once with ``READ_ROUTING=0`` (readers share the primary's
+connection pool with the writers) and once with read routing on (they use
+src/services/read_routing.py's read-only engine). Each run is a fresh
+process. Reports read and write latencies, and failed requests (a write
+that waits out SQLite's busy timeout fails with a 500).
+
+    python benchmarks/bench_read_routing.py [--writers 16] [--readers 4] [--seconds 20] [--rows 2000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def signup(app, name):
+    client = app.test_client()
+    response = client.post('/api/auth/signup', json={'username': name, 'email': f'{name}@example.com', 'password': 'bench-password'})
+    assert response.status_code == 201, response.get_data(as_text=True)
+    return client
+
+
+def writer(client, stop, latencies, errors):
+    body = {'amount': '12.34', 'transaction_type': 'expense', 'category_id': 1, 'description': 'bench', 'date': '2026-01-15'}
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.post('/api/transactions', json=body)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 201:
+            errors.append(response.status_code)
+
+
+def reader(client, stop, latencies, errors):
+    i = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.get('/api/bootstrap' if i % 2 else '/api/transactions?limit=50')
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+        i += 1
+
+
+def run(routing, writers, readers, seconds, rows):
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'app.db')}", SHARD_COUNT='0', PURGE_WORKER='0',
+                      PASSWORD_HASH_WORKERS='0', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000', READ_ROUTING=routing)
+    from src.main import app
+
+    reader_clients = [signup(app, f'reader-{i}') for i in range(readers)]
+    writer_clients = [signup(app, f'writer-{i}') for i in range(writers)]
+    batch = [{'amount': '5.00', 'transaction_type': 'expense', 'category_id': 1 + i % 6, 'description': f'row {i}',
+              'date': f'2025-{1 + i % 12:02d}-{1 + i % 28:02d}'} for i in range(rows)]
+    for client in reader_clients:
+        assert client.post('/api/transactions/bulk', json=batch).status_code == 201
+
+    stop = threading.Event()
+    read_latencies, write_latencies, read_errors, write_errors = [], [], [], []
+    threads = [threading.Thread(target=writer, args=(client, stop, write_latencies, write_errors)) for client in writer_clients]
+    threads += [threading.Thread(target=reader, args=(client, stop, read_latencies, read_errors)) for client in reader_clients]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    label = 'on' if routing == '1' else 'off'
+    for kind, values, errors in (('reads', read_latencies, read_errors), ('writes', write_latencies, write_errors)):
+        print(f'{label:>8}{kind:>8}{len(values) / seconds:>8.1f}/s{percentile(values, 50) * 1000:>8.1f}ms'
+              f'{percentile(values, 99) * 1000:>8.1f}ms{max(values) * 1000:>8.0f}ms{len(errors):>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--single', choices=('0', '1'), help=argparse.SUPPRESS)  # one run, in this process
+    args = parser.parse_args()
+
+    if args.single is not None:
+        run(args.single, args.writers, args.readers, args.seconds, args.rows)
+        return
+    print(f'writers: {args.writers}  readers: {args.readers}  rows per reader: {args.rows:,}  {args.seconds:.0f}s per run')
+    print(f"{'routing':>8}{'':>8}{'rate':>10}{'p50':>10}{'p99':>10}{'max':>10}{'errors':>8}")
+    for routing in ('0', '1'):
+        subprocess.run([sys.executable, __file__, '--single', routing, '--writers', str(args.writers), '--readers',
+                        str(args.readers), '--seconds', str(args.seconds), '--rows', str(args.rows)], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Read latency of the dashboard, budget summary and savings goals, with and
+without the result cache.
+
+In a throwaway database, each of ``--users`` users gets ``--rows``
+transactions, a budget for each category and a few savings goals. Then
+``--clients`` threads load the three endpoints in turn for ``--seconds``;
+each time a client makes ``--write-every`` reads, it also creates a
+transaction, which invalidates that user's cached results. Runs with
+``RESULT_CACHE=0``, with the in-process tier, and with the SQLite shared
+tier added. Each run is a fresh process. Reports reads per second,
+p50/p99 read latency and the share of reads served from the cache.
+
+    python benchmarks/bench_result_cache.py [--users 20] [--rows 2000] [--clients 4] [--write-every 20] [--seconds 10]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+URLS = ('/api/dashboard', '/api/budgets/summary?month_year=2026-03', '/api/savings-goals')
+MODES = {'off': {'RESULT_CACHE': '0'}, 'local': {'RESULT_CACHE': '1'},
+         'shared': {'RESULT_CACHE': '1', 'RESULT_CACHE_SHARED': 'sqlite'}}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def signup(app, name, rows):
+    client = app.test_client()
+    response = client.post('/api/auth/signup', json={'username': name, 'email': f'{name}@example.com', 'password': 'bench-password'})
+    assert response.status_code == 201, response.get_data(as_text=True)
+    assert client.post('/api/transactions/bulk', json=[
+        {'amount': '5.00', 'transaction_type': 'expense' if i % 4 else 'income', 'category_id': 1 + i % 6,
+         'description': f'row {i}', 'date': f'2026-{1 + i % 6:02d}-{1 + i % 28:02d}'} for i in range(rows)]).status_code == 201
+    for category_id in range(1, 7):
+        assert client.post('/api/budgets', json={'category_id': category_id, 'amount': '500', 'budget_month_str': '2026-03',
+                                                 'period': 'monthly'}).status_code == 201
+    for i in range(3):
+        goal = client.post('/api/savings-goals', json={'name': f'goal {i}', 'target_amount': '1000'}).get_json()
+        client.post(f"/api/savings-goals/{goal['savings_goal']['id']}/contribute", json={'amount': '50'})
+    return client
+
+
+def reader(clients, index, stop, write_every, latencies, cached):
+    i = 0
+    while not stop.is_set():
+        client = clients[(index + i // len(URLS)) % len(clients)]
+        started = time.perf_counter()
+        response = client.get(URLS[i % len(URLS)])
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+        cached.append(response.headers.get('X-Cache', 'miss') != 'miss')
+        i += 1
+        if write_every and i % write_every == 0:
+            client.post('/api/transactions', json={'amount': '1.00', 'transaction_type': 'expense', 'category_id': 1,
+                                                   'date': '2026-03-15'})
+
+
+def run(mode, users, rows, clients, write_every, seconds):
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'app.db')}", SHARD_COUNT='0', PURGE_WORKER='0',
+                      PASSWORD_HASH_WORKERS='0', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000', ADMISSION_CONTROL='0',
+                      **MODES[mode])
+    from src.main import app
+
+    user_clients = [signup(app, f'user-{i}', rows) for i in range(users)]
+
+    stop = threading.Event()
+    latencies, cached = [], []
+    threads = [threading.Thread(target=reader, args=(user_clients, i * users // clients, stop, write_every, latencies, cached))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(f'{mode:>8}{len(latencies) / seconds:>10.1f}/s{percentile(latencies, 50) * 1000:>9.2f}ms'
+          f'{percentile(latencies, 99) * 1000:>9.2f}ms{sum(cached) / len(cached):>9.0%}', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--write-every', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--single', choices=tuple(MODES), help=argparse.SUPPRESS)  # one run, in this process
+    args = parser.parse_args()
+
+    if args.single is not None:
+        run(args.single, args.users, args.rows, args.clients, args.write_every, args.seconds)
+        return
+    print(f'users: {args.users}  rows per user: {args.rows:,}  clients: {args.clients}  '
+          f'a write every {args.write_every} reads  {args.seconds:.0f}s per run')
+    print(f"{'cache':>8}{'reads':>12}{'p50':>11}{'p99':>11}{'cached':>9}")
+    for mode in MODES:
+        subprocess.run([sys.executable, __file__, '--single', mode, '--users', str(args.users), '--rows', str(args.rows),
+                        '--clients', str(args.clients), '--write-every', str(args.write_every),
+                        '--seconds', str(args.seconds)], check=True)
+
+
+if __name__ == '__main__':
+    main()
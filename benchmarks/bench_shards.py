@@ -0,0 +1,95 @@
+"""
+Write throughput with 1, 2, 4, ... SQLite shard files.
+
+For each shard count, a throwaway database is created and ``--writers``
+processes each log in as their own user and create transactions through
+the app for ``--seconds``. With one file, every commit queues behind the
+same write lock. With N shards, users on different shards commit in
+parallel.
+
+That only shows when the write lock is the bottleneck. On a small host the
+writers are usually CPU-bound instead: each commit's lock is held for far
+less time than the request takes to build, so extra shards change nothing.
+``--commit-latency-ms`` holds each commit's write lock that much longer, as
+an fsync to slow or networked storage does, without using CPU, so a run
+shows what sharding buys where commits wait on the disk.
+
+    python benchmarks/bench_shards.py [--shards 1 2 4 8] [--writers 8] [--seconds 10] [--commit-latency-ms 0]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SETUP = r'''
+import sys
+from src.main import app
+for i in range(int(sys.argv[1])):
+    client = app.test_client()
+    client.post('/api/auth/signup', json={'username': f'writer{i}', 'email': f'writer{i}@example.com', 'password': 'bench-password'})
+'''
+
+WRITER = r'''
+import json, sys, time
+from sqlalchemy import event
+from src.main import app
+from src.services.sharding import all_engines
+index, seconds, latency = int(sys.argv[1]), float(sys.argv[2]), float(sys.argv[3]) / 1000
+if latency:
+    with app.app_context():
+        for engine in all_engines():
+            # Runs just before the DBAPI commit, while the connection holds the file's write lock.
+            event.listen(engine, 'commit', lambda conn: time.sleep(latency))
+client = app.test_client()
+client.post('/api/auth/login', json={'username': f'writer{index}', 'password': 'bench-password'})
+body = {'amount': '12.34', 'transaction_type': 'expense', 'category_id': 1, 'description': 'bench', 'date': '2026-01-15'}
+writes = errors = 0
+stop = time.monotonic() + seconds
+while time.monotonic() < stop:
+    if client.post('/api/transactions', json=body).status_code == 201:
+        writes += 1
+    else:
+        errors += 1
+print(json.dumps({'writes': writes, 'errors': errors}))
+'''
+
+
+def run_count(shard_count, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'app.db')}",
+                   SHARD_COUNT=str(shard_count),
+                   SHARD_DIRECTORY=os.path.join(tmp, 'shards'),
+                   PASSWORD_HASH_WORKERS='0',
+                   PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')  # setup speed only; not what we measure
+        subprocess.run([sys.executable, '-c', SETUP, str(args.writers)], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        writers = [subprocess.Popen([sys.executable, '-c', WRITER, str(i), str(args.seconds), str(args.commit_latency_ms)],
+                                    cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+                   for i in range(args.writers)]
+        results = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in writers]
+    return sum(r['writes'] for r in results) / args.seconds, sum(r['errors'] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--commit-latency-ms', type=float, default=0,
+                        help='extra time each commit holds its write lock, like a slow fsync')
+    args = parser.parse_args()
+
+    print(f'{args.writers} writer processes, {args.seconds:g}s per run, {args.commit_latency_ms:g} ms commit latency')
+    print(f"{'shards':>6}{'writes/s':>12}{'errors':>8}")
+    for count in args.shards:
+        rate, errors = run_count(count, args)
+        print(f'{count:>6}{rate:>12.1f}{errors:>8}')
+
+
+if __name__ == '__main__':
+    main()
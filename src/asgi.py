@@ -0,0 +1,271 @@
+"""
+ASGI entry point for the async deployment mode:
+
+    uvicorn src.asgi:app --host 0.0.0.0 --port 5000
+
+Under a WSGI server every request holds a worker thread until its response
+is finished, so open event streams cap how many clients a process can
+serve. Here the requests that mostly wait are served on the event loop: the
+live update stream and the transaction list. They read through async
+SQLAlchemy (src/services/async_db.py) and reuse the Flask routes' argument
+parsing, queries and serialization. Every other request, including all
+writes, goes to the Flask app on a2wsgi's thread pool
+(``ASGI_WSGI_THREADS``), so both modes serve the same API. That includes
+the exports and listings with an admission cost: building their ORM objects
+and files is CPU work that would stall every stream on the loop.
+
+Needs the a2wsgi, uvicorn and aiosqlite packages (asyncpg for Postgres).
+"""
+import asyncio
+import functools
+import json
+import queue
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_cookie
+
+from src.extensions import db
+from src.main import app as flask_app
+from src.models.archived_transaction import ArchivedTransaction
+from src.models.transaction import Transaction
+from src.routes.events import HEARTBEAT_SECONDS, _format_event
+from src.routes.transaction import _listing_cost, _newest_transactions_statement, _parse_date_arg, _parse_limit
+from src.services.archive import archive_horizon_statement, horizon_reached, newest_first
+from src.services.async_db import AsyncEngines
+from src.services.events import get_dispatcher
+from src.services.read_routing import pinned_to_primary
+from src.services.session_store import SQLSessionBackend
+from src.services.sharding import get_shard_router
+
+
+class LoopQueue(queue.Queue):
+    """An event subscriber queue that a task on ``loop`` can wait on; the dispatcher thread wakes it."""
+
+    def __init__(self, maxsize=0, loop=None):
+        super().__init__(maxsize)
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def _put(self, item):
+        super()._put(item)
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def get_async(self, timeout):
+        """Like ``get(timeout=timeout)``, without blocking the loop."""
+        deadline = self._loop.time() + timeout
+        while True:
+            self._ready.clear()
+            try:
+                return self.get_nowait()
+            except queue.Empty:
+                pass
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                raise queue.Empty
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                raise queue.Empty
+
+
+class AsyncRequest:
+    def __init__(self, scope, receive, send):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.cookies = parse_cookie(self.headers.get('cookie', ''))
+        self.pinned_to_primary = pinned_to_primary(self.cookies)  # reads its user's own recent writes
+        self.receive = receive
+        self.send = send
+
+    def int_header(self, name):
+        try:
+            return int(self.headers[name.lower()])
+        except (KeyError, ValueError):
+            return None
+
+    def _cors_headers(self):
+        # What flask-cors adds to the Flask app's responses with its default settings.
+        origin = self.headers.get('origin')
+        return [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')] if origin \
+            else [(b'access-control-allow-origin', b'*')]
+
+    async def start_response(self, status, content_type, headers=()):
+        await self.send({
+            'type': 'http.response.start', 'status': status,
+            'headers': [(b'content-type', content_type.encode())] + self._cors_headers()
+                       + [(name.lower().encode(), value.encode('latin-1')) for name, value in headers],
+        })
+
+    async def respond(self, status, body, content_type, headers=()):
+        body = body.encode()
+        await self.start_response(status, content_type, [('Content-Length', str(len(body)))] + list(headers))
+        await self.send({'type': 'http.response.body', 'body': body})
+
+    async def respond_json(self, data, status=200, headers=()):
+        """Sends ``data`` the way ``jsonify`` would."""
+        await self.respond(status, flask_app.json.response(data).get_data(as_text=True), 'application/json', headers)
+
+    async def respond_stream(self, status, content_type, chunks, headers=()):
+        """Streams the strings from the async generator ``chunks``, closing it if the client goes away."""
+        await self.start_response(status, content_type, headers)
+
+        async def body():
+            async for chunk in chunks:
+                await self.send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+            await self.send({'type': 'http.response.body', 'body': b''})
+
+        async def disconnected():
+            while (await self.receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(body()), asyncio.ensure_future(disconnected())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await chunks.aclose()
+
+
+async def _filtered_transactions(engines, user_id, args, limit=None, primary=False):
+    """Filtered transactions, newest first, as the transaction routes' ``_get_filtered_transactions`` returns them."""
+    async with engines.session(user_id, primary) as session:
+        async def newest(model):
+            return (await session.scalars(_newest_transactions_statement(user_id, model, limit, args))).unique().all()
+
+        transactions = await newest(Transaction)
+        horizon = await session.scalar(archive_horizon_statement(user_id))
+        if horizon_reached(horizon, _parse_date_arg('start_date', args)):
+            transactions = newest_first(transactions, await newest(ArchivedTransaction), limit)
+    return transactions
+
+
+async def get_transactions(asgi, request, user_id):
+    """Get user's transactions with optional filtering"""
+    try:
+        limit = _parse_limit(request.args)
+    except ValueError:
+        await request.respond_json({'error': 'limit must be a positive number of rows, or "all"'}, 400)
+        return
+    try:
+        transactions = await _filtered_transactions(asgi.engines, user_id, request.args, limit,
+                                                    request.pinned_to_primary)
+        await request.respond_json([transaction.to_dict() for transaction in transactions])
+    except Exception as e:
+        flask_app.logger.error(f"Error getting transactions: {e}")
+        await request.respond_json({'error': 'Failed to get transactions'}, 500)
+
+
+async def stream_events(asgi, request, user_id):
+    """Server-Sent Events stream of the current user's data changes"""
+    dispatcher = get_dispatcher(flask_app)
+    if dispatcher.subscriber_count() >= flask_app.config.get('EVENT_STREAM_MAX_SUBSCRIBERS', 10000):
+        await request.respond_json({'error': 'Too many open event streams, please retry shortly'}, 503,
+                                   [('Retry-After', '5')])
+        return
+
+    last_event_id = request.int_header('Last-Event-ID')
+    subscription = dispatcher.subscribe(user_id, functools.partial(LoopQueue, loop=asyncio.get_running_loop()))
+
+    async def generate():
+        last_sent = last_event_id or 0
+        try:
+            yield 'retry: 3000\n\n'
+            if last_event_id is not None:
+                async with asgi.engines.session(user_id, request.pinned_to_primary) as session:
+                    replayed = (await session.execute(dispatcher.replay_statement(user_id, last_event_id))).all()
+                for event_id, payload in replayed:
+                    last_sent = event_id
+                    # Adding the totals is synchronous ORM work, as it is for live events in the dispatcher thread.
+                    yield _format_event(event_id, 'delta', await asyncio.to_thread(dispatcher.delta, user_id, payload))
+            while True:
+                try:
+                    item = await subscription.get_async(HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if item is None:
+                    # We fell behind; the client should reload its state.
+                    yield _format_event(None, 'resync', '{}')
+                    return
+                event_id, payload = item
+                if event_id > last_sent:
+                    last_sent = event_id
+                    yield _format_event(event_id, 'delta', payload)
+        finally:
+            dispatcher.unsubscribe(user_id, subscription)
+
+    await request.respond_stream(200, 'text/event-stream; charset=utf-8', generate(),
+                                 [('Cache-Control', 'no-cache'), ('X-Accel-Buffering', 'no')])
+
+
+# GET routes served on the event loop; all other requests go to the Flask app.
+ASYNC_ROUTES = {
+    '/api/transactions': get_transactions,
+    '/api/events/stream': stream_events,
+}
+
+
+class AsyncApp:
+    def __init__(self, flask_app, engines, wsgi_threads=10):
+        self.flask_app = flask_app
+        self.engines = engines
+        self.wsgi = WSGIMiddleware(flask_app, workers=wsgi_threads)
+        self.session_backend = flask_app.session_interface.backend
+        self.session_cookie = flask_app.session_interface.get_cookie_name(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        handler = ASYNC_ROUTES.get(scope['path']) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+        request = AsyncRequest(scope, receive, send) if handler is not None else None
+        if handler is get_transactions and _listing_cost(request.args) > 0:
+            handler = None  # a long listing: admitted, and built off the loop, by the Flask route
+        if handler is None:
+            await self.wsgi(scope, receive, send)
+            return
+        user_id = await self._session_user(request)
+        if user_id is None:
+            await request.respond_json({'error': 'Authentication required'}, 401)
+            return
+        await handler(self, request, user_id)
+
+    async def _session_user(self, request):
+        """The user_id in the request's server-side session, loaded as the Flask session interface would."""
+        sid = request.cookies.get(self.session_cookie)
+        if not sid:
+            return None
+        if isinstance(self.session_backend, SQLSessionBackend):
+            async with self.engines.session() as session:
+                raw = await session.scalar(self.session_backend.load_statement(sid))
+            data = json.loads(raw) if raw else None
+        else:
+            data = await asyncio.to_thread(self.session_backend.load, sid)
+        return (data or {}).get('user_id')
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engines.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(flask_app):
+    with flask_app.app_context():
+        primary = db.engine
+    engines = AsyncEngines(primary, flask_app.config.get('READ_DATABASE_URL'), get_shard_router())
+    return AsyncApp(flask_app, engines, wsgi_threads=flask_app.config.get('ASGI_WSGI_THREADS', 10))
+
+
+app = create_asgi_app(flask_app)
@@ -0,0 +1,177 @@
+"""Maintenance commands, run with ``flask --app src.main <command>``."""
+import os
+
+import click
+from sqlalchemy import func, select
+
+from src.extensions import db
+from src.services.archive import DEFAULT_BATCH_SIZE, MIN_ARCHIVE_MONTHS, run_archival
+from src.services.backup import (BackupError, create_backup, list_backups, read_manifest, restore_backup,
+                                 verify_backup)
+from src.services.purge import DEFAULT_BATCH_SIZE as PURGE_BATCH_SIZE, run_job, runnable_jobs, schedule_purge
+from src.services.session_store import revoke_user_sessions
+from src.services.sharding import SHARDED_TABLES, all_engines, get_shard_router, rebalance
+
+
+def register_commands(app):
+    @app.cli.group()
+    def shards():
+        """Inspect and rebalance per-user shard files (requires SHARD_COUNT)."""
+
+    def _router_or_exit():
+        router = get_shard_router()
+        if router is None:
+            raise click.ClickException('Sharding is disabled; set SHARD_COUNT to use these commands.')
+        return router
+
+    @shards.command('status')
+    def shards_status():
+        """Show users and transactions per shard."""
+        router = _router_or_exit()
+        users, transactions = db.metadata.tables['user_data_version'], db.metadata.tables['transaction']
+        for index, engine in enumerate(router.engines):
+            with engine.connect() as conn:
+                user_count = conn.execute(select(func.count()).select_from(users)).scalar()
+                transaction_count = conn.execute(select(func.count()).select_from(transactions)).scalar()
+            click.echo(f'shard {index}: {user_count} users, {transaction_count} transactions ({router.shard_path(index)})')
+
+    @shards.command('rebalance')
+    @click.option('--dry-run', is_flag=True, help='Only print the moves.')
+    def shards_rebalance(dry_run):
+        """Move users to their shard for the current SHARD_COUNT (run with the app stopped)."""
+        router = _router_or_exit()
+        moved = rebalance(router, dry_run=dry_run, log=click.echo)
+        click.echo(f"{'Would move' if dry_run else 'Moved'} {moved} user(s); tables: {', '.join(SHARDED_TABLES)}")
+
+    @app.cli.group()
+    def archive():
+        """Move old transactions to cold storage."""
+
+    @archive.command('run')
+    @click.option('--months', type=click.IntRange(min=MIN_ARCHIVE_MONTHS), default=None,
+                  help='Archive transactions older than this many months (default: ARCHIVE_AFTER_MONTHS).')
+    @click.option('--batch-size', type=click.IntRange(min=1), default=DEFAULT_BATCH_SIZE, show_default=True)
+    @click.option('--dry-run', is_flag=True, help='Only count the transactions that would be archived.')
+    def archive_run(months, batch_size, dry_run):
+        """Archive old transactions and rebuild their monthly rollups (safe to run while the app is up)."""
+        months = months or app.config.get('ARCHIVE_AFTER_MONTHS', 24)
+        try:
+            total = run_archival(months, batch_size=batch_size, dry_run=dry_run, log=click.echo)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"{'Would archive' if dry_run else 'Archived'} {total} transaction(s)")
+
+    @app.cli.group()
+    def backup():
+        """Online backups of the database files (main database and shards)."""
+
+    def _backup_dir():
+        return app.config.get('BACKUP_DIRECTORY') or os.path.join(os.path.dirname(db.engine.url.database), 'backups')
+
+    def _resolve_set(name):
+        path = os.path.join(_backup_dir(), name)
+        if not os.path.isfile(os.path.join(path, 'manifest.json')):
+            raise click.ClickException(f'No backup named {name} in {_backup_dir()}')
+        return path
+
+    @backup.command('create')
+    @click.option('--no-verify', is_flag=True, help='Skip the integrity check (and keep older sets).')
+    def backup_create(no_verify):
+        """Take a compressed, verified snapshot while the app keeps running."""
+        if db.engine.dialect.name != 'sqlite':
+            raise click.ClickException('Backups are only supported for SQLite databases')
+        try:
+            path = create_backup(
+                [engine.url.database for engine in all_engines()], _backup_dir(),
+                pages_per_step=app.config.get('BACKUP_PAGES_PER_STEP', 256),
+                verify=not no_verify,
+                keep=0 if no_verify else app.config.get('BACKUP_KEEP', 7),
+                log=click.echo,
+            )
+        except BackupError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'Backup written to {path}')
+
+    @backup.command('list')
+    def backup_list():
+        """List backup sets, newest first."""
+        for path in list_backups(_backup_dir()):
+            manifest = read_manifest(path)
+            status = {True: 'verified', False: 'FAILED', None: 'unverified'}[manifest.get('verified')]
+            size = sum(entry['compressed_size'] for entry in manifest['files'])
+            click.echo(f"{os.path.basename(path)}  {status:<10}  {len(manifest['files'])} file(s)  {size:,} bytes")
+
+    @backup.command('verify')
+    @click.argument('name')
+    def backup_verify(name):
+        """Re-run the checksum and integrity checks of a backup set."""
+        manifest = verify_backup(_resolve_set(name))
+        for entry in manifest['files']:
+            click.echo(f"{entry['name']}: {entry['integrity_check']}")
+        if not manifest['verified']:
+            raise click.ClickException('Verification failed')
+
+    @backup.command('restore')
+    @click.argument('name')
+    @click.confirmation_option(prompt='This overwrites the current database files. Is the app stopped?')
+    def backup_restore(name):
+        """Restore a verified backup set over the database files (stop the app first)."""
+        for engine in all_engines():
+            engine.dispose()  # close this process's own connections before the files are swapped
+        try:
+            restore_backup(_resolve_set(name), log=click.echo)
+        except BackupError as e:
+            raise click.ClickException(str(e))
+
+    @app.cli.group()
+    def purge():
+        """Batched deletion of accounts and user data."""
+
+    @purge.command('schedule')
+    @click.argument('user_id', type=int)
+    @click.option('--keep-account', is_flag=True, help='Delete the financial data only.')
+    def purge_schedule(user_id, keep_account):
+        """Queue the deletion of a user's account (or only their data)."""
+        from src.models.user import User
+        if db.session.get(User, user_id) is None:
+            raise click.ClickException(f'No user with id {user_id}')
+        job = schedule_purge(user_id, 'data' if keep_account else 'account')
+        db.session.commit()
+        if not keep_account:
+            revoke_user_sessions(app, user_id)
+        click.echo(f'Scheduled purge job {job.id}; run `flask purge run` or let the app\'s worker pick it up')
+
+    @purge.command('run')
+    @click.option('--batch-size', type=click.IntRange(min=1), default=None,
+                  help=f'Rows deleted per transaction (default: PURGE_BATCH_SIZE, {PURGE_BATCH_SIZE}).')
+    @click.option('--pause', type=click.FloatRange(min=0), default=None,
+                  help='Seconds to wait between chunks (default: PURGE_PAUSE_SECONDS).')
+    @click.option('--retry-failed', is_flag=True, help='Also rerun jobs that stopped with an error.')
+    def purge_run(batch_size, pause, retry_failed):
+        """Run pending purge jobs, resuming interrupted ones (safe to run while the app is up)."""
+        done = 0
+        for job_id in runnable_jobs(retry_failed=retry_failed):
+            try:
+                done += run_job(job_id, batch_size=batch_size or app.config.get('PURGE_BATCH_SIZE', PURGE_BATCH_SIZE),
+                                pause=app.config.get('PURGE_PAUSE_SECONDS', 0.05) if pause is None else pause,
+                                retry_failed=retry_failed, log=click.echo)
+            except Exception as e:
+                click.echo(f'job {job_id} failed: {e}', err=True)
+        click.echo(f'Finished {done} job(s)')
+
+    @purge.command('status')
+    @click.option('--all', 'show_all', is_flag=True, help='Include finished jobs.')
+    def purge_status(show_all):
+        """List purge jobs and their progress."""
+        from src.models.purge_job import PurgeJob
+        query = PurgeJob.query.order_by(PurgeJob.id)
+        if not show_all:
+            query = query.filter(PurgeJob.status != 'done')
+        for job in query:
+            total = '?' if job.total is None else f'{job.total:,}'
+            line = f'job {job.id}: {job.kind} purge of user {job.user_id}, {job.status}, {job.deleted:,}/{total} rows'
+            if job.step:
+                line += f', at {job.step}'
+            if job.error:
+                line += f', error: {job.error}'
+            click.echo(line)
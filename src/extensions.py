@@ -1,4 +1,28 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+
+
+class RoutingSession(Session):
+    """Session whose engine can be chosen per statement by installed routers.
+
+    ``router`` is set by ``src.services.sharding`` when sharding is enabled;
+    it returns the engine for a statement, or None to use the default bind.
+    ``read_router`` is set by ``src.services.read_routing``; it may swap that
+    engine for its read-only counterpart.
+    """
+    router = None
+    read_router = None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        engine = self.router.get_bind(mapper, clause, **kwargs) if self.router is not None else None
+        if engine is None:
+            engine = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if self.read_router is not None:
+            engine = self.read_router.route(self, engine, clause)
+        return engine
+
 
 # Initialize SQLAlchemy instance here
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy(session_options={'class_': RoutingSession})
@@ -1,4 +1,5 @@
 import os
+import secrets
 import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
@@ -6,25 +7,94 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.extensions import db # Import db from the new extensions.py
+from src.migrations import run_migrations
+import src.services.data_version # Registers the flush hook that versions each user's data
+import src.services.events # Registers the commit hook that publishes live update deltas
+import src.services.budget_alerts # Registers the flush hook that keeps budget totals current
+from src.services.session_store import ServerSideSessionInterface, create_session_backend
+from src.services.password_hashing import init_password_hasher
+from src.services.pdf_report import init_pdf_renderer
+from src.services.sharding import init_sharding, all_engines
+from src.services.purge import init_purge_worker
+from src.services.read_routing import init_read_routing
+from src.services.admission import init_admission_control
+from src.services.group_commit import init_group_commit
+from src.services.result_cache import init_result_cache
+from src.commands import register_commands
 
 
 # Now, import blueprints. These might import models, which in turn import 'db' from this file.
 # Since 'db' is defined above, this will work.
 from src.routes.user import user_bp
-from src.routes.auth import auth_bp
+from src.routes.auth import auth_bp, configure_user_cache
 from src.routes.transaction import transaction_bp
 from src.routes.budget import budget_bp # Import the new budget blueprint
 from src.routes.recurring_transaction import recurring_transaction_bp# Import new blueprint
 from src.routes.savings_goal import savings_goal_bp # Import new blueprint
+from src.routes.category_rule import category_rule_bp
+from src.routes.bootstrap import bootstrap_bp
+from src.routes.events import events_bp
+from src.routes.analytics import analytics_bp
+from src.routes.insights import insights_bp
+from src.routes.cache_stats import cache_bp
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
+app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'sql') # 'sql' (app database) or 'redis'
+app.config['SESSION_REDIS_URL'] = os.environ.get('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+app.config['USER_CACHE_TTL_SECONDS'] = int(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['IDEMPOTENCY_KEY_TTL_HOURS'] = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ['PASSWORD_HASH_WORKERS']) if os.environ.get('PASSWORD_HASH_WORKERS') else None # None: half the CPUs, 0: hash inline
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ['PASSWORD_HASH_MAX_PENDING']) if os.environ.get('PASSWORD_HASH_MAX_PENDING') else None
+app.config['PDF_RENDER_WORKERS'] = int(os.environ['PDF_RENDER_WORKERS']) if os.environ.get('PDF_RENDER_WORKERS') else None # None: one per CPU, 0: render in the request
+app.config['PDF_CHUNK_PAGES'] = int(os.environ.get('PDF_CHUNK_PAGES', 50)) # pages per chunk of a large PDF report
+app.config['PDF_MAX_ROWS'] = int(os.environ.get('PDF_MAX_ROWS', 100000)) # larger PDF reports are refused; bounds the merge's memory
+app.config['SHARD_COUNT'] = int(os.environ.get('SHARD_COUNT', 0)) # 0: everything in one database file
+app.config['SHARD_DIRECTORY'] = os.environ.get('SHARD_DIRECTORY') # default: a 'shards' directory next to the database
+app.config['READ_ROUTING'] = os.environ.get('READ_ROUTING', '1') != '0' # 0: GET requests read from the primary too
+app.config['READ_DATABASE_URL'] = os.environ.get('READ_DATABASE_URL') # replica for reads; default: the SQLite file opened read-only
+app.config['READ_YOUR_WRITES_SECONDS'] = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5 if os.environ.get('READ_DATABASE_URL') else 0))
+app.config['ARCHIVE_AFTER_MONTHS'] = int(os.environ.get('ARCHIVE_AFTER_MONTHS', 24)) # used by `flask archive run`
+app.config['BACKUP_DIRECTORY'] = os.environ.get('BACKUP_DIRECTORY') # default: a 'backups' directory next to the database
+app.config['BACKUP_KEEP'] = int(os.environ.get('BACKUP_KEEP', 7))
+app.config['BACKUP_PAGES_PER_STEP'] = int(os.environ.get('BACKUP_PAGES_PER_STEP', 256))
+app.config['PURGE_WORKER'] = os.environ.get('PURGE_WORKER', '1') != '0' # 0: purge jobs only run with `flask purge run`
+app.config['PURGE_BATCH_SIZE'] = int(os.environ.get('PURGE_BATCH_SIZE', 500))
+app.config['PURGE_PAUSE_SECONDS'] = float(os.environ.get('PURGE_PAUSE_SECONDS', 0.05))
+app.config['EVENT_POLL_INTERVAL_SECONDS'] = float(os.environ.get('EVENT_POLL_INTERVAL_SECONDS', 0.5))
+app.config['EVENT_RETENTION_SECONDS'] = int(os.environ.get('EVENT_RETENTION_SECONDS', 600))
+app.config['EVENT_STREAM_MAX_SUBSCRIBERS'] = int(os.environ.get('EVENT_STREAM_MAX_SUBSCRIBERS', 10000))
+app.config['ASGI_WSGI_THREADS'] = int(os.environ.get('ASGI_WSGI_THREADS', 10)) # threads running Flask requests under `uvicorn src.asgi:app`
+app.config['ADMISSION_CONTROL'] = os.environ.get('ADMISSION_CONTROL', '1') != '0' # 0: no limits on exports and large listings
+app.config['ADMISSION_DB_PATH'] = os.environ.get('ADMISSION_DB_PATH') # default: admission.db next to the database
+app.config['ADMISSION_BUCKET_SIZE'] = float(os.environ.get('ADMISSION_BUCKET_SIZE', 30)) # cost units a user can spend in a burst
+app.config['ADMISSION_REFILL_PER_SECOND'] = float(os.environ.get('ADMISSION_REFILL_PER_SECOND', 0.5))
+app.config['ADMISSION_USER_CONCURRENCY'] = int(os.environ.get('ADMISSION_USER_CONCURRENCY', 2))
+app.config['ADMISSION_GLOBAL_COST'] = int(os.environ.get('ADMISSION_GLOBAL_COST', 40)) # cost units of expensive work in flight across all workers
+app.config['GROUP_COMMIT'] = os.environ.get('GROUP_COMMIT', '0') == '1' # 1: commit created transactions, budgets and contributions in batches
+app.config['GROUP_COMMIT_MAX_ROWS'] = int(os.environ.get('GROUP_COMMIT_MAX_ROWS', 200))
+app.config['GROUP_COMMIT_MAX_DELAY_MS'] = float(os.environ.get('GROUP_COMMIT_MAX_DELAY_MS', 0)) # 0: batch only the writes queued during the previous commit
+app.config['RESULT_CACHE'] = os.environ.get('RESULT_CACHE', '1') != '0' # 0: recompute the dashboard, budget summary and savings goals on every request
+app.config['RESULT_CACHE_POLICIES'] = os.environ.get('RESULT_CACHE_POLICIES') # e.g. 'dashboard=lfu:32,budget_summary=lru:8:300' (policy:MB[:TTL seconds])
+app.config['RESULT_CACHE_SHARED'] = os.environ.get('RESULT_CACHE_SHARED') # 'sqlite' (a file shared by this host's processes) or 'redis'; default: none
+app.config['RESULT_CACHE_SHARED_PATH'] = os.environ.get('RESULT_CACHE_SHARED_PATH') # default: result_cache.db next to the database
+app.config['RESULT_CACHE_REDIS_URL'] = os.environ.get('RESULT_CACHE_REDIS_URL', 'redis://localhost:6379/1')
+app.config['RESULT_CACHE_SHARED_TTL'] = int(os.environ.get('RESULT_CACHE_SHARED_TTL', 86400)) # seconds a shared entry lives unless replaced
+app.config['RESULT_CACHE_STATS_TOKEN'] = os.environ.get('RESULT_CACHE_STATS_TOKEN') # bearer token for /api/cache/stats; unset: the endpoint is off
 db.init_app(app) # Initialize db with the Flask app instance
+shard_router = init_sharding(app)
+app.session_interface = ServerSideSessionInterface(create_session_backend(app))
+configure_user_cache(maxsize=4096, ttl=app.config['USER_CACHE_TTL_SECONDS'])
+init_password_hasher(app) # Start the hashing worker processes before the server starts any threads
+init_pdf_renderer(app) # Likewise for the PDF report rendering pool
 
 # Enable CORS for all routes
 CORS(app)
+register_commands(app)
 
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth') # auth_bp handles user creation (signup)
@@ -33,6 +103,12 @@ app.register_blueprint(transaction_bp, url_prefix='/api')
 app.register_blueprint(budget_bp) # FIX: Removed redundant url_prefix. The prefix is already in the blueprint file.
 app.register_blueprint(recurring_transaction_bp) # FIX: Removed redundant url_prefix. The prefix is already in the blueprint file.
 app.register_blueprint(savings_goal_bp)
+app.register_blueprint(category_rule_bp)
+app.register_blueprint(bootstrap_bp)
+app.register_blueprint(events_bp)
+app.register_blueprint(analytics_bp)
+app.register_blueprint(insights_bp)
+app.register_blueprint(cache_bp)
 
 # Create database tables and default categories
 with app.app_context():
@@ -41,10 +117,29 @@ with app.app_context():
     from src.models.user import User
     from src.models.transaction import Transaction, Category # Import Category here
     from src.models.budget import Budget
+    from src.models.budget_alert import BudgetAlert
     from src.models.recurring_transaction import RecurringTransaction
     from src.models.savings_goal import SavingsGoal
+    from src.models.savings_contribution import SavingsContribution
+    from src.models.idempotency_key import IdempotencyKey
+    from src.models.user_session import UserSession
+    from src.models.category_rule import CategoryRule
+    from src.models.user_event import UserEvent
+    from src.models.user_data_version import UserDataVersion
+    from src.models.user_shard import UserShard
+    from src.models.archived_transaction import ArchivedTransaction
+    from src.models.transaction_rollup import TransactionRollup
+    from src.models.purge_job import PurgeJob
     
-    db.create_all()
+    if shard_router:
+        shard_router.create_all() # Global tables in the main database, user-scoped ones in every shard
+    else:
+        db.create_all()
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql('PRAGMA journal_mode=WAL') # Readers, online backups included, never block writers
+    for engine in all_engines():
+        run_migrations(engine) # Bring tables created by older versions up to date
     
     # Create default categories if they don't exist
     # Category model is now correctly in scope here.
@@ -67,6 +162,12 @@ with app.app_context():
     
     db.session.commit()
 
+init_read_routing(app) # After the tables exist: SQLite read engines open the file read-only
+init_admission_control(app)
+init_group_commit(app)
+init_result_cache(app)
+init_purge_worker(app) # Resumes account and data purges left unfinished by a previous run
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
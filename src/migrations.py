@@ -0,0 +1,155 @@
+"""
+Idempotent schema migrations, run on startup right after ``db.create_all()``.
+
+``create_all`` only creates missing tables, so changes to existing tables are
+applied here. Every migration inspects the live schema first and does nothing
+if it has already been applied, which keeps fresh databases (created directly
+with the current models) and upgraded ones on the same schema.
+"""
+from sqlalchemy.schema import CreateColumn
+
+from src.extensions import db
+from src.models.money import CURRENCY_EXPONENT
+
+# table -> {old float column: new integer minor-unit column}
+MONEY_COLUMNS = {
+    'transaction': {'amount': 'amount_minor'},
+    'budget': {'amount': 'amount_minor'},
+    'recurring_transaction': {'amount': 'amount_minor'},
+    'savings_goal': {'target_amount': 'target_amount_minor', 'current_amount': 'current_amount_minor'},
+    'category_rule': {'min_amount': 'min_amount_minor', 'max_amount': 'max_amount_minor'},
+}
+
+
+def _table_columns(conn, table):
+    """Columns of ``table`` in this database file ([] if it lives elsewhere, e.g. in another shard)."""
+    return [row[1] for row in conn.exec_driver_sql(f'PRAGMA main.table_info("{table}")')]
+
+
+def _rebuild_table(conn, table, select_exprs):
+    """
+    Recreates ``table`` from the current model definition and copies the rows
+    across, using ``select_exprs`` ({new column: SQL expression over the old
+    table}). This is SQLite's documented recipe for changing column types.
+    """
+    old_table = f'_{table}_old'
+    for (index_name,) in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)).all():
+        conn.exec_driver_sql(f'DROP INDEX "{index_name}"')
+    conn.exec_driver_sql(f'ALTER TABLE "{table}" RENAME TO "{old_table}"')
+    db.metadata.tables[table].create(conn)
+    columns = ', '.join(f'"{name}"' for name in select_exprs)
+    exprs = ', '.join(select_exprs.values())
+    conn.exec_driver_sql(f'INSERT INTO "{table}" ({columns}) SELECT {exprs} FROM "{old_table}"')
+    conn.exec_driver_sql(f'DROP TABLE "{old_table}"')
+    conn.info.setdefault('rebuilt_tables', set()).add(table)
+
+
+def convert_money_to_minor_units(conn):
+    """Converts Float money columns into integer minor-unit columns."""
+    scale = 10 ** CURRENCY_EXPONENT
+    for table, renames in MONEY_COLUMNS.items():
+        existing = _table_columns(conn, table)
+        if not any(old in existing for old in renames):
+            continue  # already migrated, or created fresh from the models
+
+        sources = {new: old for old, new in renames.items()}
+        select_exprs = {}
+        for column in db.metadata.tables[table].columns:
+            if column.name in sources:
+                select_exprs[column.name] = f'CAST(ROUND("{sources[column.name]}" * {scale}) AS INTEGER)'
+            elif column.name in existing:
+                select_exprs[column.name] = f'"{column.name}"'
+        _rebuild_table(conn, table, select_exprs)
+
+
+def _add_missing_columns(conn, table, column_names):
+    """Adds model columns that an older table lacks, using the model's DDL."""
+    existing = _table_columns(conn, table)
+    if not existing:
+        return
+    for name in column_names:
+        if name not in existing:
+            column_ddl = CreateColumn(db.metadata.tables[table].c[name]).compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN {column_ddl}')
+
+
+def move_user_data_version(conn):
+    """Copies versions from the old user.data_version column (left in place, no longer read)."""
+    if 'data_version' in _table_columns(conn, 'user') and _table_columns(conn, 'user_data_version'):
+        conn.exec_driver_sql(
+            'INSERT OR IGNORE INTO user_data_version (user_id, version) '
+            'SELECT id, data_version FROM "user" WHERE data_version > 0'
+        )
+
+
+def _create_missing_indexes(conn, table):
+    """Creates the model's indexes that an older table lacks."""
+    if not _table_columns(conn, table):
+        return
+    for index in db.metadata.tables[table].indexes:
+        index.create(conn, checkfirst=True)
+
+
+def add_transaction_user_date_index(conn):
+    _create_missing_indexes(conn, 'transaction')
+
+
+def use_transaction_autoincrement(conn):
+    """Rebuilds ``transaction`` with AUTOINCREMENT so ids of archived rows are never handed out again."""
+    sql = conn.exec_driver_sql(
+        "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = 'transaction'").scalar()
+    if sql is None or 'AUTOINCREMENT' in sql.upper():
+        return
+    columns = [column.name for column in db.metadata.tables['transaction'].columns]
+    _rebuild_table(conn, 'transaction', {name: f'"{name}"' for name in columns})
+
+
+def add_budget_spent_counter(conn):
+    """Adds budget.spent_minor and alert_thresholds, and counts spending so far into spent_minor."""
+    existing = _table_columns(conn, 'budget')
+    # A table rebuilt by an earlier migration already has the columns (from the model), but no counts yet.
+    if not existing or ('spent_minor' in existing and 'budget' not in conn.info.get('rebuilt_tables', ())):
+        return
+    _add_missing_columns(conn, 'budget', ['spent_minor', 'alert_thresholds'])
+    _create_missing_indexes(conn, 'budget')
+    period_end = ("CASE budget.period WHEN 'weekly' THEN date(budget.budget_month, '+7 days') "
+                  "WHEN 'yearly' THEN date(budget.budget_month, '+1 year') "
+                  "ELSE date(budget.budget_month, '+1 month') END")
+    spent = []
+    for table in ('transaction', 'transaction_archive'):
+        if _table_columns(conn, table):
+            spent.append(f"(SELECT COALESCE(SUM(t.amount_minor), 0) FROM \"{table}\" t WHERE t.user_id = budget.user_id"
+                         " AND t.category_id = budget.category_id AND t.transaction_type = 'expense'"
+                         f" AND t.date >= budget.budget_month AND t.date < {period_end})")
+    if spent:
+        conn.exec_driver_sql(f"UPDATE budget SET spent_minor = {' + '.join(spent)} "
+                             "WHERE period IN ('weekly', 'monthly', 'yearly')")
+
+
+def add_user_id_indexes(conn):
+    """Indexes user_id where it had none, so a user's rows can be found (and purged) without a table scan."""
+    for table in ('recurring_transaction', 'savings_goal'):
+        _create_missing_indexes(conn, table)
+
+
+MIGRATIONS = [
+    convert_money_to_minor_units,
+    move_user_data_version,
+    add_transaction_user_date_index,
+    use_transaction_autoincrement,
+    add_budget_spent_counter,
+    add_user_id_indexes,
+]
+
+
+def run_migrations(engine):
+    """Applies pending migrations in one transaction. Only SQLite needs them today."""
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.begin() as conn:
+        # Keep other tables' foreign keys pointing at the original names while tables are rebuilt.
+        conn.exec_driver_sql('PRAGMA legacy_alter_table = ON')
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+        for migration in MIGRATIONS:
+            migration(conn)
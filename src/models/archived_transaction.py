@@ -0,0 +1,36 @@
+from src.extensions import db
+from src.models.transaction import Transaction
+from datetime import datetime
+
+class ArchivedTransaction(db.Model):
+    """A transaction moved out of the hot ``transaction`` table by the archival job.
+
+    The table has no rowid: rows are stored clustered by (user_id, date, id),
+    so a user's archived date range is one contiguous read and no secondary
+    index is needed. Archived rows keep their original id and are read-only.
+    """
+    __tablename__ = 'transaction_archive'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('user_id', 'date', 'id'),
+        {'sqlite_with_rowid': False},
+    )
+
+    id = db.Column(db.Integer, nullable=False, autoincrement=False)
+    amount_minor = db.Column(db.Integer, nullable=False)
+    description = db.Column(db.String(200))
+    transaction_type = db.Column(db.String(10), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
+
+    category = db.relationship('Category')
+
+    # Same representation as a live transaction, plus a marker for the UI.
+    amount = Transaction.amount
+
+    def __repr__(self):
+        return f'<ArchivedTransaction {self.transaction_type}: {self.amount}>'
+
+    def to_dict(self):
+        return dict(Transaction.to_dict(self), archived=True)
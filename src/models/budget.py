@@ -1,26 +1,65 @@
 # d:\money-management-app\src\models\budget.py
 from sqlalchemy.orm import relationship
 from src.extensions import db # Import db from extensions.py
+from src.models.money import to_minor, to_major
 from datetime import date
+from dateutil.relativedelta import relativedelta
+
+DEFAULT_ALERT_THRESHOLDS = '80,100'
+# Length of each budget period; a budget covers [budget_month, budget_month + length).
+BUDGET_PERIODS = {
+    'weekly': relativedelta(weeks=1),
+    'monthly': relativedelta(months=1),
+    'yearly': relativedelta(years=1),
+}
+LONGEST_PERIOD = relativedelta(years=1)
 
 class Budget(db.Model):
     __tablename__ = 'budget'
+    __table_args__ = (
+        # Expense writes find the budget to increment with one lookup (see src/services/budget_alerts.py).
+        db.Index('ix_budget_user_category_month', 'user_id', 'category_id', 'budget_month'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    # Period for the budget, e.g., 'monthly', 'yearly', 'weekly'
+    amount_minor = db.Column(db.Integer, nullable=False)  # integer minor units, see src/models/money.py
+    # Period for the budget, e.g., 'monthly', 'yearly', 'weekly' (see BUDGET_PERIODS)
     period = db.Column(db.String(50), nullable=False, default='monthly')
-    # The month and year this budget applies to (for monthly budgets)
-    # For simplicity, we'll store the first day of the month.
+    # First day of the period the budget covers: the first of the month for
+    # monthly budgets, the start of the 12 months for yearly ones, and any day
+    # (the week's first) for weekly ones.
     budget_month = db.Column(db.Date, nullable=False)
+    # Running total of the category's expenses in the budget's month, archived ones included
+    spent_minor = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Comma-separated percentages of the amount that raise a BudgetAlert when spending crosses them
+    alert_thresholds = db.Column(db.String(100), nullable=False, default=DEFAULT_ALERT_THRESHOLDS,
+                                 server_default=DEFAULT_ALERT_THRESHOLDS)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
 
     user = relationship('User', backref=db.backref('budgets', lazy='dynamic'))
     category = relationship('Category') # Assuming Category model exists
 
+    @property
+    def amount(self):
+        return to_major(self.amount_minor)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_minor = to_minor(value)
+
+    @property
+    def period_end(self):
+        """First day after the budget's period, or None for an unknown period."""
+        length = BUDGET_PERIODS.get(self.period)
+        return self.budget_month + length if length and self.budget_month else None
+
+    @property
+    def thresholds(self):
+        return sorted(int(p) for p in (self.alert_thresholds or '').split(',') if p)
+
     def __repr__(self):
         return f'<Budget {self.id} for {self.category.name if self.category else "N/A"} - {self.amount}>'
 
@@ -31,7 +70,11 @@ class Budget(db.Model):
             'category_id': self.category_id,
             'category_name': self.category.name if self.category else 'N/A',
             'amount': self.amount,
+            'spent_amount': to_major(self.spent_minor or 0),
+            'alert_thresholds': self.thresholds,
             'period': self.period,
             'budget_month': self.budget_month.strftime('%Y-%m') if self.budget_month else None,
+            'period_start': self.budget_month.isoformat() if self.budget_month else None,
+            'period_end': self.period_end.isoformat() if self.period_end else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
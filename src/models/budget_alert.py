@@ -0,0 +1,40 @@
+from src.extensions import db
+from src.models.money import to_major
+from datetime import datetime
+
+class BudgetAlert(db.Model):
+    """Written when spending against a budget crosses one of its alert thresholds.
+
+    Rows are created in the same transaction as the expense write that
+    crossed the threshold, so reading alerts never aggregates transactions.
+    The amounts are those at the time of the crossing.
+    """
+    __tablename__ = 'budget_alert'
+    __table_args__ = (
+        db.Index('ix_budget_alert_user_id', 'user_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    budget_id = db.Column(db.Integer, db.ForeignKey('budget.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    budget_month = db.Column(db.Date, nullable=False)
+    threshold = db.Column(db.Integer, nullable=False)  # percent of the budget amount
+    amount_minor = db.Column(db.Integer, nullable=False)  # integer minor units, see src/models/money.py
+    spent_minor = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<BudgetAlert {self.id} budget={self.budget_id} {self.threshold}%>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'budget_id': self.budget_id,
+            'category_id': self.category_id,
+            'budget_month': self.budget_month.strftime('%Y-%m') if self.budget_month else None,
+            'threshold': self.threshold,
+            'budgeted_amount': to_major(self.amount_minor),
+            'spent_amount': to_major(self.spent_minor),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
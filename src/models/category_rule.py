@@ -0,0 +1,48 @@
+from sqlalchemy.orm import relationship
+from src.extensions import db # Import db from extensions.py
+from src.models.money import to_major
+from datetime import datetime
+
+class CategoryRule(db.Model):
+    """A per-user rule that assigns a category to uncategorized transactions.
+
+    A rule matches when every condition it defines holds: the description
+    contains ``pattern`` (case-insensitive), the type equals
+    ``transaction_type`` and the amount lies within
+    ``[min_amount_minor, max_amount_minor]``.
+    When several rules match, the lowest ``priority`` wins (ties go to the older rule).
+    """
+    __tablename__ = 'category_rule'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    pattern = db.Column(db.String(200), nullable=True)
+    transaction_type = db.Column(db.String(10), nullable=True)  # 'income', 'expense' or None for both
+    min_amount_minor = db.Column(db.Integer, nullable=True)  # integer minor units, see src/models/money.py
+    max_amount_minor = db.Column(db.Integer, nullable=True)
+    priority = db.Column(db.Integer, nullable=False, default=100)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    category = relationship('Category')
+
+    def __repr__(self):
+        return f'<CategoryRule {self.id} {self.pattern!r} -> {self.category_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'category_id': self.category_id,
+            'category_name': self.category.name if self.category else None,
+            'pattern': self.pattern,
+            'transaction_type': self.transaction_type,
+            'min_amount': to_major(self.min_amount_minor),
+            'max_amount': to_major(self.max_amount_minor),
+            'priority': self.priority,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
@@ -0,0 +1,29 @@
+from src.extensions import db
+from datetime import datetime
+
+class IdempotencyKey(db.Model):
+    """A client-supplied Idempotency-Key and the response it produced.
+
+    The row is claimed (inserted with a NULL status_code) before the request
+    is processed. The unique (user_id, key) constraint makes the claim
+    race-free across worker processes. Once the handler finishes, the
+    response is stored so replays can be answered from a single indexed lookup.
+    """
+    __tablename__ = 'idempotency_key'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_key_user_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)  # NULL while the request is in progress
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key} user={self.user_id} status={self.status_code}>'
@@ -0,0 +1,37 @@
+"""
+Helpers for money stored as integer minor units (e.g. paise for INR).
+
+Amounts are persisted as integers scaled by 10**CURRENCY_EXPONENT so that sums
+and comparisons are exact. The API keeps speaking decimal amounts; convert with
+``to_minor`` on the way in and ``to_major`` on the way out.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CURRENCY_CODE = 'INR'
+CURRENCY_EXPONENT = 2
+
+
+def to_minor(value, exponent=CURRENCY_EXPONENT):
+    """Converts a decimal amount (number or numeric string) to integer minor units."""
+    if value is None or isinstance(value, bool):
+        raise ValueError('Amount is required')
+    try:
+        # str() keeps floats at their shortest repr, so 10.1 becomes 1010 and not 1009.
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount: {value!r}')
+    if not amount.is_finite():
+        raise ValueError(f'Invalid amount: {value!r}')
+    return int(amount.scaleb(exponent).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_major(minor, exponent=CURRENCY_EXPONENT):
+    """Converts integer minor units back to a decimal amount for JSON output."""
+    if minor is None:
+        return None
+    return float(Decimal(int(minor)).scaleb(-exponent))
+
+
+def format_money(minor, exponent=CURRENCY_EXPONENT):
+    """Formats integer minor units as a fixed-point string, e.g. 123450 -> '1234.50'."""
+    return f'{Decimal(int(minor or 0)).scaleb(-exponent):.{exponent}f}'
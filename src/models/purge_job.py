@@ -0,0 +1,49 @@
+import json
+
+from src.extensions import db
+from datetime import datetime
+
+class PurgeJob(db.Model):
+    """A queued or running deletion of a user's data (kept in the global DB when sharded).
+
+    ``kind`` is 'account' (everything, then the user row) or 'data' (the
+    financial data, keeping the account). The job records the table it is
+    working on and how many rows each table has lost, so a crashed run is
+    resumed where it stopped. A runner holds the job through a lease that it
+    renews with every chunk; an expired lease lets another runner take over.
+    """
+    __tablename__ = 'purge_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)  # no foreign key: the job outlives the account
+    kind = db.Column(db.String(10), nullable=False)  # 'account' or 'data'
+    status = db.Column(db.String(10), nullable=False, default='pending', index=True)  # pending, running, done, failed
+    step = db.Column(db.String(50), nullable=True)  # table being purged
+    total = db.Column(db.Integer, nullable=True)  # rows to delete, counted when the job starts
+    deleted = db.Column(db.Integer, nullable=False, default=0)
+    progress = db.Column(db.Text, nullable=False, default='{}')  # JSON {table: rows deleted}
+    high_water = db.Column(db.Text, nullable=True)  # JSON {table: max id at request time}; data purges only
+    error = db.Column(db.Text, nullable=True)
+    lease_owner = db.Column(db.String(64), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<PurgeJob {self.id} {self.kind} user={self.user_id} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'step': self.step,
+            'deleted': self.deleted,
+            'total': self.total,
+            'percent': round(100 * self.deleted / self.total, 1) if self.total else (100.0 if self.status == 'done' else 0.0),
+            'tables': json.loads(self.progress or '{}'),
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
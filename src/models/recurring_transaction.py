@@ -1,14 +1,15 @@
 from sqlalchemy.orm import relationship
 from src.extensions import db # Import db from extensions.py
+from src.models.money import to_minor, to_major
 from datetime import date, datetime
 
 class RecurringTransaction(db.Model):
     __tablename__ = 'recurring_transaction'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     description = db.Column(db.String(200), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount_minor = db.Column(db.Integer, nullable=False)  # integer minor units, see src/models/money.py
     transaction_type = db.Column(db.String(50), nullable=False)  # 'income' or 'expense'
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
     
@@ -25,6 +26,14 @@ class RecurringTransaction(db.Model):
     user = relationship('User', backref=db.backref('recurring_transactions', lazy='dynamic'))
     category = relationship('Category') # Assuming Category model is defined elsewhere
 
+    @property
+    def amount(self):
+        return to_major(self.amount_minor)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_minor = to_minor(value)
+
     def __repr__(self):
         return f'<RecurringTransaction {self.id} {self.description} - {self.amount}>'
 
@@ -0,0 +1,37 @@
+from src.extensions import db
+from src.models.money import to_major
+from datetime import datetime
+
+class SavingsContribution(db.Model):
+    """Ledger of contributions made to a savings goal.
+
+    Each row is written in the same transaction as the atomic increment of
+    ``savings_goal.current_amount_minor``. ``idempotency_key`` is unique per
+    user so a retried request can be recognised and answered without
+    contributing twice.
+    """
+    __tablename__ = 'savings_contribution'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_savings_contribution_user_key'),
+        db.Index('ix_savings_contribution_goal_created', 'goal_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    goal_id = db.Column(db.Integer, db.ForeignKey('savings_goal.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    amount_minor = db.Column(db.Integer, nullable=False)  # integer minor units, see src/models/money.py
+    idempotency_key = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SavingsContribution {self.id} goal={self.goal_id} {self.amount_minor}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'goal_id': self.goal_id,
+            'user_id': self.user_id,
+            'amount': to_major(self.amount_minor),
+            'idempotency_key': self.idempotency_key,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
@@ -1,4 +1,5 @@
 from src.extensions import db
+from src.models.money import to_minor, to_major
 from datetime import datetime, date
 from sqlalchemy.orm import relationship
 
@@ -6,10 +7,11 @@ class SavingsGoal(db.Model):
     __tablename__ = 'savings_goal'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
-    target_amount = db.Column(db.Float, nullable=False)
-    current_amount = db.Column(db.Float, nullable=False, default=0.0)
+    # Integer minor units, see src/models/money.py
+    target_amount_minor = db.Column(db.Integer, nullable=False)
+    current_amount_minor = db.Column(db.Integer, nullable=False, default=0)
     target_date = db.Column(db.Date, nullable=True)
     description = db.Column(db.String(255), nullable=True)
     priority = db.Column(db.String(50), nullable=False, default='medium') # 'low', 'medium', 'high'
@@ -18,6 +20,22 @@ class SavingsGoal(db.Model):
 
     # user = relationship('User', backref=db.backref('savings_goals', lazy='dynamic')) # Defined in User model
 
+    @property
+    def target_amount(self):
+        return to_major(self.target_amount_minor)
+
+    @target_amount.setter
+    def target_amount(self, value):
+        self.target_amount_minor = to_minor(value)
+
+    @property
+    def current_amount(self):
+        return to_major(self.current_amount_minor)
+
+    @current_amount.setter
+    def current_amount(self, value):
+        self.current_amount_minor = to_minor(value)
+
     def __repr__(self):
         return f'<SavingsGoal {self.name} for user {self.user_id}>'
 
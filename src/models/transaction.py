@@ -1,6 +1,18 @@
 from src.extensions import db # Import db from extensions.py
+from src.models.money import to_minor, to_major
 from datetime import datetime
 
+TRANSACTION_TYPES = ('income', 'expense')
+
+
+def parse_transaction_type(value):
+    """The lowercase transaction type ``value`` names, or None unless it is a string naming one."""
+    if not isinstance(value, str):
+        return None
+    value = value.lower()
+    return value if value in TRANSACTION_TYPES else None
+
+
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
@@ -22,8 +34,15 @@ class Category(db.Model):
         }
 
 class Transaction(db.Model):
+    __table_args__ = (
+        # Serves per-user date ranges: lists, dashboards and bucketed analytics.
+        db.Index('ix_transaction_user_date', 'user_id', 'date'),
+        # Never reuse the id of a deleted or archived row (see src/services/archive.py).
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount_minor = db.Column(db.Integer, nullable=False)  # integer minor units, see src/models/money.py
     description = db.Column(db.String(200))
     transaction_type = db.Column(db.String(10), nullable=False)  # 'income' or 'expense'
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
@@ -33,6 +52,14 @@ class Transaction(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
 
+    @property
+    def amount(self):
+        return to_major(self.amount_minor)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_minor = to_minor(value)
+
     def __repr__(self):
         return f'<Transaction {self.transaction_type}: {self.amount}>'
 
@@ -0,0 +1,24 @@
+from src.extensions import db
+
+class TransactionRollup(db.Model):
+    """Monthly totals of a user's archived transactions per category and type.
+
+    Rebuilt by the archival job for every month it touches. Aggregates over
+    all of a user's history add these rows to the live ``transaction`` table
+    instead of scanning the archive.
+    """
+    __tablename__ = 'transaction_rollup'
+    __table_args__ = (
+        db.Index('ix_transaction_rollup_user_month', 'user_id', 'month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # first day of the month
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
+    transaction_type = db.Column(db.String(10), nullable=False)
+    total_minor = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<TransactionRollup user={self.user_id} {self.month} {self.transaction_type}>'
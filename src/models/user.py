@@ -1,5 +1,6 @@
 from src.extensions import db # Import db from extensions.py
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.models.money import to_major
+from src.services.password_hashing import get_password_hasher
 from datetime import datetime
 
 # db = SQLAlchemy() # Moved to main.py
@@ -19,12 +20,16 @@ class User(db.Model):
         return f'<User {self.username}>'
 
     def set_password(self, password):
-        """Hash and set the user's password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set the user's password (runs in the hashing pool, may raise HashingPoolSaturated)"""
+        self.password_hash = get_password_hasher().hash(password)
 
     def check_password(self, password):
-        """Check if the provided password matches the user's password"""
-        return check_password_hash(self.password_hash, password)
+        """Check if the provided password matches the user's password (runs in the hashing pool)"""
+        return get_password_hasher().verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True if the stored hash predates the configured algorithm or cost"""
+        return get_password_hasher().needs_rehash(self.password_hash)
 
     def to_dict(self):
         return {
@@ -35,7 +40,13 @@ class User(db.Model):
         }
 
     def get_balance(self):
-        """Calculate current balance from transactions"""
-        total_income = sum(t.amount for t in self.transactions if t.transaction_type == 'income')
-        total_expense = sum(t.amount for t in self.transactions if t.transaction_type == 'expense')
-        return total_income - total_expense
+        """Calculate current balance from transactions with an exact integer SUM in SQL, archived ones included"""
+        from src.models.transaction import Transaction
+        from src.services.archive import archived_totals
+        balance_minor = db.session.query(db.func.sum(
+            db.case((Transaction.transaction_type == 'income', Transaction.amount_minor),
+                    else_=-Transaction.amount_minor)
+        )).filter(Transaction.user_id == self.id).scalar() or 0
+        # Archived transactions are counted through their monthly rollups, as on the dashboard.
+        archived_income, archived_expense = archived_totals(self.id)
+        return to_major(balance_minor + archived_income - archived_expense)
@@ -0,0 +1,16 @@
+from src.extensions import db
+
+class UserDataVersion(db.Model):
+    """Per-user counter bumped in the same transaction as every write to the user's data.
+
+    It is kept in its own user-scoped table rather than on ``user`` so that,
+    with sharding enabled, it lives in the same file as the data it versions
+    and a write never has to lock the global database.
+    """
+    __tablename__ = 'user_data_version'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserDataVersion user={self.user_id} v{self.version}>'
@@ -0,0 +1,20 @@
+from src.extensions import db
+from datetime import datetime
+
+class UserEvent(db.Model):
+    """A change notification for a user's live update streams.
+
+    Rows are written in the same transaction as the change they describe and
+    double as the cross-process bus: every worker process tails the table by
+    id and fans new rows out to its own stream subscribers. Rows only need to
+    live long enough for reconnecting clients to catch up (Last-Event-ID).
+    """
+    __tablename__ = 'user_event'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    payload = db.Column(db.Text, nullable=False)  # JSON: changed rows and affected months
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<UserEvent {self.id} user={self.user_id}>'
@@ -0,0 +1,15 @@
+from src.extensions import db
+from datetime import datetime
+
+class UserSession(db.Model):
+    """Server-side session storage used by the default session backend."""
+    __tablename__ = 'user_session'
+
+    id = db.Column(db.String(64), primary_key=True)  # the opaque session id sent in the cookie
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+    data = db.Column(db.Text, nullable=False, default='{}')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<UserSession user={self.user_id} expires={self.expires_at}>'
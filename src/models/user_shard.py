@@ -0,0 +1,11 @@
+from src.extensions import db
+
+class UserShard(db.Model):
+    """Directory of which shard file holds a user's data (sharding mode only, kept in the global DB)."""
+    __tablename__ = 'user_shard'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    shard = db.Column(db.Integer, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<UserShard user={self.user_id} shard={self.shard}>'
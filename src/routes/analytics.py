@@ -0,0 +1,50 @@
+from flask import Blueprint, request, jsonify, session, current_app
+from datetime import datetime, date
+from dateutil.relativedelta import relativedelta
+from src.routes.auth import login_required
+from src.services.analytics import BUCKETS, GROUPS, MAX_BUCKETS, bucket_count, get_series
+
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+@analytics_bp.route('/series', methods=['GET'])
+@login_required
+def get_analytics_series():
+    """Spending per time bucket and category/type as dense, zero-filled arrays"""
+    user_id = session['user_id']
+    bucket = request.args.get('bucket', 'month')
+    group_by = request.args.get('group_by', 'category')
+    if bucket not in BUCKETS:
+        return jsonify({'error': f"Invalid bucket. Use one of: {', '.join(BUCKETS)}"}), 400
+    if group_by not in GROUPS:
+        return jsonify({'error': f"Invalid group_by. Use one of: {', '.join(GROUPS)}"}), 400
+
+    # Category breakdowns are about spending unless asked otherwise.
+    transaction_type = request.args.get('type', 'expense' if group_by == 'category' else None)
+    if transaction_type not in (None, 'income', 'expense'):
+        return jsonify({'error': "Invalid type. Use 'income' or 'expense'"}), 400
+
+    try:
+        end_date = _parse_date(request.args.get('end_date')) or date.today()
+        start_date = _parse_date(request.args.get('start_date'))
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+    if start_date is None:
+        try:
+            start_date = end_date - relativedelta(years=1) + relativedelta(days=1)
+        except (ValueError, OverflowError):  # less than a year after date.min
+            start_date = date.min
+    if start_date > end_date:
+        return jsonify({'error': 'start_date must not be after end_date'}), 400
+    if bucket_count(start_date, end_date, bucket) > MAX_BUCKETS:
+        return jsonify({'error': f'Too many buckets; narrow the date range or use a larger bucket (max {MAX_BUCKETS})'}), 400
+
+    try:
+        return jsonify(get_series(user_id, start_date, end_date, bucket, group_by, transaction_type)), 200
+    except Exception as e:
+        current_app.logger.error(f"Error computing analytics series: {e}")
+        return jsonify({'error': 'Failed to compute analytics series'}), 500
@@ -1,10 +1,56 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request, session, g, current_app
+from sqlalchemy.orm import make_transient_to_detached
 from src.models.user import User
 from src.extensions import db # Import db from extensions.py
+from src.services.cache import LRUCache
+from src.services.session_store import revoke_user_sessions
+from src.services.password_hashing import HashingPoolSaturated
+from src.services.purge import account_deletion_pending
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
 
+# Per-process cache of user rows (column values only), so resolving the
+# current user on authenticated requests doesn't cost a query.
+_user_cache = LRUCache(maxsize=4096, ttl=60)
+
+def configure_user_cache(maxsize, ttl):
+    global _user_cache
+    _user_cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+def invalidate_cached_user(user_id):
+    _user_cache.pop(user_id)
+
+def get_current_user():
+    """Returns the logged-in User attached to the current db session, or None."""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    if 'current_user' in g:
+        return g.current_user
+
+    values = _user_cache.get(user_id)
+    if values is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        _user_cache.set(user_id, values)
+        g.current_user = user
+        return user
+
+    # Rebuild the instance from cached state and attach it without emitting SQL.
+    cached = User(**values)
+    make_transient_to_detached(cached)
+    g.current_user = db.session.merge(cached, load=False)
+    return g.current_user
+
+def _hashing_unavailable(error):
+    response = jsonify({'error': 'Server is busy, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 def login_required(f):
     """Decorator to require login for protected routes"""
     @wraps(f)
@@ -51,6 +97,7 @@ def signup():
         db.session.commit()
         
         # Log in the user
+        session.regenerate()
         session['user_id'] = user.id
         session['username'] = user.username
         
@@ -59,6 +106,9 @@ def signup():
             'user': user.to_dict()
         }), 201
         
+    except HashingPoolSaturated as e:
+        db.session.rollback()
+        return _hashing_unavailable(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Registration failed'}), 500
@@ -82,8 +132,20 @@ def login():
         
         if not user or not user.check_password(password):
             return jsonify({'error': 'Invalid username or password'}), 401
+        if account_deletion_pending(user.id):
+            return jsonify({'error': 'This account is being deleted'}), 403
+        
+        # Transparently upgrade hashes made with an older algorithm or cost
+        if user.password_needs_rehash():
+            try:
+                user.set_password(password)
+                db.session.commit()
+                invalidate_cached_user(user.id)
+            except HashingPoolSaturated:
+                db.session.rollback() # Try again on a later login
         
         # Create session
+        session.regenerate()
         session['user_id'] = user.id
         session['username'] = user.username
         
@@ -92,6 +154,8 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except HashingPoolSaturated as e:
+        return _hashing_unavailable(e)
     except Exception as e:
         return jsonify({'error': 'Login failed'}), 500
 
@@ -101,12 +165,22 @@ def logout():
     session.clear()
     return jsonify({'message': 'Logout successful'}), 200
 
+@auth_bp.route('/sessions/revoke', methods=['POST'])
+@login_required
+def revoke_sessions():
+    """Log out of every device by revoking all of the user's sessions"""
+    user_id = session['user_id']
+    revoke_user_sessions(current_app, user_id)
+    invalidate_cached_user(user_id)
+    session.clear()
+    return jsonify({'message': 'All sessions revoked'}), 200
+
 @auth_bp.route('/profile', methods=['GET'])
 @login_required
 def get_profile():
     """Get current user profile"""
     try:
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
@@ -122,7 +196,7 @@ def get_profile():
 def check_auth():
     """Check if user is authenticated"""
     if 'user_id' in session:
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if user:
             return jsonify({
                 'authenticated': True,
@@ -0,0 +1,118 @@
+"""
+Initial state for the SPA in a single request.
+
+``GET /api/bootstrap`` replaces the burst of calls the frontend used to make
+after login (auth check, categories, dashboard, transactions, budget summary,
+savings goals, recurring transactions). The sections share their queries:
+balance and totals come from one aggregate, and the recent transactions on
+the dashboard are the head of the transaction list.
+
+``include`` selects sections as a comma-separated list (default: all of them);
+the user is always returned. Unauthenticated callers get
+``{'authenticated': False}`` like ``/api/auth/check``.
+"""
+from datetime import date
+
+from flask import Blueprint, request, jsonify, session, current_app
+from sqlalchemy import case, func
+
+from src.extensions import db
+from src.models.money import to_major
+from src.models.recurring_transaction import RecurringTransaction
+from src.models.transaction import Transaction, Category
+from src.models.archived_transaction import ArchivedTransaction
+from src.routes.auth import get_current_user
+from src.services.archive import reaches_archive, newest_first, archived_totals, with_archived_spending
+from src.services.budget_summary import build_month_summary
+from src.routes.savings_goal import list_savings_goals
+
+bootstrap_bp = Blueprint('bootstrap', __name__, url_prefix='/api')
+
+SECTIONS = ('categories', 'dashboard', 'transactions', 'budgets', 'savings_goals', 'recurring_transactions')
+RECENT_TRANSACTIONS = 10
+TRANSACTION_PAGE = 50
+
+
+def _parse_include(value):
+    """Returns the requested sections, or None if an unknown one is named."""
+    if not value:
+        return set(SECTIONS)
+    requested = {part.strip() for part in value.split(',') if part.strip()}
+    return requested if requested <= set(SECTIONS) else None
+
+
+@bootstrap_bp.route('/bootstrap', methods=['GET'])
+def bootstrap():
+    """Get the user and the requested sections of initial app state"""
+    include = _parse_include(request.args.get('include'))
+    if include is None:
+        return jsonify({'error': f"Unknown section in include. Valid sections: {', '.join(SECTIONS)}"}), 400
+
+    user = get_current_user() if 'user_id' in session else None
+    if not user:
+        return jsonify({'authenticated': False}), 200
+
+    try:
+        user_id = user.id
+        # One aggregate serves both the balance and the dashboard totals.
+        total_income, total_expense = db.session.query(
+            func.coalesce(func.sum(case((Transaction.transaction_type == 'income', Transaction.amount_minor), else_=0)), 0),
+            func.coalesce(func.sum(case((Transaction.transaction_type == 'expense', Transaction.amount_minor), else_=0)), 0)
+        ).filter(Transaction.user_id == user_id).one()
+        archived_income, archived_expense = archived_totals(user_id)
+        total_income += archived_income
+        total_expense += archived_expense
+        balance = to_major(total_income - total_expense)
+
+        result = {'authenticated': True, 'user': user.to_dict(), 'balance': balance}
+
+        # Loaded first so that transactions resolve their category from the identity map.
+        categories = Category.query.all()
+        if 'categories' in include:
+            result['categories'] = [category.to_dict() for category in categories]
+
+        if 'dashboard' in include or 'transactions' in include:
+            limit = TRANSACTION_PAGE if 'transactions' in include else RECENT_TRANSACTIONS
+            rows = Transaction.query.filter_by(user_id=user_id)\
+                .order_by(Transaction.date.desc(), Transaction.created_at.desc()).limit(limit).all()
+            if len(rows) < limit and reaches_archive(user_id):
+                rows = newest_first(rows, ArchivedTransaction.query.filter_by(user_id=user_id)
+                                    .order_by(ArchivedTransaction.date.desc()).limit(limit).all(), limit)
+            transactions = [t.to_dict() for t in rows]
+            if 'transactions' in include:
+                result['transactions'] = transactions
+
+        if 'dashboard' in include:
+            category_spending = db.session.query(
+                Category.name,
+                func.sum(Transaction.amount_minor).label('total')
+            ).join(Transaction).filter(
+                Transaction.user_id == user_id,
+                Transaction.transaction_type == 'expense'
+            ).group_by(Category.name).all()
+            category_spending = with_archived_spending(user_id, category_spending)
+            result['dashboard'] = {
+                'balance': balance,
+                'total_income': to_major(total_income),
+                'total_expense': to_major(total_expense),
+                'recent_transactions': transactions[:RECENT_TRANSACTIONS],
+                'category_spending': [{'category': name, 'amount': to_major(total)} for name, total in category_spending]
+            }
+
+        if 'budgets' in include:
+            today = date.today()
+            result['budgets'] = build_month_summary(user_id, today.year, today.month)
+
+        if 'savings_goals' in include:
+            result['savings_goals'] = list_savings_goals(user_id)
+
+        if 'recurring_transactions' in include:
+            recurring = RecurringTransaction.query.filter_by(user_id=user_id, is_active=True)\
+                .order_by(RecurringTransaction.next_due_date).all()
+            result['recurring_transactions'] = [rt.to_dict() for rt in recurring]
+
+        return jsonify(result), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Error building bootstrap data: {e}")
+        return jsonify({'error': 'Failed to load initial data'}), 500
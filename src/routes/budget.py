@@ -1,16 +1,57 @@
 # d:\money-management-app\src\routes\budget.py
 from flask import Blueprint, request, jsonify, session, current_app
-from src.models.budget import Budget
+from src.models.budget import Budget, BUDGET_PERIODS
+from src.models.budget_alert import BudgetAlert
 from src.models.transaction import Transaction, Category # Assuming these are in transaction.py or a models file
 from src.extensions import db # Import db from extensions.py
+from src.models.money import to_minor, to_major
 from src.routes.auth import login_required
+from src.services.idempotency import idempotent
+from src.services.budget_summary import budget_spending, build_budget_summary, build_month_summary
+from src.services.budget_alerts import add_crossed_alerts, sync_budget
+from src.services.group_commit import commit_write
+from src.services.owned_rows import delete_owned, record_write, update_owned
+from src.services.result_cache import cached_result
 from datetime import datetime, date, timedelta
-from sqlalchemy import func, extract
+from sqlalchemy import func, extract, delete
 
 budget_bp = Blueprint('budget', __name__, url_prefix='/api/budgets')
 
+MAX_ALERTS = 100
+# Columns an update reads first: the spending window, and what threshold crossings are measured from.
+BUDGET_WINDOW_COLUMNS = ('category_id', 'period', 'budget_month', 'amount_minor', 'spent_minor')
+
+def _parse_period_start(value, period):
+    """
+    "YYYY-MM" or "YYYY-MM-DD" -> the first day of the budget's period.
+    Monthly budgets always start on the 1st; weekly and yearly ones may start
+    on any given day. Raises ValueError.
+    """
+    if period not in BUDGET_PERIODS:
+        raise ValueError(f"Invalid period. Use one of: {', '.join(BUDGET_PERIODS)}")
+    try:
+        start = datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        try:
+            start = datetime.strptime(value + "-01", '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('Invalid budget_month format. Use YYYY-MM (or YYYY-MM-DD for weekly and yearly budgets).')
+    return start.replace(day=1) if period == 'monthly' else start
+
+def _parse_thresholds(value):
+    """[80, 100] or "80,100" -> the stored "80,100" form. Raises ValueError for anything else."""
+    if isinstance(value, str):
+        value = [p for p in value.split(',') if p.strip()]
+    if not isinstance(value, list) or len(value) > 10:
+        raise ValueError('alert_thresholds must be a list of up to 10 percentages')
+    thresholds = sorted({int(p) for p in value})
+    if any(t <= 0 or t > 1000 for t in thresholds):
+        raise ValueError('alert_thresholds must be between 1 and 1000 percent')
+    return ','.join(str(t) for t in thresholds)
+
 @budget_bp.route('', methods=['POST'])
 @login_required
+@idempotent
 def create_budget():
     data = request.json
     user_id = session['user_id']
@@ -21,18 +62,18 @@ def create_budget():
 
     try:
         category_id = int(data['category_id'])
-        amount = float(data['amount'])
+        amount_minor = to_minor(data['amount'])
         budget_month_str = data['budget_month_str'] # Expected format: "YYYY-MM"
         period = data.get('period', 'monthly').lower()
 
-        if amount <= 0:
+        if amount_minor <= 0:
             return jsonify({'error': 'Budget amount must be positive'}), 400
 
-        # Convert "YYYY-MM" to a date object (first day of the month)
+        # Convert "YYYY-MM" (or "YYYY-MM-DD") to the first day of the budget's period
         try:
-            budget_month_date = datetime.strptime(budget_month_str + "-01", '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({'error': 'Invalid budget_month format. Use YYYY-MM.'}), 400
+            budget_month_date = _parse_period_start(budget_month_str, period)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Check if category exists
         category = Category.query.get(category_id)
@@ -53,13 +94,23 @@ def create_budget():
         new_budget = Budget(
             user_id=user_id,
             category_id=category_id,
-            amount=amount,
+            amount_minor=amount_minor,
             period=period,
             budget_month=budget_month_date
         )
-        db.session.add(new_budget)
-        db.session.commit()
-        return jsonify({'message': 'Budget created successfully', 'budget': new_budget.to_dict()}), 201
+        if 'alert_thresholds' in data:
+            try:
+                new_budget.alert_thresholds = _parse_thresholds(data['alert_thresholds'])
+            except (ValueError, TypeError) as e:
+                return jsonify({'error': str(e)}), 400
+
+        def insert_budget(session):
+            session.add(new_budget)
+            session.flush()
+            sync_budget(new_budget) # Count the month's existing expenses
+            return new_budget.to_dict()
+
+        return jsonify({'message': 'Budget created successfully', 'budget': commit_write(user_id, insert_budget)}), 201
     except ValueError:
         return jsonify({'error': 'Invalid amount or category_id format'}), 400
     except Exception as e:
@@ -94,33 +145,47 @@ def get_budgets():
 def update_budget(budget_id):
     data = request.json
     user_id = session['user_id']
-    budget = Budget.query.filter_by(id=budget_id, user_id=user_id).first()
-
-    if not budget:
-        return jsonify({'error': 'Budget not found or not authorized'}), 404
 
     try:
+        values = {}
         if 'amount' in data:
-            amount = float(data['amount'])
-            if amount <= 0:
+            values['amount_minor'] = to_minor(data['amount'])
+            if values['amount_minor'] <= 0:
                 return jsonify({'error': 'Budget amount must be positive'}), 400
-            budget.amount = amount
         if 'category_id' in data:
-            category_id = int(data['category_id'])
-            category = Category.query.get(category_id)
-            if not category:
+            values['category_id'] = int(data['category_id'])
+            if not db.session.get(Category, values['category_id']):
                  return jsonify({'error': 'Category not found'}), 404
-            budget.category_id = category_id
-        if 'budget_month_str' in data:
+        if 'alert_thresholds' in data:
             try:
-                budget.budget_month = datetime.strptime(data['budget_month_str'] + "-01", '%Y-%m-%d').date()
-            except ValueError:
-                return jsonify({'error': 'Invalid budget_month format. Use YYYY-MM.'}), 400
-        if 'period' in data:
-            budget.period = data['period'].lower()
-        
+                values['alert_thresholds'] = _parse_thresholds(data['alert_thresholds'])
+            except (ValueError, TypeError) as e:
+                return jsonify({'error': str(e)}), 400
+
+        def new_values(old):
+            """The row's new values; a new category or period means recounting its spending."""
+            row = dict(values)
+            if 'period' in data or 'budget_month_str' in data:
+                row['period'] = data.get('period', old.period).lower()
+                row['budget_month'] = _parse_period_start(data.get('budget_month_str') or old.budget_month.isoformat(), row['period'])
+            window = Budget(id=budget_id, category_id=row.get('category_id', old.category_id),
+                            budget_month=row.get('budget_month', old.budget_month), period=row.get('period', old.period))
+            if (window.category_id, window.budget_month, window.period) != (old.category_id, old.budget_month, old.period):
+                row['spent_minor'] = budget_spending(user_id, [window]).get(budget_id) or 0
+            return row
+
+        try:
+            budget, old = update_owned(Budget, budget_id, user_id, new_values, read=BUDGET_WINDOW_COLUMNS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not budget:
+            return jsonify({'error': 'Budget not found or not authorized'}), 404
+
+        add_crossed_alerts(budget, (old.spent_minor, old.amount_minor))
+        record_write(user_id, 'budget', 'updated', budget, [old.budget_month, budget.budget_month])
+        response = {'message': 'Budget updated successfully', 'budget': budget.to_dict()}
         db.session.commit()
-        return jsonify({'message': 'Budget updated successfully', 'budget': budget.to_dict()}), 200
+        return jsonify(response), 200
     except ValueError:
         return jsonify({'error': 'Invalid data format'}), 400
     except Exception as e:
@@ -132,13 +197,14 @@ def update_budget(budget_id):
 @login_required
 def delete_budget(budget_id):
     user_id = session['user_id']
-    budget = Budget.query.filter_by(id=budget_id, user_id=user_id).first()
-
-    if not budget:
-        return jsonify({'error': 'Budget not found or not authorized'}), 404
 
     try:
-        db.session.delete(budget)
+        deleted = delete_owned(Budget, budget_id, user_id, Budget.__table__.c.budget_month)
+        if not deleted:
+            return jsonify({'error': 'Budget not found or not authorized'}), 404
+
+        db.session.execute(delete(BudgetAlert.__table__).where(BudgetAlert.budget_id == budget_id))
+        record_write(user_id, 'budget', 'deleted', {'id': budget_id}, [deleted.budget_month])
         db.session.commit()
         return jsonify({'message': 'Budget deleted successfully'}), 200
     except Exception as e:
@@ -148,50 +214,44 @@ def delete_budget(budget_id):
 
 @budget_bp.route('/summary', methods=['GET'])
 @login_required
+@cached_result('budget_summary')
 def get_budget_summary():
+    """Budgets of every period that cover ``date`` (YYYY-MM-DD), or that overlap ``month_year`` (YYYY-MM, default: this month)"""
     user_id = session['user_id']
+
+    if request.args.get('date'):
+        try:
+            on_date = datetime.strptime(request.args['date'], '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+        return jsonify(build_budget_summary(user_id, on_date)), 200
+
     # Default to current month if not specified
     month_year_str = request.args.get('month_year', date.today().strftime('%Y-%m'))
 
     try:
         year, month = map(int, month_year_str.split('-'))
-        start_of_month = date(year, month, 1)
-        # Find the last day of the month
-        if month == 12:
-            end_of_month = date(year, month, 31)
-        else:
-            end_of_month = date(year, month + 1, 1) - timedelta(days=1)
-            
+        date(year, month, 1)
     except ValueError:
         return jsonify({'error': 'Invalid month_year format. Use YYYY-MM.'}), 400
 
-    from sqlalchemy.orm import joinedload
-
-    budgets = Budget.query.options(joinedload(Budget.category)).filter_by(user_id=user_id, period='monthly').filter(
-        extract('year', Budget.budget_month) == year,
-        extract('month', Budget.budget_month) == month
-    ).all()
-
-    summary = []
-    for budget in budgets:
-        # Sum expenses for this category in the given month
-        total_spent = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.category_id == budget.category_id,
-            Transaction.transaction_type == 'expense',
-            Transaction.date >= start_of_month,
-            Transaction.date <= end_of_month
-        ).scalar() or 0.0
-
-        summary.append({
-            'budget_id': budget.id,
-            'category_id': budget.category_id,
-            'category_name': budget.category.name if getattr(budget, 'category', None) and getattr(budget.category, 'name', None) else 'N/A',
-            'budgeted_amount': budget.amount,
-            'spent_amount': total_spent,
-            'remaining_amount': budget.amount - total_spent,
-            'period': budget.period,
-            'budget_month': budget.budget_month.strftime('%Y-%m')
-        })
-        
-    return jsonify(summary), 200
+    return jsonify(build_month_summary(user_id, year, month)), 200
+
+@budget_bp.route('/alerts', methods=['GET'])
+@login_required
+def get_budget_alerts():
+    """Threshold alerts, newest first; ``after_id`` returns only newer ones (for polling)"""
+    user_id = session['user_id']
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_ALERTS)
+    after_id = request.args.get('after_id', 0, type=int)
+
+    try:
+        alerts = BudgetAlert.query.filter(BudgetAlert.user_id == user_id, BudgetAlert.id > after_id)\
+            .order_by(BudgetAlert.id.desc()).limit(limit).all()
+        names = dict(db.session.query(Category.id, Category.name).filter(
+            Category.id.in_({alert.category_id for alert in alerts}))) if alerts else {}
+        return jsonify([dict(alert.to_dict(), category_name=names.get(alert.category_id, 'N/A'))
+                        for alert in alerts]), 200
+    except Exception as e:
+        current_app.logger.error(f"Error getting budget alerts: {e}")
+        return jsonify({'error': 'Failed to get budget alerts'}), 500
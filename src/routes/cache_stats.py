@@ -0,0 +1,24 @@
+import hmac
+import os
+from flask import Blueprint, request, jsonify, current_app
+from src.services.result_cache import get_result_cache
+
+cache_bp = Blueprint('cache', __name__, url_prefix='/api/cache')
+
+
+@cache_bp.route('/stats', methods=['GET'])
+def get_cache_stats():
+    """This worker process's result cache counters; needs the RESULT_CACHE_STATS_TOKEN bearer token"""
+    token = current_app.config.get('RESULT_CACHE_STATS_TOKEN')
+    if not token:
+        return jsonify({'error': 'Not found'}), 404
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+        return jsonify({'error': 'Invalid or missing token'}), 401
+
+    cache = get_result_cache()
+    return jsonify({
+        'pid': os.getpid(),  # counters are per process; each request may reach a different worker
+        'enabled': cache is not None,
+        'endpoints': cache.stats() if cache is not None else {},
+    }), 200
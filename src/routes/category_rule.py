@@ -0,0 +1,130 @@
+from flask import Blueprint, request, jsonify, session, current_app
+from src.models.category_rule import CategoryRule
+from src.models.transaction import Category, parse_transaction_type
+from src.extensions import db
+from src.models.money import to_minor
+from src.routes.auth import login_required
+from src.services.categorization import apply_rules_to_uncategorized
+
+category_rule_bp = Blueprint('category_rule', __name__, url_prefix='/api/category-rules')
+
+def _apply_rule_fields(rule, data):
+    """Validates and copies rule fields from the payload. Returns an error message or None."""
+    if 'category_id' in data:
+        category_id = int(data['category_id'])
+        if not Category.query.get(category_id):
+            return 'Category not found'
+        rule.category_id = category_id
+    if 'pattern' in data:
+        pattern = str(data['pattern']).strip() if data['pattern'] is not None else ''
+        rule.pattern = pattern or None
+    if 'transaction_type' in data:
+        # Empty or null: the rule matches both types.
+        transaction_type = parse_transaction_type(data['transaction_type']) if data['transaction_type'] else None
+        if data['transaction_type'] and transaction_type is None:
+            return 'Transaction type must be "income" or "expense"'
+        rule.transaction_type = transaction_type
+    if 'min_amount' in data:
+        rule.min_amount_minor = to_minor(data['min_amount']) if data['min_amount'] is not None else None
+    if 'max_amount' in data:
+        rule.max_amount_minor = to_minor(data['max_amount']) if data['max_amount'] is not None else None
+    if 'priority' in data:
+        rule.priority = int(data['priority'])
+    if 'is_active' in data:
+        rule.is_active = bool(data['is_active'])
+
+    if rule.min_amount_minor is not None and rule.max_amount_minor is not None and rule.min_amount_minor > rule.max_amount_minor:
+        return 'min_amount cannot exceed max_amount'
+    if not rule.pattern and not rule.transaction_type and rule.min_amount_minor is None and rule.max_amount_minor is None:
+        return 'A rule needs at least a pattern, a transaction type or an amount range'
+    return None
+
+@category_rule_bp.route('', methods=['POST'])
+@login_required
+def create_category_rule():
+    data = request.json
+    user_id = session['user_id']
+
+    if not data or 'category_id' not in data:
+        return jsonify({'error': 'Missing required field (category_id)'}), 400
+
+    try:
+        rule = CategoryRule(user_id=user_id, priority=100, is_active=True)
+        error = _apply_rule_fields(rule, data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        db.session.add(rule)
+        db.session.commit()
+        return jsonify({'message': 'Category rule created successfully', 'category_rule': rule.to_dict()}), 201
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid data format'}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error creating category rule: {e}")
+        return jsonify({'error': 'Failed to create category rule'}), 500
+
+@category_rule_bp.route('', methods=['GET'])
+@login_required
+def get_category_rules():
+    user_id = session['user_id']
+    rules = CategoryRule.query.filter_by(user_id=user_id).order_by(CategoryRule.priority, CategoryRule.id).all()
+    return jsonify([rule.to_dict() for rule in rules]), 200
+
+@category_rule_bp.route('/<int:rule_id>', methods=['PUT'])
+@login_required
+def update_category_rule(rule_id):
+    data = request.json
+    user_id = session['user_id']
+    rule = CategoryRule.query.filter_by(id=rule_id, user_id=user_id).first()
+
+    if not rule:
+        return jsonify({'error': 'Category rule not found or not authorized'}), 404
+
+    try:
+        error = _apply_rule_fields(rule, data or {})
+        if error:
+            db.session.rollback()
+            return jsonify({'error': error}), 400
+
+        db.session.commit()
+        return jsonify({'message': 'Category rule updated successfully', 'category_rule': rule.to_dict()}), 200
+    except (TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({'error': 'Invalid data format'}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error updating category rule {rule_id}: {e}")
+        return jsonify({'error': 'Failed to update category rule'}), 500
+
+@category_rule_bp.route('/<int:rule_id>', methods=['DELETE'])
+@login_required
+def delete_category_rule(rule_id):
+    user_id = session['user_id']
+    rule = CategoryRule.query.filter_by(id=rule_id, user_id=user_id).first()
+
+    if not rule:
+        return jsonify({'error': 'Category rule not found or not authorized'}), 404
+
+    try:
+        db.session.delete(rule)
+        db.session.commit()
+        return jsonify({'message': 'Category rule deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error deleting category rule {rule_id}: {e}")
+        return jsonify({'error': 'Failed to delete category rule'}), 500
+
+@category_rule_bp.route('/apply', methods=['POST'])
+@login_required
+def apply_category_rules():
+    """Backfills categories on the user's existing uncategorized transactions."""
+    user_id = session['user_id']
+    try:
+        categorized = apply_rules_to_uncategorized(user_id)
+        db.session.commit()
+        return jsonify({'message': 'Category rules applied', 'categorized_count': categorized}), 200
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error applying category rules: {e}")
+        return jsonify({'error': 'Failed to apply category rules'}), 500
@@ -0,0 +1,67 @@
+from flask import Blueprint, Response, request, jsonify, session, current_app
+import queue
+import time
+from src.routes.auth import login_required
+from src.services.events import get_dispatcher
+
+events_bp = Blueprint('events', __name__, url_prefix='/api/events')
+
+HEARTBEAT_SECONDS = 15
+
+
+def _format_event(event_id, event_type, data):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {data}')
+    return '\n'.join(lines) + '\n\n'
+
+
+@events_bp.route('/stream', methods=['GET'])
+@login_required
+def stream_events():
+    """Server-Sent Events stream of the current user's data changes"""
+    user_id = session['user_id']
+    app = current_app._get_current_object()
+    dispatcher = get_dispatcher(app)
+    if dispatcher.subscriber_count() >= app.config.get('EVENT_STREAM_MAX_SUBSCRIBERS', 10000):
+        response = jsonify({'error': 'Too many open event streams, please retry shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscription = dispatcher.subscribe(user_id)
+
+    def generate():
+        # Nothing here touches the request or the DB session, so the WSGI
+        # context (and its connection) is released while the stream is idle.
+        last_sent = last_event_id or 0
+        try:
+            yield 'retry: 3000\n\n'
+            if last_event_id is not None:
+                for event_id, payload in dispatcher.replay(user_id, last_event_id):
+                    last_sent = event_id
+                    yield _format_event(event_id, 'delta', payload)
+            deadline = time.monotonic() + HEARTBEAT_SECONDS
+            while True:
+                try:
+                    item = subscription.get(timeout=max(0.1, deadline - time.monotonic()))
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    deadline = time.monotonic() + HEARTBEAT_SECONDS
+                    continue
+                if item is None:
+                    # We fell behind; the client should reload its state.
+                    yield _format_event(None, 'resync', '{}')
+                    return
+                event_id, payload = item
+                if event_id > last_sent:
+                    last_sent = event_id
+                    yield _format_event(event_id, 'delta', payload)
+        finally:
+            dispatcher.unsubscribe(user_id, subscription)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let a proxy buffer the stream
+    return response
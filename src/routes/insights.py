@@ -0,0 +1,25 @@
+import math
+from flask import Blueprint, request, jsonify, session, current_app
+from src.routes.auth import login_required
+from src.services.anomalies import detect_anomalies
+
+insights_bp = Blueprint('insights', __name__, url_prefix='/api/insights')
+
+
+@insights_bp.route('/anomalies', methods=['GET'])
+@login_required
+def get_anomalies():
+    """Unusually large expenses and category-months"""
+    user_id = session['user_id']
+    factor = request.args.get('factor', 5.0, type=float)
+    sigma = request.args.get('sigma', 3.0, type=float)
+    window_months = request.args.get('window_months', 6, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    if not (math.isfinite(factor) and math.isfinite(sigma)) or factor <= 1 or sigma <= 0 or not 1 <= window_months <= 36 or not 1 <= limit <= 1000:
+        return jsonify({'error': 'Invalid parameters: factor must be > 1, sigma > 0, window_months 1-36, limit 1-1000'}), 400
+
+    try:
+        return jsonify(detect_anomalies(user_id, factor, sigma, window_months, limit)), 200
+    except Exception as e:
+        current_app.logger.error(f"Error detecting anomalies: {e}")
+        return jsonify({'error': 'Failed to detect anomalies'}), 500
@@ -1,10 +1,15 @@
 from flask import Blueprint, request, jsonify, session, current_app
 from src.models.recurring_transaction import RecurringTransaction
-from src.models.transaction import Transaction, Category # For creating actual transactions
+from src.models.transaction import Transaction, Category, parse_transaction_type # For creating actual transactions
 from src.extensions import db # Import db from extensions.py
+from src.models.money import to_minor
 from src.routes.auth import login_required
+from src.services.idempotency import idempotent
+from src.services.categorization import categorize
+from src.services.owned_rows import record_write, update_owned
 from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta # For easier date calculations
+from sqlalchemy.orm import selectinload
 
 recurring_transaction_bp = Blueprint('recurring_transaction', __name__, url_prefix='/api/recurring-transactions')
 
@@ -23,8 +28,35 @@ def calculate_next_due_date(start_date, frequency, interval, current_next_due=No
     else:
         raise ValueError("Invalid frequency")
 
+def _first_due_date(start_date, frequency, interval, end_date):
+    """(next due date on or after today, whether it is still within end_date) for a schedule."""
+    calculated_next_due = start_date
+    today = date.today()
+    can_be_active = True
+
+    while calculated_next_due < today:
+        if end_date and calculated_next_due > end_date:
+            can_be_active = False
+            break
+        potential_next = calculate_next_due_date(start_date, frequency, interval, current_next_due=calculated_next_due)
+        if potential_next <= calculated_next_due:
+            raise RuntimeError(f"Next due date calculation did not advance: {calculated_next_due} -> {potential_next}")
+        calculated_next_due = potential_next
+
+        if end_date and calculated_next_due > end_date:
+            can_be_active = False # Advanced past end_date
+            break
+
+    if end_date and calculated_next_due > end_date: # Final check
+        can_be_active = False
+    return calculated_next_due, can_be_active
+
+# Columns a schedule change reads first, since the next due date depends on all of them.
+SCHEDULE_COLUMNS = ('start_date', 'end_date', 'frequency', 'interval')
+
 @recurring_transaction_bp.route('', methods=['POST'])
 @login_required
+@idempotent
 def create_recurring_transaction():
     data = request.json
     user_id = session['user_id']
@@ -34,8 +66,8 @@ def create_recurring_transaction():
         return jsonify({'error': 'Missing required fields'}), 400
 
     try:
-        amount = float(data['amount'])
-        if amount <= 0:
+        amount_minor = to_minor(data['amount'])
+        if amount_minor <= 0:
             return jsonify({'error': 'Amount must be positive'}), 400
 
         start_date = datetime.strptime(data['start_date_str'], '%Y-%m-%d').date()
@@ -82,12 +114,19 @@ def create_recurring_transaction():
         if not is_active_from_start:
             return jsonify({'error': 'Recurring transaction has no valid future occurrences based on start/end dates.'}), 400
 
+        transaction_type = parse_transaction_type(data['transaction_type'])
+        if transaction_type is None:
+            return jsonify({'error': 'Transaction type must be "income" or "expense"'}), 400
+        category_id = data.get('category_id')
+        if not category_id:
+            category_id = categorize(user_id, data['description'], amount_minor, transaction_type)
+
         new_recurring = RecurringTransaction(
             user_id=user_id,
             description=data['description'],
-            amount=amount,
-            transaction_type=str(data['transaction_type']).lower(),
-            category_id=data.get('category_id'),
+            amount_minor=amount_minor,
+            transaction_type=transaction_type,
+            category_id=category_id,
             frequency=frequency,
             interval=interval,
             start_date=start_date,
@@ -124,77 +163,60 @@ def get_recurring_transactions():
 def update_recurring_transaction(rt_id):
     data = request.json
     user_id = session['user_id']
-    rt = RecurringTransaction.query.filter_by(id=rt_id, user_id=user_id).first()
-
-    if not rt:
-        return jsonify({'error': 'Recurring transaction not found'}), 404
 
     try:
-        if 'description' in data: rt.description = data['description']
-        if 'amount' in data: rt.amount = float(data['amount'])
-        if 'transaction_type' in data: rt.transaction_type = data['transaction_type'].lower()
-        if 'category_id' in data: rt.category_id = data.get('category_id')
-
-        date_params_changed = False
+        values = {}
+        if 'description' in data: values['description'] = data['description']
+        if 'amount' in data: values['amount_minor'] = to_minor(data['amount'])
+        if 'transaction_type' in data:
+            values['transaction_type'] = parse_transaction_type(data['transaction_type'])
+            if values['transaction_type'] is None: return jsonify({'error': 'Invalid transaction type'}), 400
+        if 'category_id' in data: values['category_id'] = data.get('category_id')
+
+        schedule = {}
         if 'frequency' in data:
-            rt.frequency = data['frequency'].lower()
-            if rt.frequency not in ['daily', 'weekly', 'monthly', 'yearly']: return jsonify({'error': 'Invalid frequency type'}), 400
-            date_params_changed = True
+            schedule['frequency'] = data['frequency'].lower()
+            if schedule['frequency'] not in ['daily', 'weekly', 'monthly', 'yearly']: return jsonify({'error': 'Invalid frequency type'}), 400
         if 'interval' in data:
-            rt.interval = int(data['interval'])
-            if rt.interval <=0: return jsonify({'error': 'Interval must be positive'}), 400
-            date_params_changed = True
+            schedule['interval'] = int(data['interval'])
+            if schedule['interval'] <=0: return jsonify({'error': 'Interval must be positive'}), 400
         if 'start_date_str' in data:
-            rt.start_date = datetime.strptime(data['start_date_str'], '%Y-%m-%d').date()
-            date_params_changed = True
+            schedule['start_date'] = datetime.strptime(data['start_date_str'], '%Y-%m-%d').date()
         if 'end_date_str' in data:
-            rt.end_date = datetime.strptime(data['end_date_str'], '%Y-%m-%d').date() if data['end_date_str'] else None
-            date_params_changed = True
-            if rt.end_date and rt.end_date < rt.start_date: return jsonify({'error': 'End date cannot be before start date'}), 400
+            schedule['end_date'] = datetime.strptime(data['end_date_str'], '%Y-%m-%d').date() if data['end_date_str'] else None
 
         user_set_active_status = data.get('is_active')
-
-        if date_params_changed:
-            # Recalculate next_due_date based on potentially new start_date, frequency, interval
-            calculated_next_due = rt.start_date
-            today = date.today()
-            can_be_active = True
-
-            while calculated_next_due < today:
-                if rt.end_date and calculated_next_due > rt.end_date:
-                    can_be_active = False
-                    break
-                try:
-                    potential_next = calculate_next_due_date(rt.start_date, rt.frequency, rt.interval, current_next_due=calculated_next_due)
-                except ValueError:
-                    return jsonify({'error': 'Invalid frequency for date calculation during update'}), 400
-
-                if potential_next <= calculated_next_due:
-                    current_app.logger.error(f"Update: Next due date calculation did not advance: {calculated_next_due} -> {potential_next}")
-                    return jsonify({'error': 'Internal error calculating next due date progression during update.'}), 500
-                calculated_next_due = potential_next
-
-                if rt.end_date and calculated_next_due > rt.end_date:
-                    can_be_active = False # Advanced past end_date
-                    break
-            
-            if rt.end_date and calculated_next_due > rt.end_date: # Final check
-                can_be_active = False
-
-            rt.next_due_date = calculated_next_due # Update next_due_date
-            rt.is_active = can_be_active # Set active status based on calculation
-
-        # Apply user's explicit is_active choice if provided
         if user_set_active_status is not None:
-            if not bool(user_set_active_status): # If user wants to deactivate
-                rt.is_active = False
-            elif date_params_changed and not rt.is_active : # User wants to activate, but calculation made it inactive
-                pass # It remains inactive due to date constraints
-            else: # User wants to activate and it's possible, or no date params changed
-                rt.is_active = True
-
+            values['is_active'] = bool(user_set_active_status)
+
+        def new_values(old):
+            """Recalculates next_due_date from the schedule as it will be after the update."""
+            row = {**values, **schedule}
+            start_date, end_date, frequency, interval = (row.get(name, getattr(old, name)) for name in SCHEDULE_COLUMNS)
+            if 'end_date' in schedule and end_date and end_date < start_date:
+                raise ValueError('End date cannot be before start date')
+            row['next_due_date'], can_be_active = _first_due_date(start_date, frequency, interval, end_date)
+            # The user can deactivate it, but not activate one whose schedule has ended
+            row['is_active'] = can_be_active and values.get('is_active', True)
+            return row
+
+        if schedule:
+            try:
+                rt, _ = update_owned(RecurringTransaction, rt_id, user_id, new_values, read=SCHEDULE_COLUMNS,
+                                     options=[selectinload(RecurringTransaction.category)])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        else:
+            rt, _ = update_owned(RecurringTransaction, rt_id, user_id, values,
+                                 options=[selectinload(RecurringTransaction.category)])
+        if not rt:
+            return jsonify({'error': 'Recurring transaction not found'}), 404
+
+        if values or schedule:
+            record_write(user_id, 'recurring_transaction', 'updated', rt)
+        response = {'message': 'Recurring transaction updated', 'recurring_transaction': rt.to_dict()}
         db.session.commit()
-        return jsonify({'message': 'Recurring transaction updated', 'recurring_transaction': rt.to_dict()}), 200
+        return jsonify(response), 200
     except ValueError as e:
         return jsonify({'error': f'Invalid data: {str(e)}'}), 400
     except Exception as e:
@@ -206,15 +228,14 @@ def update_recurring_transaction(rt_id):
 @login_required
 def delete_recurring_transaction(rt_id):
     user_id = session['user_id']
-    rt = RecurringTransaction.query.filter_by(id=rt_id, user_id=user_id).first()
-
-    if not rt:
-        return jsonify({'error': 'Recurring transaction not found'}), 404
 
     try:
         # Instead of deleting, we can mark as inactive
-        # db.session.delete(rt)
-        rt.is_active = False
+        rt, _ = update_owned(RecurringTransaction, rt_id, user_id, {'is_active': False})
+        if not rt:
+            return jsonify({'error': 'Recurring transaction not found'}), 404
+
+        record_write(user_id, 'recurring_transaction', 'updated', rt)
         db.session.commit()
         return jsonify({'message': 'Recurring transaction deactivated'}), 200
     except Exception as e:
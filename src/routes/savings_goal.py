@@ -1,14 +1,23 @@
 from flask import Blueprint, request, jsonify, session, current_app
 from src.models.savings_goal import SavingsGoal
+from src.models.savings_contribution import SavingsContribution
 from src.extensions import db
+from src.models.money import to_minor
 from src.routes.auth import login_required
+from src.services.group_commit import commit_write
+from src.services.idempotency import idempotent
+from src.services.owned_rows import delete_owned, record_write, update_owned
+from src.services.result_cache import cached_result
+from src.services.savings_projection import get_goal_projections
 from datetime import datetime, date
-from sqlalchemy import case
+from sqlalchemy import bindparam, case, delete, update
+from sqlalchemy.exc import IntegrityError
 
 savings_goal_bp = Blueprint('savings_goal', __name__, url_prefix='/api/savings-goals')
 
 @savings_goal_bp.route('', methods=['POST'])
 @login_required
+@idempotent
 def create_savings_goal():
     data = request.json
     user_id = session['user_id']
@@ -22,8 +31,8 @@ def create_savings_goal():
         name_payload = data.get('name') # 'name' is in required_fields, so key should exist
         name = str(name_payload).strip() if name_payload is not None else ""
 
-        target_amount = float(data['target_amount'])
-        current_amount = float(data.get('current_amount', 0.0))
+        target_amount_minor = to_minor(data['target_amount'])
+        current_amount_minor = to_minor(data.get('current_amount') or 0)
         target_date_str = data.get('target_date')
         description_payload = data.get('description')
         description = str(description_payload).strip() if description_payload is not None else ""
@@ -34,11 +43,11 @@ def create_savings_goal():
 
         if not name:
             return jsonify({'error': 'Goal name cannot be empty'}), 400
-        if target_amount <= 0:
+        if target_amount_minor <= 0:
             return jsonify({'error': 'Target amount must be positive'}), 400
-        if current_amount < 0:
+        if current_amount_minor < 0:
             return jsonify({'error': 'Current amount cannot be negative'}), 400
-        if current_amount > target_amount:
+        if current_amount_minor > target_amount_minor:
             return jsonify({'error': 'Current amount cannot exceed target amount initially'}), 400
 
         target_date = None
@@ -51,8 +60,8 @@ def create_savings_goal():
         new_goal = SavingsGoal(
             user_id=user_id,
             name=name,
-            target_amount=target_amount,
-            current_amount=current_amount,
+            target_amount_minor=target_amount_minor,
+            current_amount_minor=current_amount_minor,
             target_date=target_date,
             description=description,
             priority=priority
@@ -67,10 +76,8 @@ def create_savings_goal():
         current_app.logger.error(f"Error creating savings goal: {e}")
         return jsonify({'error': 'Failed to create savings goal'}), 500
 
-@savings_goal_bp.route('', methods=['GET'])
-@login_required
-def get_savings_goals():
-    user_id = session['user_id']
+def list_savings_goals(user_id):
+    """The user's goals in display order, each with its projection."""
     # Define custom order for priority: high, then medium, then low
     priority_order = case(
         (SavingsGoal.priority == 'high', 1),
@@ -79,45 +86,56 @@ def get_savings_goals():
         else_=4 # Should not happen with validation
     )
     goals = SavingsGoal.query.filter_by(user_id=user_id).order_by(priority_order.asc(), SavingsGoal.target_date.asc(), SavingsGoal.created_at.desc()).all()
-    return jsonify([goal.to_dict() for goal in goals]), 200
+    projections = get_goal_projections(user_id, goals)
+    return [dict(goal.to_dict(), projection=projections.get(goal.id)) for goal in goals]
+
+@savings_goal_bp.route('', methods=['GET'])
+@login_required
+@cached_result('savings_goals')
+def get_savings_goals():
+    user_id = session['user_id']
+    return jsonify(list_savings_goals(user_id)), 200
 
 @savings_goal_bp.route('/<int:goal_id>', methods=['PUT'])
 @login_required
 def update_savings_goal(goal_id):
     data = request.json
     user_id = session['user_id']
-    goal = SavingsGoal.query.filter_by(id=goal_id, user_id=user_id).first()
-
-    if not goal:
-        return jsonify({'error': 'Savings goal not found or not authorized'}), 404
 
     try:
+        values = {}
         if 'name' in data:
             name_payload = data.get('name')
-            goal.name = str(name_payload).strip() if name_payload is not None else ""
-            if not goal.name:
+            values['name'] = str(name_payload).strip() if name_payload is not None else ""
+            if not values['name']:
                  return jsonify({'error': 'Goal name cannot be empty'}), 400
-        if 'target_amount' in data: goal.target_amount = float(data['target_amount'])
-        if 'current_amount' in data: goal.current_amount = float(data['current_amount']) # Allow direct update for flexibility
+        if 'target_amount' in data:
+            values['target_amount_minor'] = to_minor(data['target_amount'])
+            if values['target_amount_minor'] <= 0: return jsonify({'error': 'Target amount must be positive'}), 400
+        if 'current_amount' in data: # Allow direct update for flexibility
+            values['current_amount_minor'] = to_minor(data['current_amount'])
+            if values['current_amount_minor'] < 0: return jsonify({'error': 'Current amount cannot be negative'}), 400
+            # We might allow current_amount > target_amount if they over-save or adjust target later
         if 'target_date' in data:
-            goal.target_date = datetime.strptime(data['target_date'], '%Y-%m-%d').date() if data['target_date'] else None
+            values['target_date'] = datetime.strptime(data['target_date'], '%Y-%m-%d').date() if data['target_date'] else None
         if 'description' in data:
             desc_payload = data.get('description')
-            goal.description = str(desc_payload).strip() if desc_payload is not None else ""
+            values['description'] = str(desc_payload).strip() if desc_payload is not None else ""
         if 'priority' in data:
             priority_payload = data.get('priority')
-            goal.priority = str(priority_payload).lower() if priority_payload else 'medium'
-            if goal.priority not in ['low', 'medium', 'high']:
+            values['priority'] = str(priority_payload).lower() if priority_payload else 'medium'
+            if values['priority'] not in ['low', 'medium', 'high']:
                 return jsonify({'error': "Invalid priority. Must be 'low', 'medium', or 'high'."}), 400
 
-        if not goal.name: # Re-check name after potential update
-            return jsonify({'error': 'Goal name cannot be empty after update'}), 400
-        if goal.target_amount <= 0: return jsonify({'error': 'Target amount must be positive'}), 400
-        if goal.current_amount < 0: return jsonify({'error': 'Current amount cannot be negative'}), 400
-        # We might allow current_amount > target_amount if they over-save or adjust target later
+        goal, _ = update_owned(SavingsGoal, goal_id, user_id, values)
+        if not goal:
+            return jsonify({'error': 'Savings goal not found or not authorized'}), 404
 
+        if values:
+            record_write(user_id, 'savings_goal', 'updated', goal)
+        response = {'message': 'Savings goal updated successfully', 'savings_goal': goal.to_dict()}
         db.session.commit()
-        return jsonify({'message': 'Savings goal updated successfully', 'savings_goal': goal.to_dict()}), 200
+        return jsonify(response), 200
     except ValueError:
         return jsonify({'error': 'Invalid data format'}), 400
     except Exception as e:
@@ -129,13 +147,13 @@ def update_savings_goal(goal_id):
 @login_required
 def delete_savings_goal(goal_id):
     user_id = session['user_id']
-    goal = SavingsGoal.query.filter_by(id=goal_id, user_id=user_id).first()
-
-    if not goal:
-        return jsonify({'error': 'Savings goal not found or not authorized'}), 404
 
     try:
-        db.session.delete(goal)
+        if not delete_owned(SavingsGoal, goal_id, user_id):
+            return jsonify({'error': 'Savings goal not found or not authorized'}), 404
+
+        db.session.execute(delete(SavingsContribution.__table__).where(SavingsContribution.goal_id == goal_id))
+        record_write(user_id, 'savings_goal', 'deleted', {'id': goal_id})
         db.session.commit()
         return jsonify({'message': 'Savings goal deleted successfully'}), 200
     except Exception as e:
@@ -143,30 +161,173 @@ def delete_savings_goal(goal_id):
         current_app.logger.error(f"Error deleting savings goal {goal_id}: {e}")
         return jsonify({'error': 'Failed to delete savings goal'}), 500
 
+def _get_idempotency_key(data):
+    """
+    Reads the contribution's ledger key from the payload. The Idempotency-Key
+    header is handled by @idempotent, which replays the whole response.
+    """
+    key = (data or {}).get('idempotency_key')
+    if key is None:
+        return None
+    key = str(key).strip()
+    if not key or len(key) > 64:
+        raise ValueError('Idempotency key must be 1-64 characters')
+    return key
+
+def _replayed_contribution(previous, goal_id, amount_minor):
+    """The response to a retried contribution, or a 422 if the key was used for a different one."""
+    if previous.goal_id != goal_id or previous.amount_minor != amount_minor:
+        return jsonify({'error': 'idempotency_key was already used for a different contribution'}), 422
+    goal = SavingsGoal.query.get(previous.goal_id)
+    return jsonify({'message': 'Contribution already applied', 'savings_goal': goal.to_dict(),
+                    'contribution': previous.to_dict()}), 200
+
 @savings_goal_bp.route('/<int:goal_id>/contribute', methods=['POST'])
 @login_required
+@idempotent
 def contribute_to_savings_goal(goal_id):
     data = request.json
     user_id = session['user_id']
-    goal = SavingsGoal.query.filter_by(id=goal_id, user_id=user_id).first()
 
-    if not goal:
-        return jsonify({'error': 'Savings goal not found or not authorized'}), 404
+    try:
+        amount_minor = to_minor((data or {}).get('amount') or 0)
+        idempotency_key = _get_idempotency_key(data)
+    except ValueError:
+        return jsonify({'error': 'Invalid contribution amount'}), 400
+    if amount_minor <= 0:
+        return jsonify({'error': 'Contribution amount must be positive'}), 400
 
     try:
-        amount = float(data.get('amount', 0.0))
-        if amount <= 0:
-            return jsonify({'error': 'Contribution amount must be positive'}), 400
+        if idempotency_key:
+            previous = SavingsContribution.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+            if previous:
+                return _replayed_contribution(previous, goal_id, amount_minor)
 
-        goal.current_amount += amount
-        # Optional: Create a transaction record here if desired for full financial tracking
-        # For now, just updating the goal's current_amount.
+        def contribute(session):
+            # One atomic increment: concurrent contributions can't overwrite each other
+            # and the ownership check is part of the same statement.
+            result = session.execute(
+                update(SavingsGoal)
+                .where(SavingsGoal.id == goal_id, SavingsGoal.user_id == user_id)
+                .values(current_amount_minor=SavingsGoal.current_amount_minor + amount_minor)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                return None
 
-        db.session.commit()
-        return jsonify({'message': 'Contribution successful', 'savings_goal': goal.to_dict()}), 200
-    except ValueError:
-        return jsonify({'error': 'Invalid contribution amount'}), 400
+            contribution = SavingsContribution(goal_id=goal_id, user_id=user_id, amount_minor=amount_minor,
+                                               idempotency_key=idempotency_key)
+            session.add(contribution)
+            session.flush()
+            goal = session.get(SavingsGoal, goal_id, populate_existing=True)
+            return goal.to_dict(), contribution.to_dict()
+
+        applied = commit_write(user_id, contribute)
+        if applied is None:
+            return jsonify({'error': 'Savings goal not found or not authorized'}), 404
+    except IntegrityError:
+        # A concurrent retry with the same key committed first; ours was rolled back whole.
+        db.session.rollback()
+        previous = SavingsContribution.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+        if not previous:
+            return jsonify({'error': 'Failed to contribute to savings goal'}), 500
+        return _replayed_contribution(previous, goal_id, amount_minor)
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error contributing to savings goal {goal_id}: {e}")
-        return jsonify({'error': 'Failed to contribute to savings goal'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to contribute to savings goal'}), 500
+
+    goal, contribution = applied
+    return jsonify({'message': 'Contribution successful', 'savings_goal': goal, 'contribution': contribution}), 200
+
+@savings_goal_bp.route('/contributions/bulk', methods=['POST'])
+@login_required
+@idempotent
+def bulk_contribute_to_savings_goals():
+    """Apply many contributions in one commit. Body: {"contributions": [{goal_id, amount, idempotency_key?}, ...]}"""
+    data = request.json
+    user_id = session['user_id']
+    items = data.get('contributions') if isinstance(data, dict) else data
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'A non-empty list of contributions is required'}), 400
+
+    contributions = []
+    seen_keys = set()
+    try:
+        for index, item in enumerate(items):
+            goal_id = int(item['goal_id'])
+            amount_minor = to_minor(item.get('amount') or 0)
+            key = item.get('idempotency_key')
+            key = str(key).strip() if key else None
+            if amount_minor <= 0:
+                return jsonify({'error': f'Contribution {index}: amount must be positive'}), 400
+            if key and (len(key) > 64 or key in seen_keys):
+                return jsonify({'error': f'Contribution {index}: invalid or duplicate idempotency key'}), 400
+            if key:
+                seen_keys.add(key)
+            contributions.append((goal_id, amount_minor, key))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Each contribution needs a valid goal_id and amount'}), 400
+
+    try:
+        # Skip contributions whose keys were already applied by an earlier attempt.
+        replayed = {}
+        if seen_keys:
+            replayed = {row.idempotency_key: (row.goal_id, row.amount_minor) for row in db.session.query(
+                SavingsContribution.idempotency_key, SavingsContribution.goal_id, SavingsContribution.amount_minor
+            ).filter(
+                SavingsContribution.user_id == user_id,
+                SavingsContribution.idempotency_key.in_(seen_keys)
+            )}
+        for index, (goal_id, amount_minor, key) in enumerate(contributions):
+            if key in replayed and replayed[key] != (goal_id, amount_minor):
+                return jsonify({'error': f'Contribution {index}: idempotency_key was already used for a different contribution'}), 422
+        pending = [c for c in contributions if c[2] not in replayed]
+
+        goal_ids = {goal_id for goal_id, _, _ in pending}
+        owned = {goal_id for (goal_id,) in db.session.query(SavingsGoal.id).filter(
+            SavingsGoal.user_id == user_id, SavingsGoal.id.in_(goal_ids))}
+        missing = goal_ids - owned
+        if missing:
+            return jsonify({'error': f'Savings goal(s) not found or not authorized: {sorted(missing)}'}), 404
+
+        totals = {}
+        for goal_id, amount_minor, _ in pending:
+            totals[goal_id] = totals.get(goal_id, 0) + amount_minor
+        if totals:
+            goals_table = SavingsGoal.__table__
+            db.session.execute(
+                goals_table.update()
+                .where(goals_table.c.id == bindparam('goal_id'), goals_table.c.user_id == user_id)
+                .values(current_amount_minor=goals_table.c.current_amount_minor + bindparam('delta')),
+                [{'goal_id': goal_id, 'delta': delta} for goal_id, delta in totals.items()]
+            )
+            db.session.add_all([
+                SavingsContribution(goal_id=goal_id, user_id=user_id, amount_minor=amount_minor, idempotency_key=key)
+                for goal_id, amount_minor, key in pending
+            ])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'A contribution with the same idempotency key is being applied concurrently. Retry the request.'}), 409
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error applying bulk contributions: {e}")
+        return jsonify({'error': 'Failed to apply contributions'}), 500
+
+    goals = SavingsGoal.query.filter(SavingsGoal.user_id == user_id, SavingsGoal.id.in_(owned)).all() if owned else []
+    return jsonify({
+        'message': 'Contributions applied',
+        'applied_count': len(pending),
+        'replayed_count': len(contributions) - len(pending),
+        'savings_goals': [goal.to_dict() for goal in goals]
+    }), 200
+
+@savings_goal_bp.route('/<int:goal_id>/contributions', methods=['GET'])
+@login_required
+def get_savings_goal_contributions(goal_id):
+    user_id = session['user_id']
+    contributions = SavingsContribution.query.filter_by(goal_id=goal_id, user_id=user_id)\
+        .order_by(SavingsContribution.created_at.desc()).all()
+    return jsonify([c.to_dict() for c in contributions]), 200
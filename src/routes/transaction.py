@@ -1,52 +1,148 @@
-from flask import Blueprint, request, Response, jsonify, g, current_app, session
+from flask import Blueprint, request, Response, jsonify, g, current_app, session, stream_with_context
 from src.models.user import User
-from src.models.transaction import Transaction, Category
+from src.models.transaction import Transaction, Category, parse_transaction_type
+from src.models.archived_transaction import ArchivedTransaction
 from src.routes.auth import login_required
+from src.services.idempotency import idempotent
+from src.services.admission import admitted
 from datetime import datetime, date
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, case, func, insert, select, type_coerce, String
+from sqlalchemy.orm import joinedload, selectinload
 from src.extensions import db
+from src.models.money import to_minor, to_major, format_money, CURRENCY_CODE
+from src.services.categorization import categorize, get_rule_matcher
+from src.services.archive import reaches_archive, newest_first, archived_totals, with_archived_spending, transaction_rows
+from src.services.columnar import (BATCH_ROWS, EXTENSIONS, MIMETYPES, ColumnarImportError, ColumnarUnavailable,
+                                   iter_export, read_table, table_to_rows)
+from src.services.data_version import bump_data_version
+from src.services.budget_alerts import EXPENSE_COLUMNS, expense_changes, expense_deltas, record_expenses
+from src.services.group_commit import commit_write
+from src.services.owned_rows import delete_owned, record_write, update_owned
+from src.services.pdf_report import get_pdf_renderer, iter_file
+from src.services.result_cache import cached_result
 import csv
+import functools
 import io
-from weasyprint import HTML
+import itertools
+import os
 
 transaction_bp = Blueprint('transaction', __name__)
 
+# Admission costs of the expensive endpoints (see src/services/admission.py).
+CSV_EXPORT_COST = 3
+COLUMNAR_EXPORT_COST = 3
+PDF_EXPORT_COST = 10
+LARGE_LISTING_ROWS = 200  # longer listings, or limit=all, cost as much as a CSV export
+
 # --- Refactored Helper Function ---
-def _get_filtered_transactions_query(user_id):
+def _parse_date_arg(name, args=None):
+    """Returns the YYYY-MM-DD request arg as a date, or None if missing or invalid."""
+    value = (request.args if args is None else args).get(name)
+    if value:
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            pass  # Silently ignore invalid date format for filtering
+    return None
+
+def _transaction_filters(columns, args=None):
     """
-    Returns a SQLAlchemy query object for transactions based on request args.
-    This reduces code duplication across multiple routes.
+    Filter conditions from the request args (or ``args``, a MultiDict of
+    them), over ``columns``: a transaction model, or the ``.c`` of a
+    selectable with the same columns.
     """
-    query = Transaction.query.filter_by(user_id=user_id)
-
-    category_id = request.args.get('category_id', type=int)
-    transaction_type = request.args.get('type')
-    start_date_str = request.args.get('start_date')
-    end_date_str = request.args.get('end_date')
+    args = request.args if args is None else args
+    conditions = []
+    category_id = args.get('category_id', type=int)
+    transaction_type = args.get('type')
+    start_date_obj = _parse_date_arg('start_date', args)
+    end_date_obj = _parse_date_arg('end_date', args)
 
     if category_id:
-        query = query.filter_by(category_id=category_id)
+        conditions.append(columns.category_id == category_id)
     
     if transaction_type and transaction_type in ['income', 'expense']:
-        query = query.filter_by(transaction_type=transaction_type)
+        conditions.append(columns.transaction_type == transaction_type)
     
-    if start_date_str:
-        try:
-            start_date_obj = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            query = query.filter(Transaction.date >= start_date_obj)
-        except ValueError:
-            # Silently ignore invalid date format for filtering
-            pass
+    if start_date_obj:
+        conditions.append(columns.date >= start_date_obj)
     
-    if end_date_str:
-        try:
-            end_date_obj = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-            query = query.filter(Transaction.date <= end_date_obj)
-        except ValueError:
-            # Silently ignore invalid date format
-            pass
+    if end_date_obj:
+        conditions.append(columns.date <= end_date_obj)
             
-    return query
+    return conditions
+
+def _newest_transactions_statement(user_id, model, limit=None, args=None):
+    """
+    SELECT of the user's transactions matching the request args, newest
+    first, with their categories. ``model`` may be ArchivedTransaction to
+    apply the same filters to the archive.
+    """
+    statement = select(model).options(joinedload(model.category))\
+        .where(model.user_id == user_id, *_transaction_filters(model, args))\
+        .order_by(model.date.desc(), model.created_at.desc())
+    return statement.limit(limit) if limit is not None else statement
+
+def _get_filtered_transactions(user_id, limit=None):
+    """
+    Filtered transactions, newest first. Archived transactions are merged in
+    only when the requested date range reaches into the archive.
+    """
+    def newest(model):
+        return db.session.scalars(_newest_transactions_statement(user_id, model, limit)).unique().all()
+
+    transactions = newest(Transaction)
+    if reaches_archive(user_id, _parse_date_arg('start_date')):
+        transactions = newest_first(transactions, newest(ArchivedTransaction), limit)
+    return transactions
+
+def _parse_limit(args=None):
+    """The listing's ``limit`` arg: a positive row count, or None for ``limit=all``. Raises ValueError."""
+    value = (request.args if args is None else args).get('limit', '50')
+    if value == 'all':
+        return None
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    return limit
+
+def _listing_cost(args=None):
+    """Admission cost of a transaction listing: free up to LARGE_LISTING_ROWS rows."""
+    try:
+        limit = _parse_limit(args)
+    except ValueError:
+        return 0  # the listing answers with a 400
+    return 0 if limit is not None and limit <= LARGE_LISTING_ROWS else CSV_EXPORT_COST
+
+def _transactions_csv(transactions):
+    """The CSV export of ``transactions`` (with their categories loaded), summary rows included."""
+    total_income_minor = sum(t.amount_minor for t in transactions if t.transaction_type == 'income')
+    total_expense_minor = sum(t.amount_minor for t in transactions if t.transaction_type == 'expense')
+    net_balance_minor = total_income_minor - total_expense_minor
+
+    output = io.StringIO()
+    csv_writer = csv.writer(output)
+
+    headers = ['Date', 'Description', 'Amount', 'Type', 'Category']
+    csv_writer.writerow(headers)
+
+    for t in transactions:
+        category_name = t.category.name if t.category else ''
+        csv_writer.writerow([
+            t.date.strftime('%Y-%m-%d') if t.date else '',
+            t.description,
+            t.amount,
+            t.transaction_type,
+            category_name
+        ])
+
+    # Add summary rows
+    csv_writer.writerow([]) # Empty row for spacing
+    csv_writer.writerow(['Summary:'])
+    csv_writer.writerow(['Total Income:', format_money(total_income_minor)])
+    csv_writer.writerow(['Total Expenses:', format_money(total_expense_minor)])
+    csv_writer.writerow(['Net Balance:', format_money(net_balance_minor)])
+    return output.getvalue()
 
 # --- Routes ---
 
@@ -63,15 +159,17 @@ def get_categories():
 
 @transaction_bp.route('/transactions', methods=['GET'])
 @login_required
+@admitted(_listing_cost)
 def get_transactions():
     """Get user's transactions with optional filtering"""
     try:
         user_id = session['user_id']
-        limit = request.args.get('limit', 50, type=int)
-        
-        query = _get_filtered_transactions_query(user_id)
+        try:
+            limit = _parse_limit()
+        except ValueError:
+            return jsonify({'error': 'limit must be a positive number of rows, or "all"'}), 400
         
-        transactions = query.order_by(Transaction.date.desc(), Transaction.created_at.desc()).limit(limit).all()
+        transactions = _get_filtered_transactions(user_id, limit)
         
         return jsonify([transaction.to_dict() for transaction in transactions]), 200
         
@@ -79,71 +177,172 @@ def get_transactions():
         current_app.logger.error(f"Error getting transactions: {e}")
         return jsonify({'error': 'Failed to get transactions'}), 500
 
+def _build_transaction(data, user_id, matcher=None, category_ids=None):
+    """
+    Validates a transaction payload and builds an unsaved Transaction.
+    Returns (transaction, error_message). Uncategorized transactions are run
+    through the user's category rules. ``category_ids``, if given, is the set
+    of valid category ids, saving a lookup per transaction.
+    """
+    if not isinstance(data, dict):
+        return None, 'Transaction must be an object'
+    if not data or not data.get('amount') or not data.get('transaction_type'):
+        return None, 'Amount and transaction type are required'
+
+    try:
+        amount_minor = to_minor(data['amount'])
+    except ValueError:
+        return None, 'Invalid amount format'
+    transaction_type = parse_transaction_type(data['transaction_type'])
+    description = (data.get('description') or '').strip()
+    category_id = data.get('category_id')
+
+    if transaction_type is None:
+        return None, 'Transaction type must be "income" or "expense"'
+
+    if amount_minor <= 0:
+        return None, 'Amount must be positive'
+
+    if category_id:
+        if category_ids is None:
+            valid = Category.query.get(category_id) is not None
+        else:
+            valid = str(category_id).isdigit() and int(category_id) in category_ids
+            category_id = int(category_id) if valid else category_id
+        if not valid:
+            return None, 'Invalid category ID'
+    else:
+        category_id = categorize(user_id, description, amount_minor, transaction_type, matcher=matcher)
+
+    transaction_date = date.today()
+    if data.get('date'):
+        try:
+            transaction_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+        except ValueError:
+            return None, 'Invalid date format. Use YYYY-MM-DD'
+
+    transaction = Transaction(
+        amount_minor=amount_minor,
+        description=description,
+        transaction_type=transaction_type,
+        date=transaction_date,
+        user_id=user_id,
+        category_id=category_id
+    )
+    return transaction, None
+
+def _insert_transaction(transaction, session):
+    session.add(transaction)
+    session.flush()
+    return transaction.to_dict()
+
 @transaction_bp.route('/transactions', methods=['POST'])
 @login_required
+@idempotent
 def create_transaction():
     """Create a new transaction"""
     try:
         data = request.json
         user_id = session['user_id']
         
-        if not data or not data.get('amount') or not data.get('transaction_type'):
-            return jsonify({'error': 'Amount and transaction type are required'}), 400
-        
-        amount = float(data['amount'])
-        transaction_type = data['transaction_type'].lower()
-        description = data.get('description', '').strip()
-        category_id = data.get('category_id')
-        
-        if transaction_type not in ['income', 'expense']:
-            return jsonify({'error': 'Transaction type must be "income" or "expense"'}), 400
-        
-        if amount <= 0:
-            return jsonify({'error': 'Amount must be positive'}), 400
-        
-        if category_id:
-            category = Category.query.get(category_id)
-            if not category:
-                return jsonify({'error': 'Invalid category ID'}), 400
-        
-        transaction_date = date.today()
-        if data.get('date'):
-            try:
-                transaction_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-            except ValueError:
-                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-        
-        transaction = Transaction(
-            amount=amount,
-            description=description,
-            transaction_type=transaction_type,
-            date=transaction_date,
-            user_id=user_id,
-            category_id=category_id
-        )
-        
-        db.session.add(transaction)
-        db.session.commit()
+        transaction, error = _build_transaction(data, user_id)
+        if error:
+            return jsonify({'error': error}), 400
         
         return jsonify({
             'message': 'Transaction created successfully',
-            'transaction': transaction.to_dict()
+            'transaction': commit_write(user_id, functools.partial(_insert_transaction, transaction))
         }), 201
         
-    except ValueError:
-        return jsonify({'error': 'Invalid amount format'}), 400
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error creating transaction: {e}")
         return jsonify({'error': 'Failed to create transaction'}), 500
 
+@transaction_bp.route('/transactions/bulk', methods=['POST'])
+@login_required
+@idempotent
+def bulk_import_transactions():
+    """Import many transactions in one commit. Accepts a list or {"transactions": [...]}"""
+    try:
+        data = request.json
+        user_id = session['user_id']
+        items = data.get('transactions') if isinstance(data, dict) else data
+
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'A non-empty list of transactions is required'}), 400
+
+        # Compile the user's rules and load the categories once for the whole import.
+        matcher = get_rule_matcher(user_id)
+        category_ids = {category_id for (category_id,) in db.session.query(Category.id)}
+        transactions = []
+        for index, item in enumerate(items):
+            transaction, error = _build_transaction(item, user_id, matcher=matcher, category_ids=category_ids)
+            if error:
+                return jsonify({'error': f'Transaction {index}: {error}'}), 400
+            transactions.append(transaction)
+
+        db.session.add_all(transactions)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Transactions imported successfully',
+            'imported_count': len(transactions),
+            'categorized_count': sum(1 for item, t in zip(items, transactions)
+                                     if t.category_id and not item.get('category_id'))
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error importing transactions: {e}")
+        return jsonify({'error': 'Failed to import transactions'}), 500
+
+@transaction_bp.route('/transactions/bulk/<any(parquet, arrow):fmt>', methods=['POST'])
+@login_required
+@idempotent
+def bulk_import_transactions_columnar(fmt):
+    """Import transactions from a Parquet file or Arrow IPC stream (request body or a 'file' upload) in one commit"""
+    try:
+        user_id = session['user_id']
+        upload = request.files.get('file')
+        data = upload.read() if upload else request.get_data()
+        if not data:
+            return jsonify({'error': f'A {fmt} file is required'}), 400
+
+        table = read_table(data, fmt)
+        category_ids = {category_id for (category_id,) in db.session.query(Category.id)}
+        rows = table_to_rows(table, user_id, category_ids, get_rule_matcher(user_id))
+
+        # One multi-row insert; Core writes bump the data version and budget totals themselves.
+        db.session.execute(insert(Transaction.__table__), rows)
+        bump_data_version(user_id)
+        record_expenses(expense_deltas(rows))
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Transactions imported successfully',
+            'imported_count': len(rows),
+            'categorized_count': sum(1 for row in rows if row['category_id'])
+        }), 201
+
+    except ColumnarUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except ColumnarImportError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error importing {fmt} transactions: {e}")
+        return jsonify({'error': 'Failed to import transactions'}), 500
+
 @transaction_bp.route('/transactions/<int:transaction_id>', methods=['GET'])
 @login_required
 def get_transaction(transaction_id):
     """Get a specific transaction"""
     try:
         user_id = session['user_id']
-        transaction = Transaction.query.filter_by(id=transaction_id, user_id=user_id).first()
+        transaction = Transaction.query.filter_by(id=transaction_id, user_id=user_id).first() \
+            or ArchivedTransaction.query.filter_by(id=transaction_id, user_id=user_id).first()
         
         if not transaction:
             return jsonify({'error': 'Transaction not found'}), 404
@@ -154,6 +353,12 @@ def get_transaction(transaction_id):
         current_app.logger.error(f"Error getting transaction {transaction_id}: {e}")
         return jsonify({'error': 'Failed to get transaction'}), 500
 
+def _missing_transaction(transaction_id, user_id):
+    """Error response for a write to a transaction that is not in the live table."""
+    if ArchivedTransaction.query.filter_by(id=transaction_id, user_id=user_id).first():
+        return jsonify({'error': 'Archived transactions are read-only'}), 409
+    return jsonify({'error': 'Transaction not found'}), 404
+
 @transaction_bp.route('/transactions/<int:transaction_id>', methods=['PUT'])
 @login_required
 def update_transaction(transaction_id):
@@ -161,43 +366,49 @@ def update_transaction(transaction_id):
     try:
         data = request.json
         user_id = session['user_id']
-        
-        transaction = Transaction.query.filter_by(id=transaction_id, user_id=user_id).first()
-        if not transaction:
-            return jsonify({'error': 'Transaction not found'}), 404
+        values = {}
         
         if 'amount' in data:
-            amount = float(data['amount'])
-            if amount <= 0: return jsonify({'error': 'Amount must be positive'}), 400
-            transaction.amount = amount
+            values['amount_minor'] = to_minor(data['amount'])
+            if values['amount_minor'] <= 0: return jsonify({'error': 'Amount must be positive'}), 400
         
         if 'description' in data:
-            transaction.description = data['description'].strip()
+            values['description'] = data['description'].strip()
         
         if 'transaction_type' in data:
-            transaction_type = data['transaction_type'].lower()
-            if transaction_type not in ['income', 'expense']: return jsonify({'error': 'Invalid transaction type'}), 400
-            transaction.transaction_type = transaction_type
+            values['transaction_type'] = parse_transaction_type(data['transaction_type'])
+            if values['transaction_type'] is None: return jsonify({'error': 'Invalid transaction type'}), 400
         
         if 'category_id' in data:
-            category_id = data['category_id']
-            if category_id:
-                category = Category.query.get(category_id)
-                if not category: return jsonify({'error': 'Invalid category ID'}), 400
-            transaction.category_id = category_id
+            values['category_id'] = data['category_id']
+            if values['category_id'] and not db.session.get(Category, values['category_id']):
+                return jsonify({'error': 'Invalid category ID'}), 400
         
         if 'date' in data:
             try:
-                transaction.date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+                values['date'] = datetime.strptime(data['date'], '%Y-%m-%d').date()
             except ValueError:
                 return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
         
-        db.session.commit()
+        # Budget totals need the old values of the columns they depend on.
+        read = EXPENSE_COLUMNS if set(values) & set(EXPENSE_COLUMNS) else ()
+        # The response names the category; load it with the row rather than lazily from to_dict().
+        transaction, old = update_owned(Transaction, transaction_id, user_id, (lambda old: values) if read else values, read,
+                                        options=[selectinload(Transaction.category)])
+        if not transaction:
+            return _missing_transaction(transaction_id, user_id)
         
-        return jsonify({
+        if old:
+            record_expenses(expense_changes([transaction], [old]))
+        if values:
+            record_write(user_id, 'transaction', 'updated', transaction, [transaction.date] + ([old.date] if old else []))
+        response = {
             'message': 'Transaction updated successfully',
             'transaction': transaction.to_dict()
-        }), 200
+        }
+        db.session.commit()
+        
+        return jsonify(response), 200
         
     except ValueError:
         return jsonify({'error': 'Invalid amount format'}), 400
@@ -212,12 +423,14 @@ def delete_transaction(transaction_id):
     """Delete a transaction"""
     try:
         user_id = session['user_id']
-        transaction = Transaction.query.filter_by(id=transaction_id, user_id=user_id).first()
+        table = Transaction.__table__
+        deleted = delete_owned(Transaction, transaction_id, user_id, *(table.c[name] for name in EXPENSE_COLUMNS))
         
-        if not transaction:
-            return jsonify({'error': 'Transaction not found'}), 404
+        if not deleted:
+            return _missing_transaction(transaction_id, user_id)
         
-        db.session.delete(transaction)
+        record_expenses(expense_changes([], [deleted]))
+        record_write(user_id, 'transaction', 'deleted', {'id': transaction_id}, [deleted.date])
         db.session.commit()
         
         return jsonify({'message': 'Transaction deleted successfully'}), 200
@@ -229,6 +442,7 @@ def delete_transaction(transaction_id):
 
 @transaction_bp.route('/dashboard', methods=['GET'])
 @login_required
+@cached_result('dashboard')
 def get_dashboard_data():
     """Get dashboard data including balance and recent transactions"""
     try:
@@ -241,29 +455,35 @@ def get_dashboard_data():
         recent_transactions = Transaction.query.filter_by(user_id=user_id)\
             .order_by(Transaction.date.desc(), Transaction.created_at.desc())\
             .limit(10).all()
+        if len(recent_transactions) < 10 and reaches_archive(user_id):
+            recent_transactions = newest_first(recent_transactions, ArchivedTransaction.query.filter_by(user_id=user_id)
+                                               .order_by(ArchivedTransaction.date.desc()).limit(10).all(), 10)
         
-        total_income = db.session.query(func.sum(Transaction.amount))\
-            .filter_by(user_id=user_id, transaction_type='income').scalar() or 0
+        # Archived transactions are counted through their monthly rollups.
+        archived_income, archived_expense = archived_totals(user_id)
+        total_income = (db.session.query(func.sum(Transaction.amount_minor))\
+            .filter_by(user_id=user_id, transaction_type='income').scalar() or 0) + archived_income
         
-        total_expense = db.session.query(func.sum(Transaction.amount))\
-            .filter_by(user_id=user_id, transaction_type='expense').scalar() or 0
+        total_expense = (db.session.query(func.sum(Transaction.amount_minor))\
+            .filter_by(user_id=user_id, transaction_type='expense').scalar() or 0) + archived_expense
         
         balance = total_income - total_expense
         
         category_spending = db.session.query(
             Category.name,
-            func.sum(Transaction.amount).label('total')
+            func.sum(Transaction.amount_minor).label('total')
         ).join(Transaction).filter(
             Transaction.user_id == user_id,
             Transaction.transaction_type == 'expense'
         ).group_by(Category.name).all()
+        category_spending = with_archived_spending(user_id, category_spending)
         
         return jsonify({
-            'balance': balance,
-            'total_income': total_income,
-            'total_expense': total_expense,
+            'balance': to_major(balance),
+            'total_income': to_major(total_income),
+            'total_expense': to_major(total_expense),
             'recent_transactions': [t.to_dict() for t in recent_transactions],
-            'category_spending': [{'category': name, 'amount': float(total)} for name, total in category_spending]
+            'category_spending': [{'category': name, 'amount': to_major(total)} for name, total in category_spending]
         }), 200
         
     except Exception as e:
@@ -272,47 +492,18 @@ def get_dashboard_data():
 
 @transaction_bp.route('/transactions/download/csv', methods=['GET'])
 @login_required
+@admitted(CSV_EXPORT_COST)
 def download_transactions_csv():
     """Download user's transactions as a CSV file with optional filtering"""
     try:
         user_id = session['user_id']
-        query = _get_filtered_transactions_query(user_id)
-        transactions = query.order_by(Transaction.date.desc(), Transaction.created_at.desc()).all()
+        transactions = _get_filtered_transactions(user_id)
 
         if not transactions:
             return jsonify({"message": "No transactions found for the selected criteria."}), 404
 
-        total_income_val = sum(t.amount for t in transactions if t.transaction_type == 'income')
-        total_expense_val = sum(t.amount for t in transactions if t.transaction_type == 'expense')
-        net_balance_val = total_income_val - total_expense_val
-
-        output = io.StringIO()
-        csv_writer = csv.writer(output)
-        
-        headers = ['Date', 'Description', 'Amount', 'Type', 'Category']
-        csv_writer.writerow(headers)
-        
-        for t in transactions:
-            category_name = t.category.name if t.category else ''
-            csv_writer.writerow([
-                t.date.strftime('%Y-%m-%d') if t.date else '',
-                t.description,
-                t.amount,
-                t.transaction_type,
-                category_name
-            ])
-        
-        # Add summary rows
-        csv_writer.writerow([]) # Empty row for spacing
-        csv_writer.writerow(['Summary:'])
-        csv_writer.writerow(['Total Income:', f'{total_income_val:.2f}'])
-        csv_writer.writerow(['Total Expenses:', f'{total_expense_val:.2f}'])
-        csv_writer.writerow(['Net Balance:', f'{net_balance_val:.2f}'])
-            
-        output.seek(0)
-        
         return Response(
-            output.getvalue(),
+            _transactions_csv(transactions),
             mimetype="text/csv",
             headers={"Content-Disposition": "attachment;filename=transactions.csv"}
         )
@@ -321,22 +512,61 @@ def download_transactions_csv():
         current_app.logger.error(f"Error downloading CSV: {e}")
         return jsonify({'error': 'Failed to download transactions as CSV'}), 500
 
+@transaction_bp.route('/transactions/download/<any(parquet, arrow):fmt>', methods=['GET'])
+@login_required
+@admitted(COLUMNAR_EXPORT_COST)
+def download_transactions_columnar(fmt):
+    """Download user's transactions as Parquet or an Arrow IPC stream with optional filtering, oldest first"""
+    try:
+        user_id = session['user_id']
+        rows = transaction_rows(user_id, _parse_date_arg('start_date'))
+        # Dates come back as stored ISO strings; Arrow parses them a whole batch at a time.
+        statement = select(
+            rows.c.id, type_coerce(rows.c.date, String), rows.c.amount_minor, rows.c.transaction_type,
+            rows.c.description, rows.c.category_id, Category.name, type_coerce(rows.c.created_at, String)
+        ).select_from(rows).outerjoin(Category, Category.id == rows.c.category_id)\
+            .where(rows.c.user_id == user_id, *_transaction_filters(rows.c))\
+            .order_by(rows.c.date, rows.c.id)
+        result = db.session.execute(statement, execution_options={'yield_per': BATCH_ROWS})
+
+        chunks = iter_export(result.partitions(), fmt)
+        first = next(chunks)  # raises here rather than mid-stream if pyarrow is missing
+
+        return Response(
+            stream_with_context(itertools.chain([first], chunks)),
+            mimetype=MIMETYPES[fmt],
+            headers={"Content-Disposition": f"attachment;filename=transactions.{EXTENSIONS[fmt]}"}
+        )
+
+    except ColumnarUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except Exception as e:
+        current_app.logger.error(f"Error downloading {fmt}: {e}")
+        return jsonify({'error': f'Failed to download transactions as {fmt}'}), 500
+
 @transaction_bp.route('/transactions/download/pdf', methods=['GET'])
 @login_required
+@admitted(PDF_EXPORT_COST)
 def download_transactions_pdf():
     """Download user's transactions as a PDF file with optional filtering"""
     try:
         user_id = session['user_id']
-        query = _get_filtered_transactions_query(user_id)
-        transactions = query.order_by(Transaction.date.desc(), Transaction.created_at.desc()).all()
+        rows = transaction_rows(user_id, _parse_date_arg('start_date'))
+        conditions = [rows.c.user_id == user_id, *_transaction_filters(rows.c)]
 
-        if not transactions:
-            return jsonify({"message": "No transactions found for the selected criteria."}), 404
+        # Totals for the summary page, computed by SQLite
+        count, total_income_minor, total_expense_minor = db.session.execute(select(
+            func.count(),
+            func.coalesce(func.sum(case((rows.c.transaction_type == 'income', rows.c.amount_minor), else_=0)), 0),
+            func.coalesce(func.sum(case((rows.c.transaction_type == 'expense', rows.c.amount_minor), else_=0)), 0),
+        ).select_from(rows).where(*conditions)).one()
 
-        # Calculate totals
-        total_income_val = sum(t.amount for t in transactions if t.transaction_type == 'income')
-        total_expense_val = sum(t.amount for t in transactions if t.transaction_type == 'expense')
-        net_balance_val = total_income_val - total_expense_val
+        if not count:
+            return jsonify({"message": "No transactions found for the selected criteria."}), 404
+        renderer = get_pdf_renderer()
+        if count > renderer.max_rows:
+            return jsonify({'error': f'Too many transactions for a PDF report; narrow the date range or '
+                                     f'download CSV or Parquet (max {renderer.max_rows} rows)'}), 400
 
         # Prepare filter information for the header
         report_date = date.today().strftime('%Y-%m-%d')
@@ -362,37 +592,23 @@ def download_transactions_pdf():
             if category_filter_obj:
                 filters_applied.append(f"Category: {category_filter_obj.name}")
 
-        filter_html = "<ul>" + "".join(f"<li>{f}</li>" for f in filters_applied) + "</ul>" if filters_applied else "<p>None</p>"
-
-        html_string = f"""<html><head><title>Transaction Report</title>
-<style>body{{font-family:sans-serif; font-size: 10pt;}} 
-h1{{text-align:center;}}
-table{{width:100%; border-collapse:collapse; margin-top: 15px; margin-bottom: 15px;}} 
-th,td{{border:1px solid #ddd; padding:6px; text-align:left;}} 
-th{{background-color: #f2f2f2;}}
-.header-info, .summary-section {{margin-bottom: 20px; padding:10px; border: 1px solid #eee;}}
-.header-info p, .summary-section p {{margin: 5px 0;}}
-</style></head><body>
-<h1>Transaction Report</h1>
-<div class="header-info"><p><strong>Report Generated:</strong> {report_date}</p><p><strong>Filters Applied:</strong></p>{filter_html}</div>
-<table border='1'><tr><th>Date</th><th>Description</th><th>Amount (INR)</th><th>Type</th><th>Category</th></tr>"""
-        for t in transactions:
-            category_name = t.category.name if t.category else ''
-            html_string += f"<tr><td>{t.date.strftime('%Y-%m-%d') if t.date else ''}</td><td>{t.description or ''}</td><td>{t.amount:.2f}</td><td>{t.transaction_type}</td><td>{category_name}</td></tr>"
-        html_string += f"""</table>
-<div class="summary-section"><h3>Summary</h3>
-<p><strong>Total Transactions:</strong> {len(transactions)}</p>
-<p><strong>Total Income:</strong> {total_income_val:.2f} INR</p>
-<p><strong>Total Expenses:</strong> {total_expense_val:.2f} INR</p>
-<p><strong>Net Balance:</strong> {net_balance_val:.2f} INR</p>
-</div></body></html>"""
-
-        pdf_bytes = HTML(string=html_string).write_pdf()
+        # Plain column rows, newest first like the listing, read in partitions
+        statement = select(
+            type_coerce(rows.c.date, String), rows.c.description, rows.c.amount_minor, rows.c.transaction_type, Category.name
+        ).select_from(rows).outerjoin(Category, Category.id == rows.c.category_id)\
+            .where(*conditions).order_by(rows.c.date.desc(), rows.c.created_at.desc())
+        result = db.session.execute(statement, execution_options={'yield_per': BATCH_ROWS})
+
+        path = renderer.render(
+            itertools.chain.from_iterable(result.partitions()),
+            header={'report_date': report_date, 'filters': filters_applied},
+            summary={'count': count, 'income_minor': total_income_minor, 'expense_minor': total_expense_minor},
+        )
 
         return Response(
-            pdf_bytes,
+            iter_file(path),
             mimetype="application/pdf",
-            headers={"Content-Disposition": "attachment;filename=transactions.pdf"}
+            headers={"Content-Disposition": "attachment;filename=transactions.pdf", "Content-Length": str(os.path.getsize(path))}
         )
 
     except Exception as e:
@@ -1,7 +1,11 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request, session, current_app
 from src.models.user import User
+from src.models.purge_job import PurgeJob
 from src.extensions import db # Import db from extensions.py
-from src.routes.auth import login_required # Import login_required
+from src.routes.auth import login_required, get_current_user, invalidate_cached_user, _hashing_unavailable # Import login_required
+from src.services.password_hashing import HashingPoolSaturated
+from src.services.purge import schedule_purge, start_purge_worker
+from src.services.session_store import revoke_user_sessions
 
 user_bp = Blueprint('user', __name__, url_prefix='/user') # Changed url_prefix for clarity
 
@@ -11,8 +15,7 @@ user_bp = Blueprint('user', __name__, url_prefix='/user') # Changed url_prefix f
 @user_bp.route('/profile', methods=['GET'])
 @login_required
 def get_user_profile():
-    user_id = session['user_id']
-    user = User.query.get(user_id)
+    user = get_current_user()
     if not user:
         return jsonify({'error': 'User not found'}), 404
     return jsonify(user.to_dict())
@@ -45,10 +48,74 @@ def update_user_profile():
 
     try:
         db.session.commit()
+        invalidate_cached_user(user_id)
         return jsonify({'message': 'Profile updated successfully', 'user': user.to_dict()}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to update profile'}), 500
 
-# Deleting a user is a sensitive operation, often handled differently (e.g., admin only, or soft delete)
-# For now, this endpoint is removed. User can logout. Full account deletion needs more consideration.
+def _confirm_password(user):
+    """None if the request body carries the user's password, else an error response."""
+    password = (request.get_json(silent=True) or {}).get('password')
+    if not password or not user.check_password(password):
+        return jsonify({'error': 'Password is incorrect'}), 403
+    return None
+
+# Deletions run as batched background jobs (src/services/purge.py), so a large
+# account never holds the database write lock for long.
+@user_bp.route('/profile', methods=['DELETE'])
+@login_required
+def delete_account():
+    """Schedule the account and all of its data for deletion and log out everywhere"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    try:
+        error = _confirm_password(user)
+        if error:
+            return error
+        user_id = user.id
+        job = schedule_purge(user_id, 'account')
+        db.session.commit()
+        revoke_user_sessions(current_app, user_id)
+        invalidate_cached_user(user_id)
+        session.clear()
+        start_purge_worker(current_app)
+        return jsonify({'message': 'Account scheduled for deletion', 'job': job.to_dict()}), 202
+    except HashingPoolSaturated as e:
+        return _hashing_unavailable(e)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error scheduling account deletion: {e}")
+        return jsonify({'error': 'Failed to delete account'}), 500
+
+@user_bp.route('/data/purge', methods=['POST'])
+@login_required
+def purge_data():
+    """Schedule deletion of all financial data (transactions, budgets, goals, rules), keeping the account"""
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    try:
+        error = _confirm_password(user)
+        if error:
+            return error
+        job = schedule_purge(user.id, 'data')
+        db.session.commit()
+        start_purge_worker(current_app)
+        return jsonify({'message': 'Data purge scheduled', 'job': job.to_dict()}), 202
+    except HashingPoolSaturated as e:
+        return _hashing_unavailable(e)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error scheduling data purge: {e}")
+        return jsonify({'error': 'Failed to schedule data purge'}), 500
+
+@user_bp.route('/data/purge/<int:job_id>', methods=['GET'])
+@login_required
+def get_purge_progress(job_id):
+    """Progress of one of the user's data purges"""
+    job = PurgeJob.query.filter_by(id=job_id, user_id=session['user_id'], kind='data').first()
+    if not job:
+        return jsonify({'error': 'Purge job not found'}), 404
+    return jsonify(job.to_dict()), 200
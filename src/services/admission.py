@@ -0,0 +1,215 @@
+"""
+Admission control for expensive endpoints.
+
+Routes marked ``@admitted(cost)`` (exports, very large listings) are
+admitted against three limits before they run:
+
+- a token bucket per user, holding ``ADMISSION_BUCKET_SIZE`` cost units and
+  refilling ``ADMISSION_REFILL_PER_SECOND`` units a second;
+- at most ``ADMISSION_USER_CONCURRENCY`` expensive requests per user at once;
+- at most ``ADMISSION_GLOBAL_COST`` cost units of expensive work in flight in
+  total, across users.
+
+A request over any limit gets a 429 with ``Retry-After`` right away rather
+than waiting for a worker, so one user can't tie up every worker with
+exports. Requests to other endpoints never touch the controller.
+
+The state lives in a small SQLite file next to the database
+(``ADMISSION_DB_PATH``), so every worker process on the host shares the same
+limits. Each decision is a single ``BEGIN IMMEDIATE`` transaction. A running
+request holds a lease that is released when its response has been sent. If
+the process dies first, the lease expires after ``LEASE_SECONDS``. If the
+store can't be reached, requests are admitted and the error is logged.
+"""
+import functools
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flask import current_app, jsonify, make_response, session
+
+from src.extensions import db
+from src.services.cache import LRUCache
+
+# A lease not released by then (its process died mid-request) no longer counts against the limits.
+LEASE_SECONDS = 600
+# Retry-After when a concurrency limit is hit; the running requests' remaining time isn't known.
+BUSY_RETRY_SECONDS = 2
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS bucket (user_id INTEGER PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS lease (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, cost INTEGER NOT NULL, '
+    'expires REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS ix_lease_user ON lease (user_id)',
+)
+
+_controller = None
+
+
+class AdmissionDenied(Exception):
+    """The request is over one of the limits; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, path, bucket_size=30, refill_per_second=0.5, user_concurrency=2, global_cost=40):
+        self.path = path
+        self.bucket_size = bucket_size
+        self.refill_per_second = refill_per_second
+        self.user_concurrency = user_concurrency
+        self.global_cost = global_cost
+        self._local = threading.local()
+        # user_id -> (tokens, time) last seen in the store by this process. Other processes only take tokens,
+        # so this plus the refill since is an upper bound, and a request above it is refused without the store.
+        self._seen_buckets = LRUCache(maxsize=100_000, ttl=bucket_size / refill_per_second)
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA synchronous=OFF')  # the state is only worth a few minutes; don't fsync for it
+        return conn
+
+    def _connection(self):
+        # One connection per thread, and a new one after a fork.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    def admit(self, user_id, cost):
+        """Takes ``cost`` units from the user's bucket and returns a lease id, or raises AdmissionDenied."""
+        cost = min(cost, self.bucket_size)  # anything bigger would never be admitted
+        now = time.time()
+        seen = self._seen_buckets.get(user_id)
+        if seen is not None:
+            self._check_tokens(min(self.bucket_size, seen[0] + (now - seen[1]) * self.refill_per_second), cost)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM lease WHERE expires < ?', (now,))
+            running, = conn.execute('SELECT count(*) FROM lease WHERE user_id = ?', (user_id,)).fetchone()
+            if running >= self.user_concurrency:
+                raise AdmissionDenied('Too many expensive requests in progress, please retry shortly', BUSY_RETRY_SECONDS)
+            in_flight, = conn.execute('SELECT coalesce(sum(cost), 0) FROM lease').fetchone()
+            if in_flight and in_flight + cost > self.global_cost:
+                raise AdmissionDenied('Server is busy, please retry shortly', BUSY_RETRY_SECONDS)
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE user_id = ?', (user_id,)).fetchone()
+            tokens = self.bucket_size if row is None else \
+                min(self.bucket_size, row[0] + (now - row[1]) * self.refill_per_second)
+            self._seen_buckets.set(user_id, (tokens, now))
+            self._check_tokens(tokens, cost)
+            conn.execute('INSERT INTO bucket (user_id, tokens, updated) VALUES (?, ?, ?) '
+                         'ON CONFLICT (user_id) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                         (user_id, tokens - cost, now))
+            lease = conn.execute('INSERT INTO lease (user_id, cost, expires) VALUES (?, ?, ?)',
+                                 (user_id, cost, now + LEASE_SECONDS)).lastrowid
+            conn.execute('COMMIT')
+            self._seen_buckets.set(user_id, (tokens - cost, now))
+            return lease
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _check_tokens(self, tokens, cost):
+        if tokens < cost:
+            raise AdmissionDenied('Rate limit exceeded, please retry later',
+                                  math.ceil((cost - tokens) / self.refill_per_second))
+
+    def release(self, lease):
+        self._connection().execute('DELETE FROM lease WHERE id = ?', (lease,))
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _denied(error):
+    response = jsonify({'error': str(error)})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def admitted(cost):
+    """
+    Decorator admitting a request of the given cost (an int, or a function of
+    the request returning one; 0 skips admission). Apply below @login_required.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            request_cost = cost() if callable(cost) else cost
+            if _controller is None or request_cost <= 0:
+                return f(*args, **kwargs)
+            try:
+                lease = _controller.admit(session['user_id'], request_cost)
+            except AdmissionDenied as e:
+                return _denied(e)
+            except Exception as e:
+                current_app.logger.error(f"Error in admission control, admitting request: {e}")
+                return f(*args, **kwargs)
+            release = functools.partial(release_lease, _controller, lease, current_app.logger)
+            try:
+                response = make_response(f(*args, **kwargs))
+            except BaseException:
+                release()
+                raise
+            if response.is_streamed:
+                response.call_on_close(release)  # once the body has been sent
+            else:
+                release()
+            return response
+        return decorated_function
+    return decorator
+
+
+def release_lease(controller, lease, logger):
+    try:
+        controller.release(lease)
+    except Exception as e:
+        logger.error(f"Error releasing admission lease: {e}")  # it expires on its own
+
+
+def _default_path(app):
+    with app.app_context():
+        url = db.engine.url
+    if url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+        return os.path.join(os.path.dirname(os.path.abspath(url.database)), 'admission.db')
+    return os.path.join(tempfile.gettempdir(), 'admission.db')
+
+
+def init_admission_control(app):
+    """Installs the admission controller unless ADMISSION_CONTROL is off; returns it (or None)."""
+    global _controller
+    if _controller is not None:
+        _controller.close()
+    _controller = None
+    if not app.config.get('ADMISSION_CONTROL', True):
+        return None
+    _controller = AdmissionController(
+        app.config.get('ADMISSION_DB_PATH') or _default_path(app),
+        bucket_size=app.config.get('ADMISSION_BUCKET_SIZE', 30),
+        refill_per_second=app.config.get('ADMISSION_REFILL_PER_SECOND', 0.5),
+        user_concurrency=app.config.get('ADMISSION_USER_CONCURRENCY', 2),
+        global_cost=app.config.get('ADMISSION_GLOBAL_COST', 40),
+    )
+    return _controller
+
+
+def get_admission_controller():
+    return _controller
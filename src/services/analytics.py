@@ -0,0 +1,131 @@
+"""
+Time-bucketed spending series.
+
+One ``GROUP BY`` over the bucket start date and the series key, filtered by
+user and date range (served by ``ix_transaction_user_date``), is expanded
+into dense arrays: every series has one value per bucket, zero where there
+were no transactions, which is what chart libraries expect. Ranges that
+reach archived months also read ``transaction_archive``. Results are cached
+under the user's data version.
+"""
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import func
+
+from src.extensions import db
+from src.models.money import to_major
+from src.models.transaction import Category
+from src.services.archive import transaction_rows
+from src.services.cache import LRUCache
+from src.services.data_version import get_data_version
+
+BUCKETS = ('day', 'week', 'month', 'year')
+GROUPS = ('category', 'type')
+MAX_BUCKETS = 1100  # about three years of days
+
+_series_cache = LRUCache(maxsize=1024)  # (user_id, data_version, params) -> result
+
+
+def bucket_start(value, bucket):
+    """First day of the bucket containing ``value``; weeks start on Monday."""
+    if bucket == 'week':
+        return value - timedelta(days=value.weekday())
+    if bucket == 'month':
+        return value.replace(day=1)
+    if bucket == 'year':
+        return value.replace(month=1, day=1)
+    return value
+
+
+def _bucket_step(bucket):
+    return {'day': relativedelta(days=1), 'week': relativedelta(weeks=1),
+            'month': relativedelta(months=1), 'year': relativedelta(years=1)}[bucket]
+
+
+def bucket_count(start_date, end_date, bucket):
+    """Number of buckets from start_date to end_date, without listing them."""
+    if bucket == 'week':
+        return (bucket_start(end_date, bucket) - bucket_start(start_date, bucket)).days // 7 + 1
+    if bucket == 'month':
+        return (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1
+    if bucket == 'year':
+        return end_date.year - start_date.year + 1
+    return (end_date - start_date).days + 1
+
+
+def bucket_starts(start_date, end_date, bucket):
+    current, step = bucket_start(start_date, bucket), _bucket_step(bucket)
+    starts = []
+    while current <= end_date:
+        starts.append(current)
+        try:
+            current += step
+        except (OverflowError, ValueError):  # the last bucket reaches date.max
+            break
+    return starts
+
+
+def _bucket_expression(bucket, column):
+    """The SQL twin of bucket_start over a date column, as an ISO date string."""
+    if bucket == 'week':
+        return func.date(column, 'weekday 0', '-6 days')  # the Monday on or before the date
+    if bucket == 'month':
+        return func.strftime('%Y-%m-01', column)
+    if bucket == 'year':
+        return func.strftime('%Y-01-01', column)
+    return func.date(column)
+
+
+def get_series(user_id, start_date, end_date, bucket, group_by, transaction_type=None):
+    key = (user_id, get_data_version(user_id), start_date, end_date, bucket, group_by, transaction_type)
+    result = _series_cache.get(key)
+    if result is None:
+        result = _compute_series(user_id, start_date, end_date, bucket, group_by, transaction_type)
+        _series_cache.set(key, result)
+    return result
+
+
+def _compute_series(user_id, start_date, end_date, bucket, group_by, transaction_type):
+    starts = bucket_starts(start_date, end_date, bucket)
+    position = {start.isoformat(): i for i, start in enumerate(starts)}
+
+    rows = transaction_rows(user_id, start_date)  # the live table, plus the archive if the range reaches it
+    bucket_expr = _bucket_expression(bucket, rows.c.date).label('bucket')
+    group_column = rows.c.category_id if group_by == 'category' else rows.c.transaction_type
+    query = db.session.query(bucket_expr, group_column, func.sum(rows.c.amount_minor)).filter(
+        rows.c.user_id == user_id,
+        rows.c.date >= start_date,
+        rows.c.date <= end_date
+    )
+    if transaction_type:
+        query = query.filter(rows.c.transaction_type == transaction_type)
+    rows = query.group_by(bucket_expr, group_column).all()
+
+    values = {}  # series key -> [minor units per bucket]
+    for bucket_key, group_key, total in rows:
+        values.setdefault(group_key, [0] * len(starts))[position[bucket_key]] += total or 0
+
+    if group_by == 'category':
+        names = dict(db.session.query(Category.id, Category.name).filter(Category.id.in_([k for k in values if k is not None])))
+        labels = {k: names.get(k, 'Uncategorized') if k is not None else 'Uncategorized' for k in values}
+    else:
+        labels = {k: k for k in values}
+
+    series = [{
+        'key': k,
+        'label': labels[k],
+        'values': [to_major(v) for v in minor],
+        'total': to_major(sum(minor)),
+    } for k, minor in sorted(values.items(), key=lambda item: -sum(item[1]))]
+
+    totals = [sum(minor[i] for minor in values.values()) for i in range(len(starts))]
+    return {
+        'bucket': bucket,
+        'group_by': group_by,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'buckets': [start.isoformat() for start in starts],
+        'series': series,
+        'totals': [to_major(v) for v in totals],
+    }
@@ -0,0 +1,172 @@
+"""
+Spending anomaly detection.
+
+A user's expenses, live and archived, are loaded once per data version as
+NumPy columns (one query in date order over ``ix_transaction_user_date`` and
+the archive's clustered key, then a stable sort by category) and scanned
+with vectorized operations only:
+
+* a transaction is flagged when it is at least ``factor`` times the mean of
+  the previous ``TRANSACTION_WINDOW`` expenses in its category;
+* a category-month is flagged when its total is more than ``sigma`` standard
+  deviations above the mean of the previous ``window_months`` months.
+
+Per-category running sums come from cumulative sums over the sorted columns,
+so the cost is a few passes over the arrays regardless of how many
+categories or months there are.
+"""
+import itertools
+
+import numpy as np
+from sqlalchemy import text
+
+from src.extensions import db
+from src.models.money import to_major
+from src.models.transaction import Transaction, Category
+from src.models.archived_transaction import ArchivedTransaction
+from src.services.cache import LRUCache
+from src.services.data_version import get_data_version
+
+TRANSACTION_WINDOW = 50  # previous expenses in the category that define "typical"
+MIN_TRANSACTION_HISTORY = 5
+MIN_MONTH_HISTORY = 3
+
+_columns_cache = LRUCache(maxsize=4)  # (user_id, data_version) -> columns; ~40 MB per million rows
+_result_cache = LRUCache(maxsize=256)  # (user_id, data_version, params) -> result
+
+_EXPENSE_COLUMNS_SQL = text('''
+    SELECT id,
+           amount_minor,
+           COALESCE(category_id, -1),
+           CAST(substr(date, 1, 4) AS INTEGER) * 12 + CAST(substr(date, 6, 2) AS INTEGER) - 1
+    FROM (
+        SELECT id, amount_minor, category_id, date FROM "transaction"
+        WHERE user_id = :user_id AND transaction_type = 'expense'
+        UNION ALL
+        SELECT id, amount_minor, category_id, date FROM transaction_archive
+        WHERE user_id = :user_id AND transaction_type = 'expense'
+    )
+    ORDER BY date, id
+''')
+
+
+def load_expense_columns(user_id):
+    """Returns (ids, amounts, category_ids, month_indexes) as int64 arrays, sorted by category, date and id."""
+    key = (user_id, get_data_version(user_id))
+    columns = _columns_cache.get(key)
+    if columns is None:
+        rows = db.session.execute(_EXPENSE_COLUMNS_SQL, {'user_id': user_id}, bind_arguments={'mapper': Transaction}).all()
+        columns = rows_to_columns(rows)
+        _columns_cache.set(key, columns)
+    return columns
+
+
+def rows_to_columns(rows):
+    """(id, amount, category, month) rows in date order -> int64 columns sorted by category, date and id."""
+    data = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 4).reshape(-1, 4)
+    order = np.argsort(data[:, 2], kind='stable')  # stable, so each category stays in date order
+    return tuple(np.ascontiguousarray(data[order, i]) for i in range(4))
+
+
+def flag_transactions(amounts, categories, factor):
+    """Indexes of expenses >= factor x the trailing mean of their category, and that mean."""
+    n = len(amounts)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    index = np.arange(n)
+    group_start = np.r_[True, categories[1:] != categories[:-1]]
+    first_in_group = np.maximum.accumulate(np.where(group_start, index, 0))
+    history = np.minimum(index - first_in_group, TRANSACTION_WINDOW)
+
+    running = np.concatenate(([0], np.cumsum(amounts)))
+    trailing_mean = (running[index] - running[index - history]) / np.maximum(history, 1)
+
+    flagged = np.flatnonzero((history >= MIN_TRANSACTION_HISTORY) & (amounts >= factor * trailing_mean) & (trailing_mean > 0))
+    return flagged, trailing_mean[flagged]
+
+
+def flag_months(amounts, categories, months, sigma, window_months):
+    """Category-months whose total exceeds the trailing mean by more than sigma standard deviations."""
+    if len(amounts) == 0:
+        return []
+    category_ids, group = np.unique(categories, return_inverse=True)
+    first_month = months.min()
+    span = months.max() - first_month + 1
+    totals = np.bincount(group * span + (months - first_month), weights=amounts,
+                         minlength=len(category_ids) * span).reshape(len(category_ids), span)
+
+    zeros = np.zeros((len(category_ids), 1))
+    running = np.concatenate((zeros, np.cumsum(totals, axis=1)), axis=1)
+    running_sq = np.concatenate((zeros, np.cumsum(totals ** 2, axis=1)), axis=1)
+
+    # History starts at the category's first active month, capped at the window.
+    active_from = np.argmax(totals > 0, axis=1)[:, None]
+    column = np.arange(span)[None, :]
+    window_start = np.maximum(column - window_months, active_from)
+    window_start = np.minimum(window_start, column)
+    history = column - window_start
+
+    # running[:, j] is the sum of months before j, so the window is running[:, j] - running[:, window_start].
+    count = np.maximum(history, 1)
+    window_sum = running[:, :-1] - np.take_along_axis(running, window_start, axis=1)
+    window_sq = running_sq[:, :-1] - np.take_along_axis(running_sq, window_start, axis=1)
+    mean = window_sum / count
+    std = np.sqrt(np.maximum(window_sq / count - mean ** 2, 0))
+
+    flagged = (history >= MIN_MONTH_HISTORY) & (std > 0) & (totals > mean + sigma * std)
+    rows, cols = np.nonzero(flagged)
+    return [{
+        'category_id': int(category_ids[r]) if category_ids[r] >= 0 else None,
+        'month_index': int(first_month + c),
+        'total_minor': int(totals[r, c]),
+        'mean_minor': float(mean[r, c]),
+        'std_minor': float(std[r, c]),
+    } for r, c in zip(rows, cols)]
+
+
+def detect_anomalies(user_id, factor=5.0, sigma=3.0, window_months=6, limit=100):
+    """Flagged transactions (newest first, at most ``limit``) and category-months for one user."""
+    key = (user_id, get_data_version(user_id), factor, sigma, window_months, limit)
+    result = _result_cache.get(key)
+    if result is None:
+        result = _detect(user_id, factor, sigma, window_months, limit)
+        _result_cache.set(key, result)
+    return result
+
+
+def _detect(user_id, factor, sigma, window_months, limit):
+    ids, amounts, categories, months = load_expense_columns(user_id)
+    flagged, typical = flag_transactions(amounts, categories, factor)
+    flagged_months = flag_months(amounts, categories, months, sigma, window_months)
+
+    # Newest first: transaction ids grow with insertion, months are compared by index.
+    newest = np.argsort(-ids[flagged], kind='stable')[:limit]
+    typical_by_id = {int(ids[flagged[i]]): float(typical[i]) for i in newest}
+    transactions = Transaction.query.filter(Transaction.user_id == user_id, Transaction.id.in_(list(typical_by_id))).all()
+    missing = set(typical_by_id) - {t.id for t in transactions}
+    if missing:
+        transactions += ArchivedTransaction.query.filter(
+            ArchivedTransaction.user_id == user_id, ArchivedTransaction.id.in_(list(missing))).all()
+    transactions.sort(key=lambda t: (t.date, t.id), reverse=True)
+
+    names = dict(db.session.query(Category.id, Category.name).all())
+    flagged_months.sort(key=lambda m: (-m['month_index'], -m['total_minor']))
+    return {
+        'factor': factor,
+        'sigma': sigma,
+        'window_months': window_months,
+        'transactions': [dict(
+            t.to_dict(),
+            typical_amount=to_major(round(typical_by_id[t.id])),
+            ratio=round(t.amount_minor / typical_by_id[t.id], 2),
+        ) for t in transactions],
+        'months': [{
+            'category_id': m['category_id'],
+            'category_name': names.get(m['category_id'], 'Uncategorized'),
+            'month': f"{m['month_index'] // 12:04d}-{m['month_index'] % 12 + 1:02d}",
+            'total': to_major(m['total_minor']),
+            'trailing_average': to_major(round(m['mean_minor'])),
+            'trailing_std': to_major(round(m['std_minor'])),
+            'z_score': round((m['total_minor'] - m['mean_minor']) / m['std_minor'], 2),
+        } for m in flagged_months[:limit]],
+    }
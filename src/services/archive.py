@@ -0,0 +1,195 @@
+"""
+Cold storage for old transactions.
+
+``archive_user`` moves a user's transactions dated before a cutoff from
+``transaction`` into ``transaction_archive`` (see ArchivedTransaction) and
+rebuilds ``transaction_rollup`` for the months it touched. It works in
+batches, each one a single transaction on the user's database file, so a
+crash never loses or duplicates rows. The hot table and its indexes then
+hold only recent data.
+
+Reads stay complete without callers having to know where rows live:
+
+* listings and exports add archived rows only when the requested date range
+  starts on or before the user's newest archived date (``reaches_archive``);
+* all-time and per-month totals add the rollup rows (``archived_totals``,
+  ``archived_spending``);
+* date-bucketed queries read ``transaction_rows``, a UNION ALL of both
+  tables, when their range reaches the archive.
+
+Archived rows are read-only. A transaction entered later with an old date
+stays in the live table until the next run archives it.
+"""
+from datetime import date, datetime
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import delete, func, insert, select, union_all
+
+from src.extensions import db
+from src.models.archived_transaction import ArchivedTransaction
+from src.models.transaction import Transaction, Category
+from src.models.transaction_rollup import TransactionRollup
+from src.services.data_version import bump_data_version
+from src.services.sharding import shard_scope, user_data_engines
+
+# Budgets, projections and the dashboard look back at most a few months; keep at least a year hot.
+MIN_ARCHIVE_MONTHS = 12
+DEFAULT_BATCH_SIZE = 1000
+
+_ROW_COLUMNS = ('id', 'amount_minor', 'description', 'transaction_type', 'date', 'created_at', 'user_id', 'category_id')
+
+
+def archive_cutoff(months, today=None):
+    """First day of the month ``months`` months before the current one; earlier transactions are archived."""
+    today = today or date.today()
+    return today.replace(day=1) - relativedelta(months=months)
+
+
+def archive_horizon_statement(user_id):
+    """SELECT of the user's newest archived date (one primary key lookup)."""
+    return select(ArchivedTransaction.date).where(ArchivedTransaction.user_id == user_id)\
+        .order_by(ArchivedTransaction.date.desc()).limit(1)
+
+
+def archive_horizon(user_id):
+    """The user's newest archived date, or None if nothing is archived."""
+    return db.session.scalar(archive_horizon_statement(user_id))
+
+
+def horizon_reached(horizon, start_date=None):
+    """True if a range starting at ``start_date`` (None: unbounded) includes dates up to ``horizon``."""
+    return horizon is not None and (start_date is None or start_date <= horizon)
+
+
+def reaches_archive(user_id, start_date=None):
+    """True if a range starting at ``start_date`` (None: unbounded) includes archived transactions."""
+    return horizon_reached(archive_horizon(user_id), start_date)
+
+
+def transaction_rows(user_id, start_date=None):
+    """
+    A selectable with the transaction columns of one user: the live table,
+    or a UNION ALL with the archive if the range reaches into it. Callers use
+    its ``.c`` columns in place of ``Transaction`` attributes.
+    """
+    live = Transaction.__table__
+    if not reaches_archive(user_id, start_date):
+        return live
+    archive = ArchivedTransaction.__table__
+    parts = []
+    for table in (live, archive):
+        part = select(*[table.c[name] for name in _ROW_COLUMNS]).where(table.c.user_id == user_id)
+        if start_date is not None:
+            part = part.where(table.c.date >= start_date)
+        parts.append(part)
+    return union_all(*parts).subquery('transaction_rows')
+
+
+def newest_first(live, archived, limit=None):
+    """Merges live and archived transactions into one list ordered like the transaction listings."""
+    rows = sorted(live + archived, key=lambda t: (t.date, t.created_at or datetime.min), reverse=True)
+    return rows[:limit] if limit is not None else rows
+
+
+def archived_totals(user_id):
+    """(income, expense) of the user's archived transactions, in minor units."""
+    totals = dict(db.session.query(TransactionRollup.transaction_type, func.sum(TransactionRollup.total_minor))
+                  .filter(TransactionRollup.user_id == user_id)
+                  .group_by(TransactionRollup.transaction_type).all())
+    return totals.get('income') or 0, totals.get('expense') or 0
+
+
+def archived_spending(user_id, month=None):
+    """{category_id: archived expense total}, over all months or for the month starting at ``month``."""
+    query = db.session.query(TransactionRollup.category_id, func.sum(TransactionRollup.total_minor)).filter(
+        TransactionRollup.user_id == user_id,
+        TransactionRollup.transaction_type == 'expense'
+    )
+    if month is not None:
+        query = query.filter(TransactionRollup.month == month)
+    return dict(query.group_by(TransactionRollup.category_id).all())
+
+
+def with_archived_spending(user_id, spending_by_name):
+    """Adds archived expenses to [(category name, total)] rows of live spending, keeping name order."""
+    archived = archived_spending(user_id)
+    if not archived:
+        return spending_by_name
+    totals = dict(spending_by_name)
+    names = dict(db.session.query(Category.id, Category.name).filter(Category.id.in_([k for k in archived if k is not None])))
+    for category_id, total in archived.items():
+        if category_id in names:  # uncategorized expenses are not listed, as for live ones
+            totals[names[category_id]] = (totals.get(names[category_id]) or 0) + total
+    return sorted(totals.items())
+
+
+def _rebuild_rollup(user_id, first_month, last_month):
+    """Recomputes the rollup rows of the months from first_month to last_month from the archive."""
+    archive, rollup = ArchivedTransaction.__table__, TransactionRollup.__table__
+    db.session.execute(delete(rollup).where(
+        rollup.c.user_id == user_id, rollup.c.month >= first_month, rollup.c.month <= last_month))
+    month = func.date(archive.c.date, 'start of month')
+    db.session.execute(insert(rollup).from_select(
+        ['user_id', 'month', 'category_id', 'transaction_type', 'total_minor', 'count'],
+        select(archive.c.user_id, month, archive.c.category_id, archive.c.transaction_type,
+               func.sum(archive.c.amount_minor), func.count())
+        .where(archive.c.user_id == user_id,
+               archive.c.date >= first_month,
+               archive.c.date < last_month + relativedelta(months=1))
+        .group_by(archive.c.user_id, month, archive.c.category_id, archive.c.transaction_type)
+    ))
+
+
+def archive_user(user_id, cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """Moves the user's transactions dated before ``cutoff`` to the archive; returns how many were moved."""
+    live, archive = Transaction.__table__, ArchivedTransaction.__table__
+    columns = [live.c[name] for name in _ROW_COLUMNS]
+    moved = 0
+    with shard_scope(user_id):
+        while True:
+            batch = db.session.execute(
+                select(live.c.id, live.c.date).where(live.c.user_id == user_id, live.c.date < cutoff)
+                .order_by(live.c.date, live.c.id).limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            ids = [row.id for row in batch]
+            try:
+                db.session.execute(insert(archive).from_select(list(_ROW_COLUMNS), select(*columns).where(live.c.id.in_(ids))))
+                db.session.execute(delete(live).where(live.c.id.in_(ids)))
+                _rebuild_rollup(user_id, batch[0].date.replace(day=1), batch[-1].date.replace(day=1))
+                bump_data_version(user_id)  # cached results may name archived rows as live ones
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            moved += len(ids)
+    return moved
+
+
+def users_to_archive(cutoff):
+    """Ids of users with live transactions dated before ``cutoff``, across all database files."""
+    live = Transaction.__table__
+    users = set()
+    for engine in user_data_engines():
+        with engine.connect() as conn:
+            users.update(conn.execute(select(live.c.user_id).where(live.c.date < cutoff).distinct()).scalars())
+    return sorted(users)
+
+
+def run_archival(months, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, log=print):
+    """Archives every user's transactions older than ``months`` months; returns the number of rows moved."""
+    if months < MIN_ARCHIVE_MONTHS:
+        raise ValueError(f'Transactions must stay live for at least {MIN_ARCHIVE_MONTHS} months')
+    cutoff = archive_cutoff(months)
+    total = 0
+    for user_id in users_to_archive(cutoff):
+        if dry_run:
+            with shard_scope(user_id):
+                count = db.session.query(func.count(Transaction.id))\
+                    .filter(Transaction.user_id == user_id, Transaction.date < cutoff).scalar()
+        else:
+            count = archive_user(user_id, cutoff, batch_size)
+        log(f'user {user_id}: {count} transaction(s) before {cutoff.isoformat()}')
+        total += count
+    return total
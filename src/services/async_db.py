@@ -0,0 +1,80 @@
+"""
+Async engines for the ASGI deployment mode (src/asgi.py).
+
+The requests the ASGI app serves itself only read, so every async engine is
+a read engine, like the ones read routing uses. For SQLite it opens the
+same file read-only through aiosqlite. For Postgres it goes through asyncpg
+to ``READ_DATABASE_URL`` if one is set, and to the primary otherwise; a
+request pinned to the primary after a write (``read_primary_until``) always
+reads the primary. There is one async engine per sync engine, created on
+first use. With sharding, each shard's engine attaches the global DB, the
+same as the sync shard engines. A user's shard is looked up in a worker
+thread the first time, so the directory query never blocks the loop. Writes
+keep going through the Flask app and its sync engines.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.services.read_routing import make_read_only, read_only_uri
+
+# Async driver for each database backend; a URL naming another driver (postgresql+psycopg2) is switched over.
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_url(url):
+    """``url`` with its backend's async driver."""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f'No async driver for {url.get_backend_name()} databases')
+    return url.set(drivername=driver)
+
+
+class AsyncEngines:
+    def __init__(self, primary, replica_url=None, shard_router=None):
+        self.primary = primary
+        self.replica_url = replica_url
+        self.shard_router = shard_router
+        self._engines = {}  # (sync engine, reads a replica) -> async engine; only touched from the event loop
+
+    def engine(self, engine, primary=False):
+        """The async read engine for ``engine``; with ``primary``, never a replica."""
+        replica = bool(engine is self.primary and self.replica_url and not primary)
+        async_engine = self._engines.get((engine, replica))
+        if async_engine is None:
+            async_engine = self._engines[engine, replica] = self._create_engine(engine, replica)
+        return async_engine
+
+    def _create_engine(self, engine, replica):
+        if replica:
+            return create_async_engine(async_url(self.replica_url))
+        if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+            return create_async_engine(async_url(engine.url))
+        async_engine = create_async_engine(f'sqlite+aiosqlite:///{read_only_uri(engine.url.database)}&uri=true')
+        attach_global = self.shard_router is not None and engine in self.shard_router.engines
+        make_read_only(async_engine.sync_engine, self.primary.url.database if attach_global else None)
+        return async_engine
+
+    async def _engine_for_user(self, user_id):
+        shard = self.shard_router.cached_shard(user_id)
+        if shard is None:
+            # The directory lookup (and a new user's placement) is sync I/O on the global DB.
+            shard = await asyncio.to_thread(self.shard_router.shard_for, user_id)
+        return self.shard_router.engines[shard]
+
+    @asynccontextmanager
+    async def session(self, user_id=None, primary=False):
+        """An AsyncSession on the user's shard (with the global DB attached), or on the global DB."""
+        engine = self.primary
+        if user_id is not None and self.shard_router is not None:
+            engine = await self._engine_for_user(user_id)
+        async with AsyncSession(self.engine(engine, primary), expire_on_commit=False) as session:
+            yield session
+
+    async def dispose(self):
+        for async_engine in self._engines.values():
+            await async_engine.dispose()
+        self._engines.clear()
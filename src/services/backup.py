@@ -0,0 +1,230 @@
+"""
+Online backups of the SQLite database files.
+
+``create_backup`` copies every database file (the main database and, with
+sharding, each shard) with SQLite's online backup API while the app keeps
+serving. The copy runs ``pages_per_step`` pages at a time and sleeps between
+steps. In WAL mode (the app enables it on startup) the source connection
+holds one read transaction for the whole copy, so every step reads the same
+snapshot while writers carry on; without that pin SQLite restarts the copy
+after every write and it may never finish. Other journal modes can't read
+beside a writer, so their files are copied in a single step. Either way each
+file is a consistent snapshot; files are backed up one after another, so a
+set is not one atomic snapshot across shards.
+
+Each set is a timestamped directory of gzip-compressed files plus a
+``manifest.json``. Verification (decompress to a scratch file and run
+``PRAGMA integrity_check``) runs in a background thread, overlapping with the
+copy of the next file, and its result is recorded in the manifest. After a
+successful set, only the newest ``keep`` verified sets are kept, along with
+any newer sets that failed or weren't verified.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+MANIFEST = 'manifest.json'
+DEFAULT_PAGES_PER_STEP = 256
+DEFAULT_STEP_SLEEP = 0.005  # seconds between steps
+DEFAULT_KEEP = 7
+
+
+class BackupError(Exception):
+    pass
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot(source_path, target_path, pages_per_step=DEFAULT_PAGES_PER_STEP, sleep=DEFAULT_STEP_SLEEP):
+    """Copies a live database into target_path with the online backup API; returns the page count."""
+    source = sqlite3.connect(source_path, isolation_level=None)
+    target = sqlite3.connect(target_path)
+    try:
+        if source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+            source.execute('BEGIN')
+            source.execute('SELECT count(*) FROM sqlite_master').fetchone()  # starts the read transaction
+        else:
+            pages_per_step = -1
+        source.backup(target, pages=pages_per_step, sleep=sleep)
+        if source.in_transaction:
+            source.execute('COMMIT')
+        return target.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+
+
+def compress(path, target_path):
+    with open(path, 'rb') as src, gzip.open(target_path, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+
+
+def integrity_check(compressed_path):
+    """Decompresses a backup file to a scratch copy and runs PRAGMA integrity_check; returns the result text."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'verify.db')
+        with gzip.open(compressed_path, 'rb') as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute('PRAGMA integrity_check').fetchall()
+        finally:
+            conn.close()
+    return '; '.join(row[0] for row in rows)
+
+
+def _write_manifest(set_dir, manifest):
+    path = os.path.join(set_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def read_manifest(set_dir):
+    with open(os.path.join(set_dir, MANIFEST)) as f:
+        return json.load(f)
+
+
+def list_backups(backup_dir):
+    """Backup set directories under backup_dir that have a manifest, newest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = [name for name in os.listdir(backup_dir) if os.path.isfile(os.path.join(backup_dir, name, MANIFEST))]
+    return [os.path.join(backup_dir, name) for name in sorted(names, reverse=True)]
+
+
+def apply_retention(backup_dir, keep):
+    """
+    Deletes every set older than the ``keep``-th newest verified one; returns
+    the removed paths. Failed and unverified sets don't count toward ``keep``,
+    so a run of bad backups never pushes out the last good ones.
+    """
+    sets = list_backups(backup_dir)
+    verified = [i for i, path in enumerate(sets) if read_manifest(path).get('verified') is True]
+    if len(verified) < keep:
+        return []
+    removed = []
+    for path in sets[verified[keep - 1] + 1:]:
+        shutil.rmtree(path)
+        removed.append(path)
+    return removed
+
+
+def _new_set_dir(backup_dir, started):
+    """
+    Creates the set's directory, named by its start time. Sets started in the
+    same second get increasing suffixes, so names still sort by age.
+    """
+    name = started.strftime('%Y%m%dT%H%M%SZ')
+    os.makedirs(backup_dir, exist_ok=True)
+    while True:
+        taken = [entry[len(name):] for entry in os.listdir(backup_dir) if entry.startswith(name)]
+        suffixes = [int(rest[1:]) for rest in taken if rest[1:].isdigit()] + [1 for rest in taken if rest == '']
+        set_dir = os.path.join(backup_dir, f'{name}-{max(suffixes) + 1:03d}' if suffixes else name)
+        try:
+            os.mkdir(set_dir)
+            return set_dir
+        except FileExistsError:
+            continue  # another run took the name first
+
+
+def create_backup(database_paths, backup_dir, pages_per_step=DEFAULT_PAGES_PER_STEP,
+                  sleep=DEFAULT_STEP_SLEEP, verify=True, keep=DEFAULT_KEEP, log=print):
+    """
+    Backs up the given database files into a new set under backup_dir and
+    returns its path. Raises BackupError if verification fails; the failed
+    set is kept for inspection and retention is skipped.
+    """
+    started = datetime.utcnow()
+    set_dir = _new_set_dir(backup_dir, started)
+    manifest = {'created_at': started.isoformat() + 'Z', 'files': [], 'verified': None}
+    checks = []  # (file entry, thread, result holder)
+
+    for source_path in database_paths:
+        name = os.path.basename(source_path)
+        entry = {'name': name, 'source': os.path.abspath(source_path), 'file': name + '.gz'}
+        scratch = os.path.join(set_dir, name + '.partial')
+        step_started = time.monotonic()
+        entry['pages'] = snapshot(source_path, scratch, pages_per_step, sleep)
+        entry['size'] = os.path.getsize(scratch)
+        compress(scratch, os.path.join(set_dir, entry['file']))
+        os.remove(scratch)
+        entry['compressed_size'] = os.path.getsize(os.path.join(set_dir, entry['file']))
+        entry['sha256'] = _file_digest(os.path.join(set_dir, entry['file']))
+        entry['seconds'] = round(time.monotonic() - step_started, 3)
+        manifest['files'].append(entry)
+        log(f"{name}: {entry['size']:,} bytes -> {entry['compressed_size']:,} in {entry['seconds']}s")
+
+        if verify:
+            result = {}
+            thread = threading.Thread(target=lambda path=os.path.join(set_dir, entry['file']), out=result:
+                                      out.update(check=integrity_check(path)), daemon=True)
+            thread.start()
+            checks.append((entry, thread, result))
+
+    for entry, thread, result in checks:
+        thread.join()
+        entry['integrity_check'] = result.get('check', 'verification did not complete')
+    if verify:
+        manifest['verified'] = all(entry['integrity_check'] == 'ok' for entry in manifest['files'])
+    _write_manifest(set_dir, manifest)
+
+    if verify and not manifest['verified']:
+        failed = ', '.join(f"{e['name']}: {e['integrity_check']}" for e in manifest['files'] if e['integrity_check'] != 'ok')
+        raise BackupError(f'Backup {set_dir} failed verification ({failed})')
+    if keep:
+        for path in apply_retention(backup_dir, keep):
+            log(f'removed old backup {path}')
+    return set_dir
+
+
+def verify_backup(set_dir):
+    """Re-checks checksums and integrity of every file in a set and records the result; returns it."""
+    manifest = read_manifest(set_dir)
+    for entry in manifest['files']:
+        path = os.path.join(set_dir, entry['file'])
+        if _file_digest(path) != entry['sha256']:
+            entry['integrity_check'] = 'checksum mismatch'
+        else:
+            entry['integrity_check'] = integrity_check(path)
+    manifest['verified'] = all(entry['integrity_check'] == 'ok' for entry in manifest['files'])
+    _write_manifest(set_dir, manifest)
+    return manifest
+
+
+def restore_backup(set_dir, log=print):
+    """
+    Restores every file of a verified set over its original path. The app
+    must be stopped. Each file is decompressed next to its target and swapped
+    in with a rename, and stale -wal/-shm files are removed.
+    """
+    manifest = read_manifest(set_dir)
+    if not manifest.get('verified'):
+        raise BackupError(f'Backup {set_dir} is not verified; run verify first')
+    for entry in manifest['files']:
+        path = os.path.join(set_dir, entry['file'])
+        if _file_digest(path) != entry['sha256']:
+            raise BackupError(f"{entry['file']} does not match its checksum")
+    for entry in manifest['files']:
+        target = entry['source']
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with gzip.open(os.path.join(set_dir, entry['file']), 'rb') as src, open(target + '.restore', 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(target + suffix):
+                os.remove(target + suffix)
+        os.replace(target + '.restore', target)
+        log(f"restored {target}")
@@ -0,0 +1,178 @@
+"""
+Running budget totals and threshold alerts.
+
+Each budget carries ``spent_minor``, the expenses of its category in its
+period (archived ones included), which is kept current where expenses are
+written instead of being summed whenever budgets are viewed. ORM writes to
+``transaction`` are picked up by a flush hook that nets the changes of the
+flush per (user, category, day). ``record_expenses`` then finds the budgets
+whose periods contain those days with one lookup on
+``ix_budget_user_category_month`` and applies each budget's net change with
+one atomic ``UPDATE ... RETURNING``. Core writes (bulk inserts and updates)
+call ``record_expenses`` themselves.
+
+When an increment carries a budget across one of its ``alert_thresholds``
+(percentages of the amount), a BudgetAlert is added in the same
+transaction, so ``GET /api/budgets/alerts`` only reads those rows. Spending
+that falls back below a threshold re-arms it.
+"""
+from datetime import date
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from src.extensions import db
+from src.models.budget import Budget, BUDGET_PERIODS, LONGEST_PERIOD
+from src.models.budget_alert import BudgetAlert
+from src.models.transaction import Transaction
+from src.services.budget_summary import budget_spending, window_totals
+from src.services.data_version import bump_data_version
+
+# Transaction columns that budget totals depend on.
+EXPENSE_COLUMNS = ('user_id', 'category_id', 'date', 'transaction_type', 'amount_minor')
+
+
+def crossed_thresholds(thresholds, before, after):
+    """
+    Thresholds that spending moved up across, going from ``before`` to
+    ``after`` ((spent_minor, amount_minor) pairs; the amount can change
+    too). ``before=None`` (a new budget) counts every threshold reached.
+    """
+    spent_after, amount_after = after
+    return [t for t in thresholds
+            if (before is None or before[0] * 100 < t * before[1]) and spent_after * 100 >= t * amount_after]
+
+
+def _add_alerts(session, user_id, budget_id, category_id, budget_month, thresholds, amount_minor, spent_minor):
+    for threshold in thresholds:
+        session.add(BudgetAlert(user_id=user_id, budget_id=budget_id, category_id=category_id, budget_month=budget_month,
+                                threshold=threshold, amount_minor=amount_minor, spent_minor=spent_minor))
+
+
+def expense_deltas(rows):
+    """{(user_id, category_id, day): net amount} for transaction rows (mappings or objects); others are skipped."""
+    deltas = {}
+    for row in rows:
+        get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+        if get('transaction_type') != 'expense' or get('category_id') is None:
+            continue
+        key = (get('user_id'), get('category_id'), get('date'))
+        deltas[key] = deltas.get(key, 0) + get('amount_minor')
+    return deltas
+
+
+def expense_changes(rows, removed=()):
+    """Net expense deltas for rows written (``rows``) and rows overwritten or deleted (``removed``)."""
+    deltas = expense_deltas(rows)
+    for key, amount in expense_deltas(removed).items():
+        deltas[key] = deltas.get(key, 0) - amount
+    return deltas
+
+
+def _budget_changes(session, user_id, days):
+    """{budget id: net change} for one user's [(category_id, day, amount)], sorted by category and day."""
+    budgets = Budget.__table__
+    first, last = min(day for _, day, _ in days), max(day for _, day, _ in days)
+    candidates = session.execute(
+        select(budgets.c.id, budgets.c.category_id, budgets.c.budget_month, budgets.c.period)
+        .where(budgets.c.user_id == user_id,
+               budgets.c.category_id.in_({category_id for category_id, _, _ in days}),
+               budgets.c.budget_month <= last,
+               budgets.c.budget_month > first - LONGEST_PERIOD,
+               budgets.c.period.in_(BUDGET_PERIODS))
+    ).all()
+    windows = [(b.category_id, b.budget_month, b.budget_month + BUDGET_PERIODS[b.period], b.id) for b in candidates]
+    return {budget_id: amount for budget_id, amount in window_totals(days, windows).items() if amount}
+
+
+def record_expenses(deltas, session=None):
+    """
+    Applies {(user_id, category_id, day): net amount} to the budgets whose
+    periods contain those days, in the current transaction, and adds alerts
+    for the thresholds crossed. Returns the number of budgets updated.
+    """
+    session = session or db.session
+    budgets = Budget.__table__
+    by_user = {}
+    for (user_id, category_id, day), amount in deltas.items():
+        if amount:
+            by_user.setdefault(user_id, []).append((category_id, day, amount))
+
+    updated = 0
+    for user_id, days in sorted(by_user.items()):
+        changes = _budget_changes(session, user_id, sorted(days))
+        for budget_id, delta in sorted(changes.items()):
+            row = session.execute(
+                update(budgets).where(budgets.c.id == budget_id)
+                .values(spent_minor=budgets.c.spent_minor + delta)
+                .returning(budgets.c.category_id, budgets.c.budget_month, budgets.c.amount_minor,
+                           budgets.c.spent_minor, budgets.c.alert_thresholds)
+            ).one()
+            thresholds = sorted(int(p) for p in row.alert_thresholds.split(',') if p)
+            crossed = crossed_thresholds(thresholds, (row.spent_minor - delta, row.amount_minor),
+                                         (row.spent_minor, row.amount_minor))
+            _add_alerts(session, user_id, budget_id, row.category_id, row.budget_month, crossed,
+                        row.amount_minor, row.spent_minor)
+        if changes:
+            bump_data_version(user_id, session=session)  # the budget rows were changed with Core statements
+            updated += len(changes)
+    return updated
+
+
+def sync_budget(budget, before=None):
+    """
+    Recounts ``budget.spent_minor`` after a budget is created or edited and
+    adds alerts for thresholds crossed since ``before`` ((spent, amount) as
+    they were; None for a new budget).
+    Call after the budget has been flushed, so it has an id.
+    """
+    budget.spent_minor = budget_spending(budget.user_id, [budget]).get(budget.id) or 0
+    add_crossed_alerts(budget, before)
+
+
+def add_crossed_alerts(budget, before=None):
+    """Adds alerts for the thresholds ``budget`` crossed since ``before`` ((spent, amount); None for a new budget)."""
+    crossed = crossed_thresholds(budget.thresholds, before, (budget.spent_minor, budget.amount_minor))
+    _add_alerts(db.session, budget.user_id, budget.id, budget.category_id, budget.budget_month, crossed,
+                budget.amount_minor, budget.spent_minor)
+
+
+def _row_values(obj, previous=False):
+    state = inspect(obj)
+    values = {}
+    for name in EXPENSE_COLUMNS:
+        deleted = state.attrs[name].history.deleted if previous else ()
+        values[name] = deleted[0] if deleted else getattr(obj, name)
+    return values
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Setting one of these on an expired Transaction (as every object is after a commit) loads the old value first,
+# so the flush hook below can take it out of the budgets it was counted in.
+for _name in EXPENSE_COLUMNS:
+    event.listen(getattr(Transaction, _name), 'set', _load_old_value, active_history=True)
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_expense_writes(session, flush_context, instances):
+    rows, removed = [], []
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            if obj.date is None:
+                obj.date = date.today()  # resolve the column default now, so the month counted is the one stored
+            rows.append(_row_values(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and session.is_modified(obj, include_collections=False):
+            removed.append(_row_values(obj, previous=True))
+            rows.append(_row_values(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            removed.append(_row_values(obj))
+    if not rows and not removed:
+        return
+
+    with session.no_autoflush:
+        record_expenses(expense_changes(rows, removed), session=session)
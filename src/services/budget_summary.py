@@ -0,0 +1,106 @@
+"""
+Budget vs. actual spending.
+
+Every budget covers a window, ``[budget_month, budget_month + period)``, so
+budgets of all periods are evaluated the same way. ``budget_spending`` takes
+any number of budgets and answers them with one grouped query: the user's
+daily expense totals per budgeted category over the union of the windows,
+sorted by category and day, which ``window_totals`` splits into per-budget
+totals in a single pass. The cost grows with the days and categories
+covered, not with the number of budgets.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+
+from src.extensions import db
+from src.models.budget import Budget, BUDGET_PERIODS, LONGEST_PERIOD
+from src.models.money import to_major
+from src.services.archive import transaction_rows
+
+
+def window_totals(day_totals, windows):
+    """
+    {key: total of the rows inside the window} for (category_id, start, end,
+    key) windows, from (category_id, day, total) rows sorted by category and
+    day. One merge pass over the rows and the sorted window boundaries yields
+    the running total before each boundary; a window's total is the
+    difference between its end and start.
+    """
+    boundaries = sorted({(w[0], day) for w in windows for day in (w[1], w[2])})
+    running_totals = {}
+    rows = iter(day_totals)
+    row = next(rows, None)
+    category, running = None, 0
+    for boundary in boundaries:
+        while row is not None and (row[0], row[1]) < boundary:
+            if row[0] != category:
+                category, running = row[0], 0
+            running += row[2]
+            row = next(rows, None)
+        running_totals[boundary] = running if category == boundary[0] else 0
+    return {key: running_totals[(category_id, end)] - running_totals[(category_id, start)]
+            for category_id, start, end, key in windows}
+
+
+def budget_spending(user_id, budgets):
+    """{budget id: expenses in the budget's category and window} for budgets of known periods."""
+    windows = [(b.category_id, b.budget_month, b.period_end, b.id) for b in budgets if b.period_end]
+    if not windows:
+        return {}
+    start = min(w[1] for w in windows)
+    end = max(w[2] for w in windows)
+
+    rows = transaction_rows(user_id, start)
+    day_totals = db.session.execute(
+        select(rows.c.category_id, rows.c.date, func.sum(rows.c.amount_minor))
+        .where(rows.c.user_id == user_id,
+               rows.c.transaction_type == 'expense',
+               rows.c.category_id.in_({w[0] for w in windows}),
+               rows.c.date >= start,
+               rows.c.date < end)
+        .group_by(rows.c.category_id, rows.c.date)
+        .order_by(rows.c.category_id, rows.c.date)
+    ).all()
+    return window_totals(day_totals, windows)
+
+
+def build_budget_summary(user_id, start, end=None):
+    """
+    Budget vs. spending for every budget whose period overlaps
+    ``[start, end)`` (just the day ``start`` if end is None), ordered by
+    period start and category.
+    """
+    end = end or start + timedelta(days=1)
+    budgets = Budget.query.options(joinedload(Budget.category)).filter(
+        Budget.user_id == user_id,
+        Budget.period.in_(BUDGET_PERIODS),
+        Budget.budget_month < end,
+        Budget.budget_month > start - LONGEST_PERIOD,
+    ).order_by(Budget.budget_month, Budget.category_id).all()
+    budgets = [budget for budget in budgets if budget.period_end > start]
+    spent = budget_spending(user_id, budgets)
+
+    summary = []
+    for budget in budgets:
+        total_spent = spent.get(budget.id) or 0
+        summary.append({
+            'budget_id': budget.id,
+            'category_id': budget.category_id,
+            'category_name': budget.category.name if getattr(budget, 'category', None) and getattr(budget.category, 'name', None) else 'N/A',
+            'budgeted_amount': to_major(budget.amount_minor),
+            'spent_amount': to_major(total_spent),
+            'remaining_amount': to_major(budget.amount_minor - total_spent),
+            'period': budget.period,
+            'budget_month': budget.budget_month.strftime('%Y-%m'),
+            'period_start': budget.budget_month.isoformat(),
+            'period_end': budget.period_end.isoformat(),
+        })
+    return summary
+
+
+def build_month_summary(user_id, year, month):
+    """Budgets overlapping a calendar month: its monthly budgets, the weekly ones in it and yearly ones covering it."""
+    start = date(year, month, 1)
+    return build_budget_summary(user_id, start, start + BUDGET_PERIODS['monthly'])
@@ -0,0 +1,154 @@
+"""Small in-process caches."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """A thread-safe, size-bounded least-recently-used mapping with optional per-entry TTL."""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl  # seconds; None keeps entries until evicted
+        self._data = OrderedDict()  # key -> (expires_at or None, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, self._MISSING)
+            if entry is self._MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, self._MISSING)
+        return default if entry is self._MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SizedCache:
+    """
+    A thread-safe mapping bounded by the total size of its values (anything
+    with a len(), e.g. bytes) rather than their number. When full it evicts
+    the least recently used entry ('lru') or the least often used one
+    ('lfu'; the least recently used among equals). Optional per-entry TTL.
+    """
+
+    POLICIES = ('lru', 'lfu')
+    ENTRY_OVERHEAD = 200  # rough bytes per entry for the key and bookkeeping
+
+    def __init__(self, max_bytes, policy='lru', ttl=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f'Unknown eviction policy: {policy}')
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.ttl = ttl  # seconds; None keeps entries until evicted
+        self.size = 0
+        self.evictions = 0
+        self._entries = {}  # key -> [value, size, expires_at or None, uses]
+        self._order = OrderedDict()  # 'lru': keys, least recently used first
+        self._by_uses = {}  # 'lfu': use count -> OrderedDict of keys, least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                return default
+            self._touch(key, entry)
+            return entry[0]
+
+    def set(self, key, value):
+        size = len(value) + self.ENTRY_OVERHEAD
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if size > self.max_bytes:  # would evict everything else and still not fit
+                if entry is not None:
+                    self._remove(key)
+                return
+            if entry is None:
+                entry = self._entries[key] = [value, size, expires_at, 0]
+                self._link(key, entry)
+                self.size += size
+            else:
+                self.size += size - entry[1]
+                entry[0], entry[1], entry[2] = value, size, expires_at
+                self._touch(key, entry)
+            while self.size > self.max_bytes:
+                self._remove(self._victim())
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._remove(key)[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._order.clear()
+            self._by_uses.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _link(self, key, entry):
+        if self.policy == 'lru':
+            self._order[key] = None
+        else:
+            self._by_uses.setdefault(entry[3], OrderedDict())[key] = None
+
+    def _unlink(self, key, entry):
+        if self.policy == 'lru':
+            del self._order[key]
+        else:
+            keys = self._by_uses[entry[3]]
+            del keys[key]
+            if not keys:
+                del self._by_uses[entry[3]]
+
+    def _touch(self, key, entry):
+        if self.policy == 'lru':
+            self._order.move_to_end(key)
+        else:
+            self._unlink(key, entry)
+            entry[3] += 1
+            self._link(key, entry)
+
+    def _victim(self):
+        keys = self._order if self.policy == 'lru' else self._by_uses[min(self._by_uses)]
+        return next(iter(keys))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._unlink(key, entry)
+        self.size -= entry[1]
+        return entry
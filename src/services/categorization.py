@@ -0,0 +1,182 @@
+"""
+Rule-based auto-categorization.
+
+All of a user's active rules are compiled into one Aho-Corasick automaton over
+their (lower-cased) description patterns, so a description is scanned once no
+matter how many rules the user has. The compiled matcher is cached per user and
+only rebuilt when the user's rule set changes.
+"""
+import threading
+from collections import deque
+
+from sqlalchemy import func, update
+
+from src.extensions import db
+from src.models.category_rule import CategoryRule
+from src.models.transaction import Transaction
+from src.services.budget_alerts import expense_deltas, record_expenses
+from src.services.data_version import bump_data_version
+
+
+class _Automaton:
+    """Minimal Aho-Corasick automaton reporting which patterns occur in a text."""
+
+    def __init__(self, patterns):
+        # patterns: iterable of (pattern_text, payload)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for text, payload in patterns:
+            node = 0
+            for ch in text:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(payload)
+
+        # Breadth-first pass to wire failure links and merge outputs.
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt].extend(self._out[self._fail[nxt]])
+
+    def search(self, text):
+        """Returns the set of payloads whose pattern occurs in ``text``."""
+        found = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+class CompiledRuleSet:
+    """A user's rules compiled into a single matcher."""
+
+    def __init__(self, rules):
+        # Rule order is match precedence: lower priority first, then older rules.
+        self._rules = sorted(rules, key=lambda r: (r.priority, r.id))
+        self._unconditional = []  # indexes of rules without a description pattern
+        patterns = []
+        for index, rule in enumerate(self._rules):
+            pattern = (rule.pattern or '').strip().lower()
+            if pattern:
+                patterns.append((pattern, index))
+            else:
+                self._unconditional.append(index)
+        self._automaton = _Automaton(patterns)
+
+    def __len__(self):
+        return len(self._rules)
+
+    def match(self, description, amount_minor, transaction_type):
+        """Returns the category_id of the best matching rule, or None. Amounts are in minor units."""
+        if not self._rules:
+            return None
+        candidates = self._automaton.search((description or '').lower())
+        candidates.update(self._unconditional)
+        for index in sorted(candidates):
+            rule = self._rules[index]
+            if rule.transaction_type and rule.transaction_type != transaction_type:
+                continue
+            if rule.min_amount_minor is not None and amount_minor < rule.min_amount_minor:
+                continue
+            if rule.max_amount_minor is not None and amount_minor > rule.max_amount_minor:
+                continue
+            return rule.category_id
+        return None
+
+
+_cache_lock = threading.Lock()
+_compiled_rules = {}  # user_id -> (signature, CompiledRuleSet)
+
+
+def _rules_signature(user_id):
+    """Cheap fingerprint of a user's rule set; it changes whenever a rule is added, edited or removed."""
+    return tuple(db.session.query(
+        func.count(CategoryRule.id),
+        func.max(CategoryRule.id),
+        func.max(CategoryRule.updated_at)
+    ).filter(CategoryRule.user_id == user_id).one())
+
+
+def get_rule_matcher(user_id):
+    """Returns the compiled rule set for a user, rebuilding it only if the rules changed."""
+    signature = _rules_signature(user_id)
+    with _cache_lock:
+        cached = _compiled_rules.get(user_id)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    rules = db.session.query(
+        CategoryRule.id, CategoryRule.category_id, CategoryRule.pattern,
+        CategoryRule.transaction_type, CategoryRule.min_amount_minor,
+        CategoryRule.max_amount_minor, CategoryRule.priority
+    ).filter(CategoryRule.user_id == user_id, CategoryRule.is_active == True).all()
+    compiled = CompiledRuleSet(rules)
+    with _cache_lock:
+        _compiled_rules[user_id] = (signature, compiled)
+    return compiled
+
+
+def categorize(user_id, description, amount_minor, transaction_type, matcher=None):
+    """Returns the category_id the user's rules assign to a transaction, or None."""
+    if matcher is None:  # an empty rule set is falsy but still valid
+        matcher = get_rule_matcher(user_id)
+    return matcher.match(description, amount_minor, transaction_type)
+
+
+def apply_rules_to_uncategorized(user_id, batch_size=1000):
+    """
+    Backfills category_id on the user's uncategorized transactions.
+    Returns the number of transactions that were categorized. The caller commits.
+    """
+    matcher = get_rule_matcher(user_id)
+    if not len(matcher):
+        return 0
+
+    categorized = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            Transaction.id, Transaction.description, Transaction.amount_minor, Transaction.transaction_type,
+            Transaction.date
+        ).filter(
+            Transaction.user_id == user_id,
+            Transaction.category_id.is_(None),
+            Transaction.id > last_id
+        ).order_by(Transaction.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        updates, categorized_rows = [], []
+        for row in rows:
+            category_id = matcher.match(row.description, row.amount_minor, row.transaction_type)
+            if category_id is not None:
+                updates.append({'id': row.id, 'category_id': category_id})
+                categorized_rows.append({'user_id': user_id, 'category_id': category_id, 'date': row.date,
+                                         'amount_minor': row.amount_minor, 'transaction_type': row.transaction_type})
+        if updates:
+            db.session.execute(update(Transaction), updates)
+            record_expenses(expense_deltas(categorized_rows))  # bulk updates skip the flush hook
+            categorized += len(updates)
+    if categorized:
+        bump_data_version(user_id)
+    return categorized
@@ -0,0 +1,261 @@
+"""
+Columnar (Parquet and Arrow IPC) export and import of transactions.
+
+Exports are typed: ``date`` is a date32 column and ``amount`` an exact
+decimal128 with the currency's scale. They are built from a column query
+read in ``BATCH_ROWS`` partitions, and each partition becomes one record
+batch (one Parquet row group) that is sent as soon as it is written, so
+memory stays flat for any history size. Imports accept the same layout and
+are validated column-at-a-time before a single multi-row insert.
+
+``pyarrow`` is pinned in requirements.txt but only imported here, so the
+rest of the app runs without it. Then these functions raise
+``ColumnarUnavailable``, which routes turn into a 501.
+"""
+from datetime import datetime
+
+import numpy as np
+
+from src.models.money import CURRENCY_EXPONENT, to_minor
+
+FORMATS = ('parquet', 'arrow')
+MIMETYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrows'}
+BATCH_ROWS = 65536
+AMOUNT_PRECISION = 18
+
+# Export columns, in the order the export query selects them.
+EXPORT_COLUMNS = ('id', 'date', 'amount', 'transaction_type', 'description', 'category_id', 'category', 'created_at')
+
+
+class ColumnarUnavailable(Exception):
+    """Raised when pyarrow is not installed."""
+
+    def __init__(self):
+        super().__init__('Columnar formats require the pyarrow package')
+
+
+class ColumnarImportError(ValueError):
+    """An import file that can't be read or has invalid rows; the message is safe to show."""
+
+
+def _pyarrow():
+    try:
+        import pyarrow  # optional dependency, only needed for these formats
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ColumnarUnavailable()
+    return pyarrow
+
+
+def export_schema():
+    pa = _pyarrow()
+    return pa.schema([
+        ('id', pa.int64()),
+        ('date', pa.date32()),
+        ('amount', pa.decimal128(AMOUNT_PRECISION, CURRENCY_EXPONENT)),
+        ('transaction_type', pa.string()),
+        ('description', pa.string()),
+        ('category_id', pa.int64()),
+        ('category', pa.string()),
+        ('created_at', pa.timestamp('us')),
+    ])
+
+
+def _decimal_from_minor(pa, minor):
+    """int64 minor units -> decimal128 amounts, by writing the unscaled 128-bit values directly."""
+    words = np.empty((len(minor), 2), dtype=np.int64)
+    words[:, 0] = minor
+    words[:, 1] = minor >> 63  # sign extension into the high word
+    return pa.Array.from_buffers(pa.decimal128(AMOUNT_PRECISION, CURRENCY_EXPONENT), len(minor),
+                                 [None, pa.py_buffer(words)])
+
+
+def _minor_from_decimal(pa, amounts):
+    """decimal amounts -> int64 minor units; rejects values with more decimals than the currency has."""
+    try:
+        scaled = amounts.cast(pa.decimal128(38, CURRENCY_EXPONENT))
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        raise ColumnarImportError(f'amount has more than {CURRENCY_EXPONENT} decimal places')
+    words = np.frombuffer(scaled.buffers()[1], dtype=np.int64)[2 * scaled.offset:2 * (scaled.offset + len(scaled))].reshape(-1, 2)
+    if np.any(words[:, 1] != words[:, 0] >> 63):
+        raise ColumnarImportError('amount is out of range')
+    return words[:, 0].copy()
+
+
+def _record_batch(pa, schema, rows):
+    """One partition of export query rows -> a RecordBatch (dates and timestamps arrive as ISO strings)."""
+    ids, dates, amounts, types, descriptions, category_ids, categories, created = zip(*rows)
+    return pa.RecordBatch.from_arrays([
+        pa.array(ids, pa.int64()),
+        pa.array(dates, pa.string()).cast(pa.date32()),
+        _decimal_from_minor(pa, np.fromiter(amounts, dtype=np.int64, count=len(rows))),
+        pa.array(types, pa.string()),
+        pa.array(descriptions, pa.string()),
+        pa.array(category_ids, pa.int64()),
+        pa.array(categories, pa.string()),
+        pa.array(created, pa.string()).cast(pa.timestamp('us')),
+    ], schema=schema)
+
+
+class _ChunkSink:
+    """A write-only file object that hands back what has been written since the last ``drain``."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+
+def iter_export(partitions, fmt):
+    """Yields the bytes of a Parquet or Arrow IPC stream, one chunk per partition of export query rows."""
+    pa = _pyarrow()
+    schema = export_schema()
+    sink = _ChunkSink()
+    if fmt == 'parquet':
+        writer = pa.parquet.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+    for rows in partitions:
+        writer.write_batch(_record_batch(pa, schema, rows))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def read_table(data, fmt):
+    """Parses an uploaded Parquet file or Arrow IPC stream/file into a Table."""
+    pa = _pyarrow()
+    try:
+        if fmt == 'parquet':
+            return pa.parquet.read_table(pa.BufferReader(data))
+        try:
+            return pa.ipc.open_stream(data).read_all()
+        except pa.ArrowInvalid:
+            return pa.ipc.open_file(data).read_all()
+    except (pa.ArrowInvalid, OSError):
+        raise ColumnarImportError(f'Not a valid {fmt} file')
+
+
+def _first_bad_row(mask):
+    """Index of the first True in a boolean Arrow array (nulls count as bad), or None."""
+    values = mask.fill_null(True).to_numpy(zero_copy_only=False)
+    bad = np.flatnonzero(values)
+    return int(bad[0]) if len(bad) else None
+
+
+def _check(mask, message):
+    row = _first_bad_row(mask)
+    if row is not None:
+        raise ColumnarImportError(f'Row {row}: {message}')
+
+
+def _amounts_minor(pa, table):
+    pc = pa.compute
+    if 'amount_minor' in table.column_names:
+        column = table['amount_minor'].combine_chunks()
+        if not pa.types.is_integer(column.type):
+            raise ColumnarImportError('amount_minor must be an integer column')
+        _check(pc.is_null(column), 'Amount is required')
+        return column.cast(pa.int64()).to_numpy()
+    if 'amount' not in table.column_names:
+        raise ColumnarImportError('An amount or amount_minor column is required')
+    column = table['amount'].combine_chunks()
+    _check(pc.is_null(column), 'Amount is required')
+    if pa.types.is_decimal(column.type):
+        return _minor_from_decimal(pa, column)
+    if pa.types.is_integer(column.type):
+        return column.cast(pa.int64()).to_numpy() * 10 ** CURRENCY_EXPONENT
+    # Floats and strings go through to_minor, so they round exactly like the JSON API.
+    try:
+        return np.fromiter((to_minor(v) for v in column.to_pylist()), dtype=np.int64, count=len(column))
+    except ValueError:
+        raise ColumnarImportError('amount contains invalid values')
+
+
+def _dates(pa, table):
+    column = table['date'].combine_chunks()
+    try:
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            column = column.cast(pa.date32())
+        elif pa.types.is_timestamp(column.type) or pa.types.is_date(column.type):
+            column = column.cast(pa.date32())
+        else:
+            raise ColumnarImportError('date must be a date, timestamp or YYYY-MM-DD string column')
+    except pa.ArrowInvalid:
+        raise ColumnarImportError('Invalid date format. Use YYYY-MM-DD')
+    _check(pa.compute.is_null(column), 'Date is required')
+    return column
+
+
+def table_to_rows(table, user_id, category_ids, matcher):
+    """
+    Validates an import table and returns insert parameters for the
+    ``transaction`` table. ``category_ids`` is the set of valid ids; rows
+    without one are categorized with ``matcher`` (the user's rules).
+    """
+    pa = _pyarrow()
+    pc = pa.compute
+    if table.num_rows == 0:
+        raise ColumnarImportError('The file contains no transactions')
+    missing = {'date', 'transaction_type'} - set(table.column_names)
+    if missing:
+        raise ColumnarImportError(f"Missing required column(s): {', '.join(sorted(missing))}")
+
+    types = pc.utf8_lower(table['transaction_type'].combine_chunks().cast(pa.string()))
+    _check(pc.invert(pc.is_in(types, value_set=pa.array(['income', 'expense']))),
+           'Transaction type must be "income" or "expense"')
+    amounts = _amounts_minor(pa, table)
+    _check(pa.array(amounts <= 0), 'Amount must be positive')
+    dates = _dates(pa, table)
+
+    if 'description' in table.column_names:
+        descriptions = pc.utf8_trim_whitespace(table['description'].combine_chunks().cast(pa.string())).fill_null('')
+    else:
+        descriptions = pa.array([''] * table.num_rows)
+    if 'category_id' in table.column_names:
+        categories = table['category_id'].combine_chunks().cast(pa.int64())
+        _check(pc.and_(pc.is_valid(categories),
+                       pc.invert(pc.is_in(categories, value_set=pa.array(sorted(category_ids), pa.int64())))).fill_null(False),
+               'Invalid category ID')
+        categories = categories.to_pylist()
+    else:
+        categories = [None] * table.num_rows
+
+    types, descriptions, dates = types.to_pylist(), descriptions.to_pylist(), dates.to_pylist()
+    amounts = amounts.tolist()
+    created_at = datetime.utcnow()
+    return [{
+        'user_id': user_id,
+        'date': dates[i],
+        'amount_minor': amounts[i],
+        'transaction_type': types[i],
+        'description': descriptions[i],
+        'category_id': categories[i] if categories[i] is not None
+        else matcher.match(descriptions[i], amounts[i], types[i]),
+        'created_at': created_at,
+    } for i in range(table.num_rows)]
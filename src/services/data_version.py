@@ -0,0 +1,61 @@
+"""
+Per-user data versions.
+
+``user_data_version.version`` is incremented in the same transaction as any
+write to the user's financial data, so derived results can be cached under
+``(user_id, data_version)`` and are invalidated implicitly by the next write.
+ORM writes are tracked by a flush hook; Core ``UPDATE``/``DELETE`` statements
+must call ``bump_data_version`` themselves.
+"""
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from src.extensions import db
+from src.models.user_data_version import UserDataVersion
+
+# session.info key holding the ids bumped in the current transaction (read by src/services/events.py).
+BUMPED_USERS_KEY = 'data_version_bumped_users'
+
+# Tables whose rows belong to a user and feed cached, derived data.
+VERSIONED_TABLES = {
+    'transaction', 'budget', 'recurring_transaction', 'savings_goal',
+    'savings_contribution', 'category_rule',
+}
+
+
+def bump_data_version(user_ids, session=None):
+    """Increments data_version for the given user id(s) in the current transaction."""
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    user_ids = sorted(set(uid for uid in user_ids if uid is not None))
+    if not user_ids:
+        return
+    session = session or db.session
+    session.info.setdefault(BUMPED_USERS_KEY, set()).update(user_ids)
+    versions = UserDataVersion.__table__
+    statement = insert(versions).values([{'user_id': uid, 'version': 1} for uid in user_ids])
+    session.execute(statement.on_conflict_do_update(
+        index_elements=[versions.c.user_id], set_={'version': versions.c.version + 1}
+    ))
+
+
+def get_data_version(user_id):
+    return db.session.query(UserDataVersion.version).filter(UserDataVersion.user_id == user_id).scalar() or 0
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_versions_after_flush(session, flush_context):
+    user_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table in VERSIONED_TABLES:
+            user_ids.add(getattr(obj, 'user_id', None))
+    if user_ids:
+        bump_data_version(user_ids, session=session)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _reset_bumped_users(session):
+    session.info.pop(BUMPED_USERS_KEY, None)
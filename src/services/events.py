@@ -0,0 +1,291 @@
+"""
+Live update events.
+
+When a commit changes a user's data, the changed rows and the affected
+months are written to the ``user_event`` table in that same transaction.
+Each worker process runs one dispatcher thread that tails the table by id
+and hands new events to the in-process queues of that user's open streams,
+so a write in any process reaches every tab and device. The dispatcher only
+polls while someone is subscribed, and one indexed range query serves all
+of them. It adds the current balance, totals and budget rows of the
+affected months to an event when delivering it, so writes don't pay for
+those aggregations inside their transaction, and events nobody is watching
+never pay for them. Commits delete expired events in small batches, whether
+or not anyone is subscribed.
+
+Subscriber queues are plain ``queue.Queue`` objects, so under a gevent or
+eventlet worker (``gunicorn -k gevent``) an idle stream is a parked greenlet
+rather than a blocked thread.
+"""
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, delete, event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from src.extensions import db
+from src.models.money import to_major
+from src.models.transaction import Transaction, Category
+from src.models.user_event import UserEvent
+from src.services.archive import archived_totals, with_archived_spending
+from src.services.budget_summary import build_month_summary
+from src.services.data_version import BUMPED_USERS_KEY
+from src.services.sharding import engine_for_user, shard_scope, user_data_engines
+
+# Tables whose changed rows are included in the delta, by entity name.
+EVENT_ENTITIES = {'transaction', 'budget', 'budget_alert', 'recurring_transaction', 'savings_goal'}
+
+_PENDING_KEY = 'user_events_pending'  # session.info key: user_id -> {'changes': [...], 'months': set()}
+# Expired events are deleted by a commit at most this often per database, this many at a time.
+PURGE_INTERVAL_SECONDS = 60
+PURGE_BATCH_SIZE = 1000
+
+_last_purge = {}  # database URL -> time.monotonic() of its last purge
+
+
+def _pending(session, user_id):
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    return pending.setdefault(user_id, {'changes': [], 'months': set()})
+
+
+def _month(value):
+    return (value.year, value.month) if value else None
+
+
+def record_change(session, user_id, table, op, obj, months=()):
+    """Adds a row changed by a Core statement to the user's pending event; the flush hook only sees ORM writes."""
+    pending = _pending(session, user_id)
+    pending['changes'].append((table, op, obj))
+    pending['months'].update(_month(day) for day in months)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    for op, objects in (('created', session.new), ('updated', session.dirty), ('deleted', session.deleted)):
+        for obj in objects:
+            table = getattr(obj, '__tablename__', None)
+            user_id = getattr(obj, 'user_id', None)
+            if table not in EVENT_ENTITIES or user_id is None:
+                continue
+            if op == 'updated' and not session.is_modified(obj, include_collections=False):
+                continue
+            pending = _pending(session, user_id)
+            # Deleted rows are gone after the flush, so their payload is just the id.
+            pending['changes'].append((table, op, obj if op != 'deleted' else {'id': obj.id}))
+            if table == 'transaction':
+                pending['months'].add(_month(obj.date))
+                if op == 'updated':
+                    pending['months'].update(_month(d) for d in inspect(obj).attrs.date.history.deleted)
+            elif table == 'budget':
+                pending['months'].add(_month(obj.budget_month))
+
+
+@event.listens_for(Session, 'before_commit')
+def _publish_pending(session):
+    if not (session.new or session.dirty or session.deleted
+            or session.info.get(_PENDING_KEY) or session.info.get(BUMPED_USERS_KEY)):
+        return
+    session.flush()  # collect changes that haven't been flushed yet
+    # Core writes (bulk updates, atomic increments) are only visible as data version bumps.
+    for user_id in session.info.get(BUMPED_USERS_KEY, ()):
+        _pending(session, user_id)
+    pending = session.info.pop(_PENDING_KEY, {})
+    rows = [{'user_id': user_id, 'payload': json.dumps(_stored_event(changes)), 'created_at': datetime.utcnow()}
+            for user_id, changes in pending.items()]
+    if rows:
+        session.execute(insert(UserEvent.__table__), rows)
+        _maybe_purge(session)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _stored_event(pending):
+    """What is written to user_event: the changed rows (serialized now, while they are loaded) and the months."""
+    return {
+        'changes': [{'entity': table, 'op': op, 'data': obj if isinstance(obj, dict) else obj.to_dict()}
+                    for table, op, obj in pending['changes']],
+        'months': sorted(m for m in pending['months'] if m),
+    }
+
+
+def _maybe_purge(session):
+    """Deletes a batch of expired events from the database this session writes them to, at most once a minute."""
+    url = str(session.get_bind(mapper=inspect(UserEvent)).url)
+    if time.monotonic() - _last_purge.get(url, 0) < PURGE_INTERVAL_SECONDS:
+        return
+    table = UserEvent.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get('EVENT_RETENTION_SECONDS', 600))
+    deleted = session.execute(delete(table).where(table.c.id.in_(
+        select(table.c.id).where(table.c.created_at < cutoff).limit(PURGE_BATCH_SIZE)))).rowcount
+    # A full batch means more are expired: let the next commit continue.
+    _last_purge[url] = 0 if deleted == PURGE_BATCH_SIZE else time.monotonic()
+
+
+def build_delta(user_id, payload):
+    """
+    The delta sent to a stream for a stored event: its changes, the user's
+    current balance and totals, and budget rows of the affected months.
+    Needs an app context.
+    """
+    stored = json.loads(payload)
+    with shard_scope(user_id):
+        return json.dumps(_build_delta(db.session, user_id, stored))
+
+
+def _build_delta(session, user_id, stored):
+    income, expense = session.query(
+        func.coalesce(func.sum(case((Transaction.transaction_type == 'income', Transaction.amount_minor), else_=0)), 0),
+        func.coalesce(func.sum(case((Transaction.transaction_type == 'expense', Transaction.amount_minor), else_=0)), 0)
+    ).filter(Transaction.user_id == user_id).one()
+    archived_income, archived_expense = archived_totals(user_id)
+    income, expense = income + archived_income, expense + archived_expense
+    category_spending = with_archived_spending(user_id, session.query(Category.name, func.sum(Transaction.amount_minor)).join(Transaction).filter(
+        Transaction.user_id == user_id,
+        Transaction.transaction_type == 'expense'
+    ).group_by(Category.name).all())
+
+    budgets = {}  # a weekly or yearly budget can overlap several of the months
+    for year, month in stored['months']:
+        budgets.update((b['budget_id'], b) for b in build_month_summary(user_id, year, month))
+
+    return {
+        'balance': to_major(income - expense),
+        'total_income': to_major(income),
+        'total_expense': to_major(expense),
+        'category_spending': [{'category': name, 'amount': to_major(total)} for name, total in category_spending],
+        'changes': stored['changes'],
+        'budgets': list(budgets.values()),
+    }
+
+
+class EventDispatcher:
+    """Tails user_event (in every shard, if sharded) and fans new rows out to this process's subscribers."""
+
+    def __init__(self, app, engines, engine_for_user, poll_interval=0.5, queue_size=100):
+        self.app = app
+        self.engines = engines
+        self.engine_for_user = engine_for_user
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._subscribers = {}  # user_id -> set of queues
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_ids = {}  # engine index -> last event id seen
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, user_id, queue_class=queue.Queue):
+        """A new queue receiving the user's events; ``queue_class`` may be a ``queue.Queue`` subclass."""
+        q = queue_class(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-dispatcher', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues:
+                queues.discard(q)
+                if not queues:
+                    del self._subscribers[user_id]
+
+    @staticmethod
+    def replay_statement(user_id, after_id):
+        table = UserEvent.__table__
+        return select(table.c.id, table.c.payload).where(table.c.user_id == user_id, table.c.id > after_id)\
+            .order_by(table.c.id)
+
+    def replay(self, user_id, after_id):
+        """Deltas of the events still retained for a user after the given id (for Last-Event-ID reconnects)."""
+        with self.app.app_context():  # streams iterate outside the request's context
+            with self.engine_for_user(user_id).connect() as conn:
+                rows = conn.execute(self.replay_statement(user_id, after_id)).all()
+            return [(event_id, build_delta(user_id, payload)) for event_id, payload in rows]
+
+    def delta(self, user_id, payload):
+        """The delta to send for a stored event payload (see build_delta)."""
+        with self.app.app_context():
+            return build_delta(user_id, payload)
+
+    def _run(self):
+        table = UserEvent.__table__
+        while True:
+            with self._lock:
+                idle = not self._subscribers
+            if idle:
+                self._last_ids.clear()  # start from the tail again when someone subscribes
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            for index, engine in enumerate(self.engines):
+                try:
+                    self._poll(index, engine, table)
+                except Exception as e:
+                    # The database may be briefly locked; try again on the next tick.
+                    self.app.logger.warning(f"Event dispatcher poll failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def _poll(self, index, engine, table):
+        with engine.connect() as conn:
+            if index not in self._last_ids:
+                self._last_ids[index] = conn.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+            rows = conn.execute(
+                select(table.c.id, table.c.user_id, table.c.payload)
+                .where(table.c.id > self._last_ids[index]).order_by(table.c.id)
+            ).all()
+        for row in rows:
+            self._last_ids[index] = row.id
+            self._deliver(row.user_id, row.id, row.payload)
+
+    def _deliver(self, user_id, event_id, payload):
+        with self._lock:
+            queues = list(self._subscribers.get(user_id, ()))
+        if not queues:
+            return
+        try:
+            item = (event_id, self.delta(user_id, payload))
+        except Exception as e:
+            self.app.logger.warning(f"Could not build live update delta for user {user_id}: {e}")
+            item = None
+        for q in queues:
+            if item is not None:
+                try:
+                    q.put_nowait(item)
+                    continue
+                except queue.Full:
+                    pass
+            # A stalled client, or a delta we couldn't build: tell it to resync instead.
+            self.unsubscribe(user_id, q)
+            q.queue.clear()
+            q.put_nowait(None)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher(app):
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            with app.app_context():
+                engines = user_data_engines()
+            _dispatcher = EventDispatcher(
+                app, engines, engine_for_user,
+                poll_interval=app.config.get('EVENT_POLL_INTERVAL_SECONDS', 0.5),
+            )
+        return _dispatcher
@@ -0,0 +1,130 @@
+"""
+Opt-in group commit for small, high-rate writes.
+
+Normally each request commits its own write. On SQLite that means waiting
+for the write lock and an fsync every time. With ``GROUP_COMMIT`` on, the
+routes that create transactions, budgets and savings contributions validate
+the payload as usual and then hand the write to a writer thread instead of
+committing it. The writer collects writes until it has
+``GROUP_COMMIT_MAX_ROWS`` of them or ``GROUP_COMMIT_MAX_DELAY_MS`` have
+passed since the first arrived. It runs them in one session and commits
+once. Each request waits for the commit that includes its write, so a 201
+still means the row is durable.
+
+With sharding there is one writer per shard, so each batch writes one file.
+The session hooks (data versions, budget totals, live update events) run
+in the writer's session, the same as they would in the request's. If a
+batch fails, its writes are retried one transaction each, so only the
+faulty write gets the error.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app
+
+from src.extensions import db
+from src.services.sharding import get_shard_router, shard_scope
+
+
+class _Write:
+    __slots__ = ('user_id', 'work', 'future')
+
+    def __init__(self, user_id, work):
+        self.user_id = user_id
+        self.work = work
+        self.future = Future()
+
+
+class GroupCommitter:
+    def __init__(self, app, max_rows=200, max_delay=0):
+        self.app = app
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._lanes = {}  # shard index (None without sharding) -> queue of its writer thread
+        self._pid = None
+
+    def submit(self, user_id, work):
+        """Queues ``work`` for the user's writer and waits for its batch to commit. Returns what ``work`` returned."""
+        write = _Write(user_id, work)
+        router = get_shard_router()
+        self._lane(router.shard_for(user_id) if router is not None else None).put(write)
+        return write.future.result()
+
+    def _lane(self, key):
+        with self._lock:
+            if self._pid != os.getpid():  # the writer threads don't survive a fork
+                self._lanes, self._pid = {}, os.getpid()
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = queue.SimpleQueue()
+                threading.Thread(target=self._run, args=(lane,), name=f'group-commit-{key}', daemon=True).start()
+            return lane
+
+    def _run(self, lane):
+        while True:
+            batch = [lane.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(lane.get(timeout=remaining) if remaining > 0 else lane.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self.app.app_context():
+                    self._commit(batch)
+            except Exception as e:
+                self.app.logger.error(f"Group commit writer error: {e}")
+                for write in batch:
+                    if not write.future.done():
+                        write.future.set_exception(e)
+
+    def _commit(self, batch):
+        try:
+            # Every write in a batch is on the same shard, so any of its users routes the session there.
+            with shard_scope(batch[0].user_id):
+                results = [write.work(db.session) for write in batch]
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+            else:
+                for write in batch:
+                    self._commit([write])
+            return
+        for write, result in zip(batch, results):
+            write.future.set_result(result)
+
+
+def commit_write(user_id, work):
+    """
+    Runs ``work(session)`` and commits it, in the request or through the
+    group-commit writer, and returns what ``work`` returned. ``work`` may be
+    run again if its batch fails, and must build its response before
+    returning, since the objects it wrote belong to the writer's session.
+    """
+    committer = current_app.extensions.get('group_commit')
+    if committer is None:
+        result = work(db.session)
+        db.session.commit()
+        return result
+    db.session.close()  # the request's reads are done; don't hold a pooled connection the writer may need
+    return committer.submit(user_id, work)
+
+
+def init_group_commit(app):
+    """Installs the group-commit writer if GROUP_COMMIT is on; returns it (or None)."""
+    app.extensions.pop('group_commit', None)
+    if not app.config.get('GROUP_COMMIT', False):
+        return None
+    committer = app.extensions['group_commit'] = GroupCommitter(
+        app,
+        max_rows=app.config.get('GROUP_COMMIT_MAX_ROWS', 200),
+        max_delay=app.config.get('GROUP_COMMIT_MAX_DELAY_MS', 0) / 1000,
+    )
+    return committer
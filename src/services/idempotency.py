@@ -0,0 +1,172 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+A client may send an ``Idempotency-Key`` header with a POST. The first request
+with a given key is processed normally and its response is stored; any retry
+with the same key and the same payload gets the stored response back instead of
+repeating the write. Keys expire after ``IDEMPOTENCY_KEY_TTL_HOURS`` and
+expired rows are compacted in small batches.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request, session
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.extensions import db
+from src.models.idempotency_key import IdempotencyKey
+
+DEFAULT_TTL_HOURS = 24
+# A claim whose request never finished (e.g. the worker died) may be taken over after this long.
+PENDING_LEASE = timedelta(minutes=5)
+COMPACTION_INTERVAL_SECONDS = 600
+COMPACTION_BATCH_SIZE = 1000
+
+_last_compaction = 0.0
+
+
+def _request_fingerprint():
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _replay(record):
+    response = make_response(record.response_body or '', record.status_code)
+    response.mimetype = 'application/json'
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(user_id, key, fingerprint, now, ttl):
+    """
+    Claims the key for this request. Returns None if the claim succeeded,
+    otherwise the response to send instead.
+    """
+    record = IdempotencyKey(
+        user_id=user_id, key=key, method=request.method, path=request.path[:255],
+        request_hash=fingerprint, created_at=now, expires_at=now + ttl
+    )
+    try:
+        db.session.add(record)
+        db.session.commit()
+        return None
+    except IntegrityError:
+        db.session.rollback()
+
+    existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    if existing is None:
+        return jsonify({'error': 'Idempotency key conflict. Retry the request.'}), 409
+
+    reclaimable = existing.expires_at < now or (existing.status_code is None and existing.created_at < now - PENDING_LEASE)
+    if reclaimable:
+        # Conditional takeover: only one of several racing retries wins.
+        taken = db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.id == existing.id, IdempotencyKey.created_at == existing.created_at)
+            .values(request_hash=fingerprint, method=request.method, path=request.path[:255],
+                    status_code=None, response_body=None, created_at=now, expires_at=now + ttl)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if taken:
+            return None
+        existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).populate_existing().first()
+
+    if existing.request_hash != fingerprint:
+        return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+    if existing.status_code is None:
+        response = jsonify({'error': 'A request with this Idempotency-Key is still being processed'})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+    return _replay(existing)
+
+
+def _release(user_id, key):
+    """Deletes the claim so the client can retry with the same key."""
+    db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+def _store(user_id, key, response):
+    if response.status_code >= 500:
+        # Server errors are not final: release the key so the client can retry.
+        _release(user_id, key)
+        return
+    db.session.execute(update(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                       .values(status_code=response.status_code, response_body=response.get_data(as_text=True))
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+def compact_expired_keys(now=None, batch_size=COMPACTION_BATCH_SIZE):
+    """Deletes one batch of expired keys via the expires_at index. Returns the number deleted."""
+    now = now or datetime.utcnow()
+    expired_ids = select(IdempotencyKey.id).where(IdempotencyKey.expires_at < now).limit(batch_size)
+    deleted = db.session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.id.in_(expired_ids)).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def _maybe_compact(now):
+    global _last_compaction
+    if time.monotonic() - _last_compaction < COMPACTION_INTERVAL_SECONDS:
+        return
+    _last_compaction = time.monotonic()
+    try:
+        compact_expired_keys(now)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f"Idempotency key compaction failed: {e}")
+
+
+def idempotent(f):
+    """Decorator honoring the Idempotency-Key header. Apply below @login_required."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key', '').strip()
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > 64:
+            return jsonify({'error': 'Idempotency-Key must be at most 64 characters'}), 400
+
+        user_id = session['user_id']
+        now = datetime.utcnow()
+        ttl = timedelta(hours=current_app.config.get('IDEMPOTENCY_KEY_TTL_HOURS', DEFAULT_TTL_HOURS))
+        try:
+            early_response = _claim(user_id, key, _request_fingerprint(), now, ttl)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error claiming idempotency key: {e}")
+            return jsonify({'error': 'Failed to process Idempotency-Key'}), 500
+        if early_response is not None:
+            return early_response
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except BaseException:
+            # Like a 5xx, an exception (HTTPException included) is not final: release the key, then re-raise.
+            try:
+                db.session.rollback()
+                _release(user_id, key)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Error releasing idempotency key: {e}")
+            raise
+        try:
+            _store(user_id, key, response)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error storing idempotent response: {e}")
+        _maybe_compact(now)
+        return response
+    return decorated_function
@@ -0,0 +1,79 @@
+"""
+Single-statement writes to a user's rows.
+
+Mutation routes change a row with one ``UPDATE ... WHERE id = :id AND
+user_id = :uid RETURNING *`` (or ``DELETE ... RETURNING``), after the
+payload has been validated. The ownership check, the write and the row for
+the response take one round trip, and the write lock is only held from that
+statement to the commit. The returned objects are fully loaded, along with
+any relationships named in ``options`` (loader options such as
+``selectinload``), so build the response before committing, which expires
+them.
+
+SQLite's RETURNING only sees new values. A write whose new values depend on
+old ones (a budget delta, a recomputed due date) names those columns in
+``read``. They are read first, outside the write transaction, and the update
+applies only if the row still holds them. If another write got there first,
+the read and the update are retried.
+
+These are Core-level writes, so the flush hooks don't see them; call
+``record_write`` to bump the data version and add the change to the user's
+live update event.
+"""
+from sqlalchemy import delete, select, update
+
+from src.extensions import db
+from src.services.data_version import bump_data_version
+from src.services.events import record_change
+
+UPDATE_ATTEMPTS = 3
+
+
+class WriteConflict(Exception):
+    """The row kept changing between the read of its old values and the update."""
+
+
+def _owned(table, row_id, user_id):
+    return table.c.id == row_id, table.c.user_id == user_id
+
+
+def update_owned(model, row_id, user_id, values, read=(), options=()):
+    """
+    Updates one of the user's rows and returns ``(obj, old)``: the updated
+    object and the old values of the ``read`` columns (a Row, or None).
+    ``obj`` is None if the user has no such row. With ``read``, ``values``
+    is a function of the old values returning the dict to write; it may
+    raise ValueError. ``options`` are loader options for ``obj``.
+    """
+    table = model.__table__
+    owned = _owned(table, row_id, user_id)
+    for _ in range(UPDATE_ATTEMPTS):
+        old, expected, new_values = None, (), values
+        if read:
+            old = db.session.execute(select(*(table.c[name] for name in read)).where(*owned)).first()
+            if old is None:
+                return None, None
+            new_values = values(old)
+            expected = [table.c[name].is_(None) if value is None else table.c[name] == value
+                        for name, value in old._mapping.items()]
+        if not new_values:
+            return db.session.scalars(select(model).where(*owned).options(*options)).first(), old
+        obj = db.session.scalars(update(model).where(*owned, *expected).values(**new_values).returning(model)
+                                 .options(*options)).first()
+        if obj is not None or not read:
+            return obj, old
+    raise WriteConflict(f'{table.name} {row_id} changed during {UPDATE_ATTEMPTS} update attempts')
+
+
+def delete_owned(model, row_id, user_id, *columns):
+    """Deletes one of the user's rows; returns the given columns of the deleted row, or None if there was none."""
+    table = model.__table__
+    return db.session.execute(
+        delete(table).where(*_owned(table, row_id, user_id)).returning(table.c.id, *columns)
+    ).first()
+
+
+def record_write(user_id, entity, op, obj, months=()):
+    """Bumps the user's data version and adds the written row to their next event (``months``: dates it affected)."""
+    bump_data_version(user_id)
+    record_change(db.session, user_id, entity, op, obj, months)
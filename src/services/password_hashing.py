@@ -0,0 +1,105 @@
+"""
+Password hashing off the request thread.
+
+Hashing and verification run in a dedicated, bounded process pool so a login
+storm can't pin the CPUs that serve every other route. At most
+``PASSWORD_HASH_MAX_PENDING`` operations may be queued or running; beyond that
+callers get ``HashingPoolSaturated`` right away, which routes turn into a
+503 with Retry-After, rather than waiting in an unbounded queue.
+
+The algorithm and cost come from ``PASSWORD_HASH_METHOD`` in Werkzeug's
+method syntax, e.g. ``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``. Hashes
+made with another method are reported by ``needs_rehash`` so they can be
+upgraded on the user's next successful login.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the hashing pool already has its maximum number of pending jobs."""
+
+    def __init__(self, retry_after=1):
+        super().__init__('Password hashing pool is saturated')
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_METHOD, workers=None, max_pending=None, timeout=30, retry_after=1):
+        self.method = method
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 2) // 2)
+        self.workers = workers
+        self.max_pending = max_pending or max(1, self.workers) * 4
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._canonical_method = None
+
+    def start(self):
+        """Starts the worker processes (call early, before the server spawns threads)."""
+        if self.workers <= 0:
+            return
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                # Submitting a no-op forks all workers now.
+                self._executor.submit(int).result()
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)  # inline mode, e.g. for development
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated(self.retry_after)
+        try:
+            if self._executor is None:
+                self.start()
+            return self._executor.submit(fn, *args).result(timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if the stored hash was made with a different algorithm or cost."""
+        if self._canonical_method is None:
+            # Expands shorthands such as 'scrypt' to the full 'scrypt:32768:8:1' prefix stored in hashes.
+            self._canonical_method = generate_password_hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._canonical_method
+
+
+password_hasher = PasswordHasher(workers=0)
+
+
+def init_password_hasher(app):
+    """Configures the module-level hasher from app config and starts its pool."""
+    global password_hasher
+    password_hasher.shutdown()
+    password_hasher = PasswordHasher(
+        method=app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+        workers=app.config.get('PASSWORD_HASH_WORKERS'),
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING'),
+    )
+    password_hasher.start()
+    return password_hasher
+
+
+def get_password_hasher():
+    return password_hasher
@@ -0,0 +1,311 @@
+"""
+Batched account and data purges.
+
+Deleting a user through the ORM cascades loads every child row and deletes
+them one at a time inside a single transaction, holding SQLite's write lock
+throughout. A purge runs as a ``PurgeJob`` instead. The tables in
+``PURGE_TABLES`` lose the user's rows in chunks of ``batch_size``. Each chunk
+is picked through an index on ``user_id``, deleted by key in its own short
+transaction, and followed by a ``pause``, so other writers get the lock
+between chunks. Deleted expenses are taken off budget counters in the same
+transaction (``record_expenses``). Data purges bump the user's data version
+with every chunk, so caches and live streams follow along.
+
+The job row records the current table and the rows deleted per table. In an
+unsharded database it is updated in the chunk's own transaction. Deletes
+only select on the user's id, so repeating a chunk is harmless, and a job
+whose runner crashed resumes where it stopped once its lease expires.
+
+* Data purges only delete rows that existed when they were requested, i.e.
+  ids up to ``high_water``. The rollup is derived from the archive and is
+  always emptied.
+* Account purges start after every session of the user has been revoked.
+  The user row and its shard directory entry are removed last.
+
+Jobs run in a per-process background thread (``PurgeWorker``), or with
+``flask purge run``.
+"""
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, or_, select, update
+
+from src.extensions import db
+from src.models.purge_job import PurgeJob
+from src.models.user import User
+from src.models.user_shard import UserShard
+from src.services.budget_alerts import expense_deltas, record_expenses
+from src.services.data_version import bump_data_version
+from src.services.sharding import get_shard_router, shard_scope
+
+PURGE_KINDS = ('account', 'data')
+# Every table in SHARDED_TABLES, rows that others point at after those pointing at them.
+PURGE_TABLES = (
+    'budget_alert', 'budget', 'savings_contribution', 'savings_goal', 'recurring_transaction', 'category_rule',
+    'transaction', 'transaction_archive', 'transaction_rollup', 'user_event', 'user_data_version',
+)
+# Global tables an account purge also empties (sessions are revoked when the job is requested).
+GLOBAL_TABLES = ('idempotency_key',)
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_PAUSE = 0.05  # seconds between chunks
+LEASE_SECONDS = 60
+
+_TRANSACTION_TABLES = ('transaction', 'transaction_archive')
+_EXPENSE_COLUMNS = ('user_id', 'category_id', 'date', 'transaction_type', 'amount_minor')
+
+
+class LeaseLost(Exception):
+    """Another runner took the job over after this one's lease expired."""
+
+
+def purge_steps(kind):
+    """The tables a job of this kind empties, in order."""
+    if kind == 'account':
+        return PURGE_TABLES + GLOBAL_TABLES
+    return tuple(name for name in PURGE_TABLES if name != 'user_data_version')
+
+
+def _conditions(table, user_id, high_water):
+    conditions = [table.c.user_id == user_id]
+    if table.name in high_water:
+        conditions.append(table.c.id <= high_water[table.name])
+    return conditions
+
+
+def _high_water(user_id):
+    """{table: the user's highest id} for a data purge; live and archived transactions share one sequence."""
+    marks = {}
+    for name in purge_steps('data'):
+        table = db.metadata.tables[name]
+        if name != 'transaction_rollup':
+            marks[name] = db.session.execute(select(func.max(table.c.id)).where(table.c.user_id == user_id)).scalar() or 0
+    marks['transaction'] = marks['transaction_archive'] = max(marks['transaction'], marks['transaction_archive'])
+    return marks
+
+
+def active_job(user_id, kind):
+    return PurgeJob.query.filter(PurgeJob.user_id == user_id, PurgeJob.kind == kind,
+                                 PurgeJob.status.in_(('pending', 'running'))).order_by(PurgeJob.id).first()
+
+
+def account_deletion_pending(user_id):
+    return active_job(user_id, 'account') is not None
+
+
+def schedule_purge(user_id, kind):
+    """Adds a job (or returns the user's unfinished one of that kind) to the session; the caller commits."""
+    if kind not in PURGE_KINDS:
+        raise ValueError(f'Unknown purge kind: {kind}')
+    job = active_job(user_id, kind)
+    if job is None:
+        job = PurgeJob(user_id=user_id, kind=kind, status='pending', deleted=0, progress='{}')
+        if kind == 'data':
+            with shard_scope(user_id):
+                job.high_water = json.dumps(_high_water(user_id))
+        db.session.add(job)
+        db.session.flush()
+    return job
+
+
+def _claim(job_id, owner, retry_failed=False):
+    """Takes the job if it is unfinished and nobody holds a live lease on it."""
+    jobs, now = PurgeJob.__table__, datetime.utcnow()
+    statuses = ('pending', 'running', 'failed') if retry_failed else ('pending', 'running')
+    with db.engine.begin() as conn:
+        return conn.execute(update(jobs).where(
+            jobs.c.id == job_id, jobs.c.status.in_(statuses),
+            or_(jobs.c.lease_owner.is_(None), jobs.c.lease_expires_at < now),
+        ).values(status='running', lease_owner=owner, lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                 error=None, updated_at=now)).rowcount == 1
+
+
+def _update_job(job_id, owner, **values):
+    """Updates the job in the current transaction while renewing the lease; raises LeaseLost if it was taken over."""
+    jobs, now = PurgeJob.__table__, datetime.utcnow()
+    if values.get('status') in ('done', 'failed'):
+        values.update(lease_owner=None, lease_expires_at=None, finished_at=now)
+    else:
+        values['lease_expires_at'] = now + timedelta(seconds=LEASE_SECONDS)
+    result = db.session.execute(update(jobs).where(jobs.c.id == job_id, jobs.c.lease_owner == owner)
+                                .values(updated_at=now, **values))
+    if result.rowcount != 1:
+        raise LeaseLost(f'purge job {job_id} is held by another runner')
+
+
+def _count_rows(user_id, kind, high_water):
+    total = 0
+    for name in purge_steps(kind):
+        table = db.metadata.tables[name]
+        total += db.session.execute(select(func.count()).select_from(table)
+                                    .where(*_conditions(table, user_id, high_water))).scalar()
+    return total
+
+
+def _purge_chunk(user_id, name, batch_size, high_water):
+    """Deletes up to batch_size of the user's rows from one table in the current transaction; returns how many."""
+    table = db.metadata.tables[name]
+    if 'id' not in table.c:  # user_data_version: one row per user
+        return db.session.execute(delete(table).where(table.c.user_id == user_id)).rowcount
+
+    columns = [table.c.id] + ([table.c[c] for c in _EXPENSE_COLUMNS] if name in _TRANSACTION_TABLES else [])
+    chunk = select(*columns).where(*_conditions(table, user_id, high_water)).limit(batch_size)
+    if name == 'transaction_archive':
+        chunk = chunk.order_by(table.c.date, table.c.id)  # primary key order, so the chunk ends at a known date
+    rows = db.session.execute(chunk).all()
+    if not rows:
+        return 0
+    statement = delete(table).where(table.c.user_id == user_id, table.c.id.in_([row.id for row in rows]))
+    if name == 'transaction_archive':
+        statement = statement.where(table.c.date <= rows[-1].date)  # a primary key range, not the whole archive
+    db.session.execute(statement)
+    if name in _TRANSACTION_TABLES:
+        record_expenses({key: -amount for key, amount in expense_deltas(rows).items()})
+    return len(rows)
+
+
+def _delete_account(user_id):
+    db.session.execute(delete(UserShard.__table__).where(UserShard.__table__.c.user_id == user_id))
+    db.session.execute(delete(User.__table__).where(User.__table__.c.id == user_id))
+
+
+def run_job(job_id, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE, retry_failed=False, log=None):
+    """
+    Claims a job and runs it to the end, resuming at its recorded table.
+    Returns False if it is finished or held by another runner. Errors mark
+    the job failed and are re-raised.
+    """
+    owner = uuid.uuid4().hex
+    if not _claim(job_id, owner, retry_failed):
+        return False
+    job = db.session.get(PurgeJob, job_id)
+    user_id, kind, step, counted = job.user_id, job.kind, job.step, job.total is not None
+    high_water = json.loads(job.high_water or '{}')
+    progress = json.loads(job.progress or '{}')
+    deleted = job.deleted
+    steps = purge_steps(kind)
+    try:
+        with shard_scope(user_id):
+            if not counted:
+                _update_job(job_id, owner, total=_count_rows(user_id, kind, high_water))
+                db.session.commit()
+            for name in steps[steps.index(step) if step in steps else 0:]:
+                while True:
+                    count = _purge_chunk(user_id, name, batch_size, high_water)
+                    if count and kind == 'data' and name != 'user_event':
+                        bump_data_version(user_id)  # cached results and open streams must drop the rows
+                    progress[name] = progress.get(name, 0) + count
+                    deleted += count
+                    _update_job(job_id, owner, step=name, deleted=deleted, progress=json.dumps(progress))
+                    db.session.commit()
+                    if count < batch_size:
+                        break
+                    if log:
+                        log(f'job {job_id}: {name} {progress[name]:,} deleted ({deleted:,} in total)')
+                    time.sleep(pause)
+            if kind == 'account':
+                _delete_account(user_id)
+            _update_job(job_id, owner, status='done', step=None)
+            db.session.commit()
+    except LeaseLost:
+        db.session.rollback()
+        return False
+    except Exception as e:
+        db.session.rollback()
+        _update_job(job_id, owner, status='failed', error=str(e)[:1000])
+        db.session.commit()
+        raise
+    if kind == 'account' and get_shard_router() is not None:
+        get_shard_router().forget(user_id)
+    if log:
+        log(f'job {job_id}: {kind} purge of user {user_id} done, {deleted:,} row(s) deleted')
+    return True
+
+
+def runnable_jobs(retry_failed=False):
+    """Ids of jobs a runner can claim now: pending ones and those whose runner's lease expired."""
+    jobs = PurgeJob.__table__
+    statuses = ('pending', 'running', 'failed') if retry_failed else ('pending', 'running')
+    with db.engine.connect() as conn:
+        return list(conn.execute(select(jobs.c.id).where(
+            jobs.c.status.in_(statuses),
+            or_(jobs.c.lease_owner.is_(None), jobs.c.lease_expires_at < datetime.utcnow()),
+        ).order_by(jobs.c.id)).scalars())
+
+
+def next_lease_expiry():
+    """When the earliest lease of a running job expires (None if no job is running)."""
+    jobs = PurgeJob.__table__
+    with db.engine.connect() as conn:
+        return conn.execute(select(func.min(jobs.c.lease_expires_at)).where(jobs.c.status == 'running')).scalar()
+
+
+class PurgeWorker:
+    """
+    Runs purge jobs in a background thread of this process. The thread is
+    started by ``wake`` and exits when no job is left. While another runner
+    holds a job it waits for that lease, so a job whose runner died is
+    picked up.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wanted = False
+
+    def wake(self):
+        with self._lock:
+            self._wanted = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='purge-worker', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._wanted:
+                    self._thread = None
+                    return
+                self._wanted = False
+            try:
+                with self.app.app_context():
+                    self._drain()
+            except Exception as e:
+                self.app.logger.error(f"Purge worker error: {e}")
+
+    def _drain(self):
+        batch_size = self.app.config.get('PURGE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        pause = self.app.config.get('PURGE_PAUSE_SECONDS', DEFAULT_PAUSE)
+        while True:
+            for job_id in runnable_jobs():
+                try:
+                    run_job(job_id, batch_size=batch_size, pause=pause)
+                except Exception as e:
+                    self.app.logger.error(f"Purge job {job_id} failed: {e}")
+            if runnable_jobs():
+                continue
+            expiry = next_lease_expiry()
+            if expiry is None:
+                return
+            time.sleep(min(max((expiry - datetime.utcnow()).total_seconds(), 0) + 1, LEASE_SECONDS))
+
+
+def init_purge_worker(app):
+    """Installs the worker (if PURGE_WORKER is on) and starts it when unfinished jobs were left behind."""
+    if not app.config.get('PURGE_WORKER', True):
+        return None
+    worker = app.extensions['purge_worker'] = PurgeWorker(app)
+    with app.app_context():
+        if next_lease_expiry() is not None or runnable_jobs():
+            worker.wake()
+    return worker
+
+
+def start_purge_worker(app):
+    """Wakes this process's worker after a job was committed (no-op if it is disabled)."""
+    worker = app.extensions.get('purge_worker')
+    if worker is not None:
+        worker.wake()
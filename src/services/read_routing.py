@@ -0,0 +1,170 @@
+"""
+Read-only engines for GET traffic.
+
+SELECTs issued while serving a GET or HEAD request go to a separate
+read-only engine, and so do SELECTs in code run inside ``read_scope()``,
+such as report jobs. That engine has its own connection pool, so long reads
+like exports and dashboards no longer take connections from the pool that
+writers use. Flushes, Core DML and raw SQL always go to the primary. So
+does every statement a session issues after it has written, which means a
+handler that writes still reads its own changes. Code reading through an
+engine directly, like the session store, asks ``engine_for_reads()``.
+
+For SQLite the read engine opens the same file with ``mode=ro`` and
+``PRAGMA query_only``. Under WAL its readers see every committed write and
+never block the writer. With sharding each shard has its own read engine,
+which attaches the global DB read-only. For other databases, point
+``READ_DATABASE_URL`` at a replica; without it reads stay on the primary.
+
+A replica can lag behind the primary. With ``READ_YOUR_WRITES_SECONDS`` set,
+a logged-in user's successful POST, PUT, PATCH or DELETE sets a
+``read_primary_until`` cookie. That user's reads then go to the primary
+until the cookie expires. SQLite has no lag, so the window is 0 unless a
+replica is configured.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import quote
+
+from flask import current_app, has_request_context, request, session as flask_session
+from sqlalchemy import create_engine, event
+
+from src.extensions import db, RoutingSession
+from src.services.sharding import GLOBAL_ALIAS, get_shard_router
+
+READ_PIN_COOKIE = 'read_primary_until'
+READ_METHODS = ('GET', 'HEAD')
+WROTE_KEY = 'wrote_to_primary'  # session.info flag: later statements in this session stay on the primary
+
+_read_scope = ContextVar('read_scope', default=False)
+_router = None
+
+
+@contextmanager
+def read_scope():
+    """Sends SELECTs to the read-only engine (for report jobs and scripts outside a request)."""
+    token = _read_scope.set(True)
+    try:
+        yield
+    finally:
+        _read_scope.reset(token)
+
+
+def pinned_to_primary(cookies):
+    """Whether ``cookies`` carry an unexpired ``read_primary_until`` pin."""
+    try:
+        return float(cookies.get(READ_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def reading():
+    """Whether SELECTs issued now may use the read-only engine."""
+    if _read_scope.get():
+        return True
+    return has_request_context() and request.method in READ_METHODS and not pinned_to_primary(request.cookies)
+
+
+def engine_for_reads(engine):
+    """``engine``'s read-only counterpart if reads are being routed now, else ``engine`` (for Core reads)."""
+    if _router is None or not reading():
+        return engine
+    return _router.read_engine(engine)
+
+
+def read_only_uri(path):
+    """A SQLite URI filename opening ``path`` read-only (engine URLs using it add ``&uri=true``)."""
+    return f'file:{quote(path)}?mode=ro'
+
+
+def make_read_only(engine, global_path=None):
+    """Sets ``query_only`` on each new connection of ``engine`` and ATTACHes the global DB at ``global_path`` read-only."""
+    global_uri = read_only_uri(global_path) if global_path else None
+
+    @event.listens_for(engine, 'connect')
+    def _read_only(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA query_only=1')
+        if global_uri:
+            dbapi_connection.execute(f"ATTACH DATABASE ? AS {GLOBAL_ALIAS}", (global_uri,))
+
+
+class ReadRouter:
+    def __init__(self, primary, url=None, shard_router=None):
+        self.primary = primary
+        self.url = url  # replica for the primary engine; None: open SQLite files read-only
+        self.shard_router = shard_router
+        self._engines = {}  # primary engine -> read engine
+        self._lock = threading.Lock()
+
+    def read_engine(self, engine):
+        read = self._engines.get(engine)
+        if read is None:
+            with self._lock:
+                read = self._engines.get(engine)
+                if read is None:
+                    read = self._engines[engine] = self._create_engine(engine)
+        return read
+
+    def _create_engine(self, engine):
+        if engine is self.primary and self.url:
+            return create_engine(self.url)
+        if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+            return engine  # nothing to read from but the primary
+        # Opened lazily, once the primary has created the file and switched it to WAL.
+        read = create_engine(f'sqlite:///{read_only_uri(engine.url.database)}&uri=true')
+        attach_global = self.shard_router is not None and engine in self.shard_router.engines
+        make_read_only(read, self.primary.url.database if attach_global else None)
+        return read
+
+    def route(self, session, engine, clause):
+        """The engine for a statement the session would otherwise run on ``engine``."""
+        if session.info.get(WROTE_KEY):
+            return engine
+        if clause is None or not getattr(clause, 'is_select', False):
+            session.info[WROTE_KEY] = True  # a flush, DML or raw SQL
+            return engine
+        if not reading():
+            return engine
+        return self.read_engine(engine)
+
+    def dispose(self):
+        with self._lock:
+            for primary, read in self._engines.items():
+                if read is not primary:
+                    read.dispose()
+            self._engines.clear()
+
+
+def _pin_to_primary(response):
+    """After a logged-in user's successful write, keeps their reads on the primary for a while."""
+    if request.method not in READ_METHODS + ('OPTIONS',) and response.status_code < 400 and flask_session.get('user_id'):
+        window = current_app.config['READ_YOUR_WRITES_SECONDS']
+        response.set_cookie(READ_PIN_COOKIE, f'{time.time() + window:.0f}', max_age=window,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+def init_read_routing(app):
+    """Installs the read router unless READ_ROUTING is off; returns it (or None)."""
+    global _router
+    if _router is not None:
+        _router.dispose()
+    _router = RoutingSession.read_router = None
+    if not app.config.get('READ_ROUTING', True):
+        return None
+    with app.app_context():
+        primary = db.engine
+    url = app.config.get('READ_DATABASE_URL')
+    if primary.dialect.name != 'sqlite' and not url:
+        return None
+    _router = ReadRouter(primary, url, get_shard_router())
+    RoutingSession.read_router = _router
+    if app.config.get('READ_YOUR_WRITES_SECONDS', 0) > 0:
+        app.after_request(_pin_to_primary)
+    return _router
+
+
+def get_read_router():
+    return _router
@@ -0,0 +1,271 @@
+"""
+Cached responses of expensive read endpoints.
+
+Routes marked ``@cached_result(name)`` (the dashboard, the budget summary
+and the savings goal list) keep their JSON response body. The key is the
+endpoint, the user, the query string and today's date (summaries and
+projections depend on it), and each entry records the user's data version
+(src/services/data_version.py) it was built at. A hit must match the
+current version, so any write to the user's data invalidates their entries
+without a purge, and the next write's entry simply replaces the old one.
+
+There are two tiers. Each process keeps entries in memory, up to a size
+limit per endpoint, evicted by that endpoint's policy (``lru`` or ``lfu``;
+``RESULT_CACHE_POLICIES``). A miss there may be answered from an optional
+shared tier (``RESULT_CACHE_SHARED``): a SQLite file next to the database,
+shared by the processes on a host, or a Redis-compatible store shared by
+every node. The Redis tier works with any client object exposing
+``get``/``set(ex=...)``, so it can be exercised against a local stand-in.
+If the shared tier fails, the error is logged and the result is computed.
+
+Responses say where they came from in ``X-Cache`` (``hit``, ``hit-shared``
+or ``miss``); ``ResultCache.stats()`` has this process's counts.
+"""
+import functools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+from urllib.parse import urlencode
+
+from flask import current_app, make_response, request, session
+
+from src.extensions import db
+from src.models.user import User
+from src.services.cache import SizedCache
+from src.services.data_version import get_data_version
+
+Policy = namedtuple('Policy', 'eviction max_mb ttl')
+
+# Per endpoint: eviction policy, MB of each process's memory, and seconds an entry may live (0: until evicted).
+DEFAULT_POLICIES = {
+    'dashboard': Policy('lru', 16, 0),
+    'budget_summary': Policy('lru', 8, 0),
+    'savings_goals': Policy('lru', 8, 0),
+}
+# Expired rows are deleted from the SQLite tier after this many writes.
+SHARED_SWEEP_EVERY = 1000
+
+_cache = None
+
+
+def parse_policies(text):
+    """
+    ``"dashboard=lfu:32,budget_summary=lru:8:300"`` (endpoint=policy:MB[:TTL
+    seconds]) -> DEFAULT_POLICIES with those endpoints changed. Raises ValueError.
+    """
+    policies = dict(DEFAULT_POLICIES)
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        name, _, spec = item.partition('=')
+        fields = spec.split(':')
+        if name not in policies or len(fields) not in (2, 3) or fields[0] not in SizedCache.POLICIES:
+            raise ValueError(f'Invalid result cache policy: {item}')
+        policies[name] = Policy(fields[0], float(fields[1]), float(fields[2]) if len(fields) == 3 else 0)
+    return policies
+
+
+class SQLiteResultStore:
+    """Shared tier in a SQLite file, for the worker processes of one host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS result (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                         'expires REAL NOT NULL)')
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA synchronous=OFF')  # losing cached results in a crash costs a recomputation
+        return conn
+
+    def _connection(self):
+        # One connection per thread, and a new one after a fork.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute('SELECT value FROM result WHERE key = ? AND expires > ?',
+                                          (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        conn = self._connection()
+        now = time.time()
+        conn.execute('INSERT INTO result (key, value, expires) VALUES (?, ?, ?) '
+                     'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires',
+                     (key, value, now + ttl))
+        self._writes += 1
+        if self._writes % SHARED_SWEEP_EVERY == 0:
+            conn.execute('DELETE FROM result WHERE expires <= ?', (now,))
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RedisResultStore:
+    """Shared tier in a Redis-compatible key-value store, for every node."""
+
+    def __init__(self, client, prefix='result:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def close(self):
+        pass
+
+
+class _Entry(tuple):
+    """(data version, body); sized by its body for SizedCache."""
+
+    def __new__(cls, version, body):
+        return super().__new__(cls, (version, body))
+
+    def __len__(self):
+        return len(self[1])
+
+
+class ResultCache:
+    def __init__(self, policies=None, shared=None, shared_ttl=86400):
+        self.policies = policies or dict(DEFAULT_POLICIES)
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self._local = {name: SizedCache(int(policy.max_mb * 1024 * 1024), policy.eviction, policy.ttl or None)
+                       for name, policy in self.policies.items()}
+        self._counts = {name: {'hits': 0, 'shared_hits': 0, 'misses': 0} for name in self.policies}
+        self._lock = threading.Lock()
+
+    def get(self, name, key, version):
+        """The cached body built at ``version`` and the tier it came from ('hit' or 'hit-shared'), or (None, 'miss')."""
+        entry = self._local[name].get(key)
+        if entry is not None and entry[0] == version:
+            self._count(name, 'hits')
+            return entry[1], 'hit'
+        if self.shared is not None:
+            raw = self.shared.get(f'{name}|{key}')
+            if raw:
+                shared_version, _, body = bytes(raw).partition(b'\n')
+                if int(shared_version) == version:
+                    self._local[name].set(key, _Entry(version, body))
+                    self._count(name, 'shared_hits')
+                    return body, 'hit-shared'
+        self._count(name, 'misses')
+        return None, 'miss'
+
+    def set(self, name, key, version, body):
+        self._local[name].set(key, _Entry(version, body))
+        if self.shared is not None:
+            self.shared.set(f'{name}|{key}', b'%d\n' % version + body, self.shared_ttl)
+
+    def _count(self, name, counter):
+        with self._lock:
+            self._counts[name][counter] += 1
+
+    def stats(self):
+        """Per endpoint: hits in this process, hits from the shared tier, misses, and the local tier's usage."""
+        with self._lock:
+            counts = {name: dict(values) for name, values in self._counts.items()}
+        for name, local in self._local.items():
+            counts[name].update(policy=local.policy, entries=len(local), bytes=local.size, max_bytes=local.max_bytes,
+                                evictions=local.evictions)
+        return counts
+
+    def close(self):
+        if self.shared is not None:
+            self.shared.close()
+
+
+def _request_key(user_id):
+    """The request's cache key and the user's data version, or None if the user is gone."""
+    # Ids of deleted accounts can be reused, and their data versions are deleted with them.
+    created_at = db.session.query(User.created_at).filter(User.id == user_id).scalar()
+    if created_at is None:
+        return None
+    version = get_data_version(user_id)  # read first: the result is then built from data at least this new
+    args = urlencode(sorted(request.args.items(multi=True)))
+    return f'{user_id}.{created_at.isoformat()}|{request.path}?{args}|{date.today().isoformat()}', version
+
+
+def cached_result(name):
+    """Decorator caching a GET route's 200 responses under ``name``'s policy. Apply below @login_required."""
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            if _cache is None:
+                return f(*args, **kwargs)
+            lookup, body, tier = None, None, 'miss'
+            try:
+                lookup = _request_key(session['user_id'])
+                if lookup is not None:
+                    body, tier = _cache.get(name, *lookup)
+            except Exception as e:
+                current_app.logger.error(f"Error reading result cache: {e}")
+            if body is not None:
+                response = current_app.response_class(body, mimetype='application/json')
+            else:
+                response = make_response(f(*args, **kwargs))
+                if lookup is not None and response.status_code == 200 and not response.is_streamed:
+                    try:
+                        _cache.set(name, *lookup, response.get_data())
+                    except Exception as e:
+                        current_app.logger.error(f"Error writing result cache: {e}")
+            response.headers['X-Cache'] = tier
+            return response
+        return decorated_function
+    return decorator
+
+
+def _default_path(app):
+    with app.app_context():
+        url = db.engine.url
+    if url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+        return os.path.join(os.path.dirname(os.path.abspath(url.database)), 'result_cache.db')
+    return os.path.join(tempfile.gettempdir(), 'result_cache.db')
+
+
+def _shared_store(app):
+    shared = app.config.get('RESULT_CACHE_SHARED') or None
+    if shared is None:
+        return None
+    if shared == 'sqlite':
+        return SQLiteResultStore(app.config.get('RESULT_CACHE_SHARED_PATH') or _default_path(app))
+    if shared == 'redis':
+        import redis  # optional dependency, only needed for this tier
+        return RedisResultStore(redis.Redis.from_url(app.config['RESULT_CACHE_REDIS_URL']))
+    raise ValueError(f'Unknown RESULT_CACHE_SHARED: {shared}')
+
+
+def init_result_cache(app):
+    """Installs the result cache unless RESULT_CACHE is off; returns it (or None)."""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+    if not app.config.get('RESULT_CACHE', True):
+        return None
+    _cache = ResultCache(parse_policies(app.config.get('RESULT_CACHE_POLICIES')), shared=_shared_store(app),
+                         shared_ttl=app.config.get('RESULT_CACHE_SHARED_TTL', 86400))
+    return _cache
+
+
+def get_result_cache():
+    return _cache
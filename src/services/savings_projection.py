@@ -0,0 +1,111 @@
+"""
+Savings goal projections.
+
+For every goal of a user we estimate a monthly saving rate and derive the
+expected completion date and the monthly amount needed to hit the goal's
+target date. All goals are projected together from two queries
+(contributions per goal, and net income over the lookback window), and the result
+is cached under the user's data version, so it is recomputed only after the
+next contribution or transaction write.
+"""
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import case, func
+
+from src.extensions import db
+from src.models.money import to_major
+from src.models.savings_contribution import SavingsContribution
+from src.models.transaction import Transaction
+from src.services.cache import LRUCache
+from src.services.data_version import get_data_version
+
+LOOKBACK_MONTHS = 6
+
+_projection_cache = LRUCache(maxsize=2048)  # (user_id, data_version, today) -> {goal_id: projection}
+
+
+def _months_between(start, end):
+    """Whole calendar months from start's month to end's month (end exclusive)."""
+    return (end.year - start.year) * 12 + (end.month - start.month)
+
+
+def _ceil_div(a, b):
+    return -(-a // b)
+
+
+def get_goal_projections(user_id, goals, today=None):
+    """Returns {goal_id: projection dict} for the given goals of one user."""
+    today = today or date.today()
+    key = (user_id, get_data_version(user_id), today)
+    projections = _projection_cache.get(key)
+    if projections is None:
+        projections = _compute_projections(user_id, goals, today)
+        _projection_cache.set(key, projections)
+    return projections
+
+
+def _compute_projections(user_id, goals, today):
+    window_start = (today.replace(day=1) - relativedelta(months=LOOKBACK_MONTHS - 1))
+
+    # Contributions per goal within the lookback window.
+    contributed = {}  # goal_id -> minor units in window
+    for goal_id, total in db.session.query(
+        SavingsContribution.goal_id, func.sum(SavingsContribution.amount_minor)
+    ).filter(
+        SavingsContribution.user_id == user_id,
+        SavingsContribution.created_at >= window_start
+    ).group_by(SavingsContribution.goal_id):
+        contributed[goal_id] = total or 0
+
+    # Net income (income - expense) within the lookback window.
+    net_total = db.session.query(
+        func.sum(case((Transaction.transaction_type == 'income', Transaction.amount_minor),
+                      else_=-Transaction.amount_minor))
+    ).filter(
+        Transaction.user_id == user_id,
+        Transaction.date >= window_start
+    ).scalar() or 0
+    surplus_rate = max(0, net_total // LOOKBACK_MONTHS)
+
+    open_goals = [g for g in goals if g.current_amount_minor < g.target_amount_minor]
+    # Goals without their own contribution history share the surplus equally.
+    unfunded = [g for g in open_goals if not contributed.get(g.id)]
+    surplus_share = surplus_rate // len(unfunded) if unfunded else 0
+
+    projections = {}
+    for goal in goals:
+        remaining = max(0, goal.target_amount_minor - goal.current_amount_minor)
+
+        if contributed.get(goal.id):
+            created = (goal.created_at.date() if goal.created_at else window_start)
+            months_observed = min(LOOKBACK_MONTHS, _months_between(max(created, window_start), today) + 1)
+            monthly_rate = contributed[goal.id] // max(1, months_observed)
+            rate_source = 'contributions'
+        elif surplus_share > 0:
+            monthly_rate = surplus_share
+            rate_source = 'net_savings'
+        else:
+            monthly_rate = 0
+            rate_source = None
+
+        expected_completion = None
+        if remaining == 0:
+            expected_completion = today
+        elif monthly_rate > 0:
+            expected_completion = today + relativedelta(months=_ceil_div(remaining, monthly_rate))
+
+        required_monthly = None
+        if goal.target_date and remaining > 0:
+            months_left = max(1, _months_between(today, goal.target_date) + (1 if goal.target_date.day >= today.day else 0))
+            required_monthly = _ceil_div(remaining, months_left)
+
+        projections[goal.id] = {
+            'remaining_amount': to_major(remaining),
+            'monthly_rate': to_major(monthly_rate),
+            'rate_source': rate_source,
+            'expected_completion_date': expected_completion.isoformat() if expected_completion else None,
+            'required_monthly_saving': to_major(required_monthly),
+            'on_track': (required_monthly is None or monthly_rate >= required_monthly) if remaining else True,
+        }
+    return projections
@@ -0,0 +1,183 @@
+"""
+Server-side sessions.
+
+The session cookie only carries an opaque random id; the session data lives
+in a backend, so sessions can be revoked and shared by every app node. The
+default backend is the ``user_session`` table in the app database. A
+Redis-compatible backend is available for multi-node deployments. It works
+with any client object exposing ``get``/``set``/``delete``/``sadd``/``srem``/
+``smembers``, so it can be exercised against a local stand-in.
+"""
+import json
+import secrets
+import time
+from datetime import datetime
+
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import delete, insert, select, update
+from werkzeug.datastructures import CallbackDict
+
+from src.extensions import db
+from src.models.user_session import UserSession
+from src.services.read_routing import engine_for_reads
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.stale_sid = None
+
+    def regenerate(self):
+        """Issues a new session id (call on login) so a pre-login id can't be fixated."""
+        if not self.new:
+            self.stale_sid = self.sid
+        self.sid = _new_sid()
+        self.new = True
+        self.modified = True
+
+
+def _new_sid():
+    return secrets.token_urlsafe(32)
+
+
+class SQLSessionBackend:
+    """Stores sessions in the user_session table through the app's engine."""
+
+    def __init__(self):
+        self.table = UserSession.__table__
+
+    def load_statement(self, sid):
+        """SELECT of the session's data if it hasn't expired (also run by the ASGI app's async engine)."""
+        return select(self.table.c.data).where(self.table.c.id == sid, self.table.c.expires_at > datetime.utcnow())
+
+    def load(self, sid):
+        with engine_for_reads(db.engine).connect() as conn:
+            row = conn.execute(self.load_statement(sid)).first()
+        return json.loads(row.data) if row else None
+
+    def save(self, sid, data, expires_at, is_new):
+        values = {'user_id': data.get('user_id'), 'data': json.dumps(data), 'expires_at': expires_at}
+        with db.engine.begin() as conn:
+            if is_new:
+                conn.execute(insert(self.table).values(id=sid, created_at=datetime.utcnow(), **values))
+            else:
+                conn.execute(update(self.table).where(self.table.c.id == sid).values(**values))
+
+    def delete(self, sid):
+        with db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.id == sid))
+
+    def delete_user_sessions(self, user_id):
+        with db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.user_id == user_id))
+
+    def purge_expired(self):
+        with db.engine.begin() as conn:
+            return conn.execute(delete(self.table).where(self.table.c.expires_at <= datetime.utcnow())).rowcount
+
+
+class RedisSessionBackend:
+    """Stores sessions in a Redis-compatible key-value store."""
+
+    def __init__(self, client, prefix='session:'):
+        self.client = client
+        self.prefix = prefix
+
+    def _user_key(self, user_id):
+        return f'{self.prefix}user:{user_id}'
+
+    def load(self, sid):
+        raw = self.client.get(self.prefix + sid)
+        return json.loads(raw) if raw else None
+
+    def save(self, sid, data, expires_at, is_new):
+        ttl = max(1, int((expires_at - datetime.utcnow()).total_seconds()))
+        self.client.set(self.prefix + sid, json.dumps(data), ex=ttl)
+        if data.get('user_id') is not None:
+            self.client.sadd(self._user_key(data['user_id']), sid)
+
+    def delete(self, sid):
+        raw = self.client.get(self.prefix + sid)
+        self.client.delete(self.prefix + sid)
+        if raw:
+            user_id = json.loads(raw).get('user_id')
+            if user_id is not None:
+                self.client.srem(self._user_key(user_id), sid)
+
+    def delete_user_sessions(self, user_id):
+        user_key = self._user_key(user_id)
+        sids = [s.decode() if isinstance(s, bytes) else s for s in self.client.smembers(user_key)]
+        if sids:
+            self.client.delete(*[self.prefix + sid for sid in sids])
+        self.client.delete(user_key)
+
+    def purge_expired(self):
+        return 0  # Redis expires keys on its own
+
+
+def create_session_backend(app):
+    """Builds the backend selected by SESSION_BACKEND ('sql' by default, or 'redis')."""
+    backend = app.config.get('SESSION_BACKEND', 'sql')
+    if backend == 'redis':
+        import redis  # optional dependency, only needed for this backend
+        return RedisSessionBackend(redis.Redis.from_url(app.config['SESSION_REDIS_URL']))
+    if backend == 'sql':
+        return SQLSessionBackend()
+    raise ValueError(f'Unknown SESSION_BACKEND: {backend}')
+
+
+class ServerSideSessionInterface(SessionInterface):
+    purge_interval_seconds = 600
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._last_purge = time.monotonic()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.backend.load(sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid)
+        return ServerSideSession(sid=_new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.stale_sid:
+            self.backend.delete(session.stale_sid)
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not session.modified:
+            return
+
+        expires_at = datetime.utcnow() + app.permanent_session_lifetime
+        self.backend.save(session.sid, dict(session), expires_at, session.new)
+        if time.monotonic() - self._last_purge > self.purge_interval_seconds:
+            self._last_purge = time.monotonic()
+            self.backend.purge_expired()
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def revoke_user_sessions(app, user_id):
+    """Logs a user out everywhere by deleting all of their stored sessions."""
+    app.session_interface.backend.delete_user_sessions(user_id)
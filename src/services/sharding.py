@@ -0,0 +1,316 @@
+"""
+Optional per-user SQLite sharding.
+
+With ``SHARD_COUNT`` > 0, user-scoped tables (``SHARDED_TABLES``) live in
+``SHARD_COUNT`` files under ``SHARD_DIRECTORY``, while the database at
+``SQLALCHEMY_DATABASE_URI`` becomes the global DB. It keeps users,
+categories, sessions, idempotency keys and the ``user_shard`` directory.
+A user's writes then take only their own shard's write lock, so users on
+different shards no longer queue behind one another.
+
+Every shard connection ATTACHes the global DB. SQLite resolves unqualified
+table names in the shard file first and the global DB second, so a query
+joining transactions to categories runs unchanged on the shard.
+
+Routing is transparent to route code. ``RoutingSession.get_bind`` sends any
+statement that touches a sharded table to the current user's shard. The
+current user is the request's session user, or the one set with
+``shard_scope()`` in scripts and jobs. Everything else goes to the global DB.
+Users are placed on shard ``user_id % SHARD_COUNT`` when first seen;
+``flask shards rebalance`` moves them after the count changes.
+
+A request that writes to both the global DB and a shard commits each file
+separately.
+"""
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import has_request_context, session as flask_session
+from sqlalchemy import create_engine, event, inspect, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.sql.util import find_tables
+
+from src.extensions import db, RoutingSession
+from src.models.user_shard import UserShard
+from src.services.cache import LRUCache
+
+# User-scoped tables stored in the shards. Every one of them has a user_id column.
+# Archived transactions come first so that, when a user is moved, they keep lower ids than live ones.
+SHARDED_TABLES = (
+    'transaction_archive', 'transaction', 'budget', 'budget_alert', 'recurring_transaction', 'savings_goal',
+    'savings_contribution', 'category_rule', 'user_event', 'user_data_version', 'transaction_rollup',
+)
+
+GLOBAL_ALIAS = 'globaldb'
+
+_shard_user = ContextVar('shard_user', default=None)
+_router = None
+
+
+@contextmanager
+def shard_scope(user_id):
+    """Routes user-scoped statements to ``user_id``'s shard (for code running outside a request)."""
+    token = _shard_user.set(user_id)
+    try:
+        yield
+    finally:
+        _shard_user.reset(token)
+
+
+def current_shard_user():
+    user_id = _shard_user.get()
+    if user_id is None and has_request_context():
+        user_id = flask_session.get('user_id')
+    return user_id
+
+
+class ShardRouter:
+    def __init__(self, global_engine, count, directory, directory_ttl=60):
+        self.global_engine = global_engine
+        self.count = count
+        self.directory = directory
+        self.global_path = global_engine.url.database
+        self._file_engines = {}
+        self.engines = [self._create_engine(index) for index in range(count)]
+        self._shard_cache = LRUCache(maxsize=100_000, ttl=directory_ttl)  # user_id -> shard index
+
+    def shard_path(self, index):
+        return os.path.join(self.directory, f'shard_{index}.db')
+
+    def _create_engine(self, index):
+        engine = create_engine(f'sqlite:///{self.shard_path(index)}')
+
+        @event.listens_for(engine, 'connect')
+        def _attach_global(dbapi_connection, connection_record):
+            dbapi_connection.execute(f"ATTACH DATABASE ? AS {GLOBAL_ALIAS}", (self.global_path,))
+
+        return engine
+
+    def file_engine(self, index):
+        """An engine for the shard file alone, without the global DB attached (for maintenance)."""
+        if index not in self._file_engines:
+            self._file_engines[index] = create_engine(f'sqlite:///{self.shard_path(index)}')
+        return self._file_engines[index]
+
+    @staticmethod
+    def target_shard(user_id, count):
+        return user_id % count
+
+    def shard_for(self, user_id):
+        """The user's shard index, placing the user on first sight."""
+        shard = self._shard_cache.get(user_id)
+        if shard is None:
+            table = UserShard.__table__
+            lookup = select(table.c.shard).where(table.c.user_id == user_id)
+            with self.global_engine.connect() as conn:
+                shard = conn.execute(lookup).scalar()
+            if shard is None:
+                # Only a user's first request takes the global write lock.
+                with self.global_engine.begin() as conn:
+                    conn.execute(insert(table).values(user_id=user_id, shard=self.target_shard(user_id, self.count))
+                                 .on_conflict_do_nothing(index_elements=[table.c.user_id]))
+                    shard = conn.execute(lookup).scalar_one()
+            self._shard_cache.set(user_id, shard)
+        return shard
+
+    def cached_shard(self, user_id):
+        """The user's shard index if it is known without a directory lookup, else None."""
+        return self._shard_cache.get(user_id)
+
+    def forget(self, user_id):
+        self._shard_cache.pop(user_id)
+
+    def engine_for_user(self, user_id):
+        return self.engines[self.shard_for(user_id)]
+
+    @staticmethod
+    def _touches_shard(mapper, clause):
+        if mapper is not None and inspect(mapper).persist_selectable.name in SHARDED_TABLES:
+            return True
+        return clause is not None and any(
+            table.name in SHARDED_TABLES
+            for table in find_tables(clause, include_crud=True)
+        )
+
+    def get_bind(self, mapper=None, clause=None, shard=None, **kwargs):
+        if shard is not None:
+            return self.engines[shard]
+        if not self._touches_shard(mapper, clause):
+            return None
+        user_id = current_shard_user()
+        if user_id is None:
+            raise RuntimeError('Statement touches a sharded table but no user is in scope; use shard_scope(user_id)')
+        return self.engine_for_user(user_id)
+
+    def create_all(self):
+        """Creates the global tables in the global DB and the user-scoped tables in every shard."""
+        os.makedirs(self.directory, exist_ok=True)
+        sharded = [db.metadata.tables[name] for name in SHARDED_TABLES]
+        db.metadata.create_all(self.global_engine, tables=[t for t in db.metadata.sorted_tables if t not in sharded])
+        for engine in [self.global_engine] + self.engines:
+            if engine is not self.global_engine:
+                db.metadata.create_all(engine, tables=sharded)
+            # WAL lets shard transactions read categories while the global DB is being written.
+            with engine.connect() as conn:
+                conn.exec_driver_sql('PRAGMA main.journal_mode=WAL')
+
+
+def init_sharding(app):
+    """Installs the shard router if SHARD_COUNT is set; returns it (or None)."""
+    global _router
+    count = app.config.get('SHARD_COUNT') or 0
+    if count <= 0:
+        return None
+    with app.app_context():
+        global_engine = db.engine
+    if global_engine.dialect.name != 'sqlite':
+        raise ValueError('Sharding is only supported for SQLite databases')
+    _router = ShardRouter(
+        global_engine, count,
+        directory=app.config.get('SHARD_DIRECTORY') or os.path.join(os.path.dirname(global_engine.url.database), 'shards'),
+        directory_ttl=app.config.get('SHARD_DIRECTORY_TTL_SECONDS', 60),
+    )
+    RoutingSession.router = _router
+    return _router
+
+
+def get_shard_router():
+    return _router
+
+
+def all_engines():
+    """Every database engine that holds application tables."""
+    engines = [db.engine]
+    if _router is not None:
+        engines.extend(_router.engines)
+    return engines
+
+
+def user_data_engines():
+    """Engines holding user-scoped tables: the shards, or the single DB when unsharded."""
+    return list(_router.engines) if _router is not None else [db.engine]
+
+
+def engine_for_user(user_id):
+    return _router.engine_for_user(user_id) if _router is not None else db.engine
+
+
+def _copy_user_rows(source, target, user_id):
+    """Copies a user's rows between two open connections, giving them fresh ids in the target."""
+    new_ids = {'budget': {}, 'savings_goal': {}}  # table -> {old id: new id}, for tables other rows point at
+    for name in SHARDED_TABLES:
+        if name == 'user_event':
+            continue  # transient; streams resync after a move
+        table = db.metadata.tables[name]
+        rows = source.execute(select(table).where(table.c.user_id == user_id).order_by(*table.primary_key.columns)).mappings().all()
+        for row in rows:
+            values = dict(row)
+            if name == 'user_data_version':
+                values['version'] += 1  # invalidate caches keyed by the old version
+            elif name == 'transaction_archive':
+                values['id'] = _next_transaction_id(target)  # archived rows share the live id sequence
+            elif 'id' in values:
+                old_id = values.pop('id')
+                if name == 'savings_contribution':
+                    values['goal_id'] = new_ids['savings_goal'][values['goal_id']]
+                elif name == 'budget_alert':
+                    values['budget_id'] = new_ids['budget'][values['budget_id']]
+                new_id = target.execute(table.insert().values(**values)).inserted_primary_key[0]
+                if name in new_ids:
+                    new_ids[name][old_id] = new_id
+                continue
+            target.execute(table.insert().values(**values))
+
+
+def _next_transaction_id(conn):
+    """Takes the next id from the target's ``transaction`` AUTOINCREMENT sequence."""
+    if conn.exec_driver_sql("SELECT 1 FROM sqlite_sequence WHERE name = 'transaction'").first() is None:
+        conn.exec_driver_sql(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'transaction', COALESCE(MAX(id), 0) FROM main.\"transaction\"")
+    return conn.exec_driver_sql("UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = 'transaction' RETURNING seq").scalar()
+
+
+def _delete_user_rows(conn, user_id):
+    for name in reversed(SHARDED_TABLES):
+        table = db.metadata.tables[name]
+        conn.execute(table.delete().where(table.c.user_id == user_id))
+
+
+def _set_directory(conn, user_id, shard):
+    table = UserShard.__table__
+    conn.execute(insert(table).values(user_id=user_id, shard=shard).on_conflict_do_update(
+        index_elements=[table.c.user_id], set_={'shard': shard}))
+
+
+def move_user(router, user_id, source_engine, target_index):
+    """
+    Moves one user's data to another shard. Both files are write-locked for
+    the duration (through engines without the global DB attached, so only
+    those files are locked). The steps are ordered so a rerun after a crash
+    converges: the target is cleared first, the directory flips only after
+    the copy commits, and leftovers in the source are removed last.
+    """
+    from_global = source_engine is router.global_engine
+    with source_engine.connect() as source, router.file_engine(target_index).connect() as target:
+        source.exec_driver_sql('BEGIN IMMEDIATE')
+        target.exec_driver_sql('BEGIN IMMEDIATE')
+        _delete_user_rows(target, user_id)
+        _copy_user_rows(source, target, user_id)
+        target.commit()
+
+        if from_global:
+            _set_directory(source, user_id, target_index)  # same file, so it commits with the cleanup
+        else:
+            with router.global_engine.begin() as conn:
+                _set_directory(conn, user_id, target_index)
+        router.forget(user_id)
+
+        _delete_user_rows(source, user_id)
+        source.commit()
+
+
+def _users_with_data(engine):
+    users = set()
+    with engine.connect() as conn:
+        for name in SHARDED_TABLES:
+            table = db.metadata.tables[name]
+            if conn.exec_driver_sql(f'PRAGMA main.table_info("{name}")').first() is None:
+                continue  # e.g. the global DB of a fresh sharded install
+            users.update(conn.execute(select(table.c.user_id).distinct()).scalars())
+    return users
+
+
+def rebalance(router, dry_run=False, log=print):
+    """
+    Moves every user to shard ``user_id % SHARD_COUNT``. Data still in the
+    global DB from before sharding was enabled is imported the same way,
+    and rows left behind by an interrupted move are cleaned up. Run it with
+    the app stopped: running workers cache the directory for
+    SHARD_DIRECTORY_TTL_SECONDS.
+    """
+    with router.global_engine.connect() as conn:
+        directory = dict(conn.execute(select(UserShard.user_id, UserShard.shard)).all())
+
+    sources = [(None, router.global_engine)] + [(index, router.file_engine(index)) for index in range(router.count)]
+    moved = 0
+    for source_index, engine in sources:
+        for user_id in sorted(_users_with_data(engine)):
+            target_index = router.target_shard(user_id, router.count)
+            current = directory.get(user_id)
+            if source_index is not None and current is not None and current != source_index:
+                # Leftovers of a move that completed its copy but not the cleanup.
+                log(f'user {user_id}: removing stale rows from shard {source_index}')
+                if not dry_run:
+                    with engine.begin() as conn:
+                        _delete_user_rows(conn, user_id)
+                continue
+            if source_index == target_index:
+                continue
+            origin = 'global DB' if source_index is None else f'shard {source_index}'
+            log(f'user {user_id}: {origin} -> shard {target_index}')
+            if not dry_run:
+                move_user(router, user_id, engine, target_index)
+                directory[user_id] = target_index
+            moved += 1
+    return moved
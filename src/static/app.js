@@ -10,6 +10,10 @@ class MoneyManager {
         this.currentEditingSavingsGoal = null; 
         this.currentContributingGoal = null;
         this.currentEditingRecurring = null; // Added for recurring transactions
+        this.recentTransactions = [];
+        this.budgets = [];
+        this.transactionsFiltered = false;
+        this.eventSource = null; // live updates (SSE); while open, writes don't re-fetch the dashboard
         
         this.init();
     }
@@ -26,12 +30,13 @@ class MoneyManager {
 
     async checkAuth() {
         try {
-            const response = await fetch('/api/auth/check');
+            // One request returns the session state and, when logged in, everything the first screen needs.
+            const response = await fetch('/api/bootstrap');
             const data = await response.json();
             
             if (data.authenticated) {
                 this.currentUser = data.user;
-                await this.showMainApp();
+                await this.showMainApp(data);
             } else {
                 this.showAuthSection();
             }
@@ -46,17 +51,104 @@ class MoneyManager {
         document.getElementById('main-app').classList.add('hidden');
     }
 
-    async showMainApp() {
+    async showMainApp(bootstrap = null) {
         document.getElementById('auth-section').classList.add('hidden');
         document.getElementById('main-app').classList.remove('hidden');
         document.getElementById('user-name').textContent = this.currentUser.username;
         
-        await this.loadCategories();
-        await this.loadDashboardData();
+        if (!bootstrap) bootstrap = await this.loadBootstrap();
+        if (bootstrap) this.applyBootstrap(bootstrap);
+        this.connectLiveUpdates();
         
         this.showSection('dashboard');
     }
 
+    // Live updates: the server pushes a delta whenever this user's data changes (in any tab or device).
+    connectLiveUpdates() {
+        if (this.eventSource || !window.EventSource) return;
+        this.eventSource = new EventSource('/api/events/stream');
+        this.eventSource.addEventListener('delta', (e) => this.applyDelta(JSON.parse(e.data)));
+        this.eventSource.addEventListener('resync', async () => {
+            const data = await this.loadBootstrap();
+            if (data) this.applyBootstrap(data);
+        });
+    }
+
+    disconnectLiveUpdates() {
+        if (this.eventSource) this.eventSource.close();
+        this.eventSource = null;
+    }
+
+    get liveUpdates() {
+        return this.eventSource && this.eventSource.readyState === EventSource.OPEN;
+    }
+
+    applyDelta(delta) {
+        document.getElementById('current-balance').textContent = this.formatCurrency(delta.balance);
+        document.getElementById('total-income').textContent = this.formatCurrency(delta.total_income);
+        document.getElementById('total-expense').textContent = this.formatCurrency(delta.total_expense);
+        this.updateSpendingChart(delta.category_spending);
+        this.updateCategoryChart(delta.category_spending);
+
+        const isActive = (section) => document.getElementById(`${section}-section`).classList.contains('active');
+        const transactionChanges = delta.changes.filter(c => c.entity === 'transaction');
+        if (transactionChanges.length) {
+            this.recentTransactions = this.patchTransactions(this.recentTransactions, transactionChanges).slice(0, 10);
+            this.displayRecentTransactions(this.recentTransactions);
+            if (this.transactionsFiltered) {
+                if (isActive('transactions')) this.applyFilters();
+            } else {
+                this.transactions = this.patchTransactions(this.transactions, transactionChanges);
+                this.displayTransactions(this.transactions);
+            }
+        }
+
+        if (delta.budgets.length) {
+            const updated = new Map(delta.budgets.map(b => [b.budget_id, b]));
+            this.displayBudgets(this.budgets.map(b => updated.get(b.budget_id) || b));
+        }
+        const changed = (entity) => delta.changes.some(c => c.entity === entity);
+        if (changed('budget') && isActive('budgets')) this.loadBudgets();
+        if (changed('savings_goal') && isActive('savings-goals')) this.loadSavingsGoals();
+        if (changed('recurring_transaction') && isActive('recurring')) this.loadRecurringTransactions();
+    }
+
+    patchTransactions(list, changes) {
+        let result = list.slice();
+        changes.forEach(({ op, data }) => {
+            result = result.filter(t => t.id !== data.id);
+            if (op !== 'deleted') result.push(data);
+        });
+        return result.sort((a, b) => b.date.localeCompare(a.date) || (b.created_at || '').localeCompare(a.created_at || ''));
+    }
+
+    async loadBootstrap() {
+        try {
+            const response = await fetch('/api/bootstrap');
+            if (!response.ok) throw new Error(`HTTP error ${response.status}`);
+            return await response.json();
+        } catch (error) {
+            console.error('Failed to load initial data:', error);
+            this.showMessage('Failed to load dashboard data', 'error');
+            return null;
+        }
+    }
+
+    applyBootstrap(data) {
+        if (data.categories) {
+            this.categories = data.categories;
+            this.populateCategorySelects();
+        }
+        if (data.dashboard) this.displayDashboard(data.dashboard);
+        if (data.transactions) {
+            this.transactions = data.transactions;
+            this.displayTransactions(this.transactions);
+        }
+        if (data.budgets) this.displayBudgets(data.budgets);
+        if (data.savings_goals) this.displaySavingsGoals(data.savings_goals);
+        if (data.recurring_transactions) this.displayRecurringTransactions(data.recurring_transactions);
+    }
+
     setupEventListeners() {
         document.getElementById('show-signup').addEventListener('click', (e) => { e.preventDefault(); this.toggleAuthForms('signup'); });
         document.getElementById('show-login').addEventListener('click', (e) => { e.preventDefault(); this.toggleAuthForms('login'); });
@@ -150,6 +242,7 @@ class MoneyManager {
     async handleLogout() {
         try {
             await fetch('/api/auth/logout', { method: 'POST' });
+            this.disconnectLiveUpdates();
             this.currentUser = null;
             this.showMessage('Logged out successfully', 'success');
             this.showAuthSection();
@@ -199,19 +292,23 @@ class MoneyManager {
     async loadDashboardData() {
         try {
             const response = await fetch('/api/dashboard');
-            const data = await response.json();
-            document.getElementById('current-balance').textContent = this.formatCurrency(data.balance);
-            document.getElementById('total-income').textContent = this.formatCurrency(data.total_income);
-            document.getElementById('total-expense').textContent = this.formatCurrency(data.total_expense);
-            this.displayRecentTransactions(data.recent_transactions);
-            this.updateSpendingChart(data.category_spending);
-            this.updateCategoryChart(data.category_spending); // For reports page
+            this.displayDashboard(await response.json());
         } catch (error) {
             console.error('Failed to load dashboard data:', error);
             this.showMessage('Failed to load dashboard data', 'error');
         }
     }
 
+    displayDashboard(data) {
+        this.recentTransactions = data.recent_transactions;
+        document.getElementById('current-balance').textContent = this.formatCurrency(data.balance);
+        document.getElementById('total-income').textContent = this.formatCurrency(data.total_income);
+        document.getElementById('total-expense').textContent = this.formatCurrency(data.total_expense);
+        this.displayRecentTransactions(data.recent_transactions);
+        this.updateSpendingChart(data.category_spending);
+        this.updateCategoryChart(data.category_spending); // For reports page
+    }
+
     displayRecentTransactions(transactions) {
         this.renderItems('recent-transactions-list', transactions, this.renderTransactionItem, 'No recent transactions.');
     }
@@ -220,6 +317,7 @@ class MoneyManager {
         try {
             const response = await fetch('/api/transactions');
             this.transactions = await response.json();
+            this.transactionsFiltered = false;
             this.displayTransactions(this.transactions);
         } catch (error) {
             console.error('Failed to load transactions:', error);
@@ -372,8 +470,10 @@ class MoneyManager {
             if (response.ok) {
                 this.showMessage(data.message || 'Success!', 'success');
                 this.closeTransactionModal();
-                this.loadDashboardData();
-                if (document.getElementById('transactions-section').classList.contains('active')) this.loadTransactions();
+                if (!this.liveUpdates) {
+                    this.loadDashboardData();
+                    if (document.getElementById('transactions-section').classList.contains('active')) this.loadTransactions();
+                }
             } else {
                 this.showMessage(data.error || 'Failed.', 'error');
             }
@@ -526,8 +626,10 @@ class MoneyManager {
             const response = await fetch(`/api/transactions/${id}`, { method: 'DELETE' });
             if (response.ok) {
                 this.showMessage('Transaction deleted!', 'success');
-                this.loadDashboardData();
-                if (document.getElementById('transactions-section').classList.contains('active')) this.loadTransactions();
+                if (!this.liveUpdates) {
+                    this.loadDashboardData();
+                    if (document.getElementById('transactions-section').classList.contains('active')) this.loadTransactions();
+                }
             } else {
                 this.showMessage('Failed to delete transaction', 'error');
             }
@@ -547,6 +649,7 @@ class MoneyManager {
         const url = `/api/transactions?${params.toString().replace(/&[^=]+=&/g, '&').replace(/&[^=]+=$/, '')}`;
         try {
             const response = await fetch(url);
+            this.transactionsFiltered = true;
             this.displayTransactions(await response.json());
         } catch (error) {
             console.error('Filter error:', error);
@@ -593,6 +696,7 @@ class MoneyManager {
     }
 
     displayBudgets(budgets) {
+        this.budgets = budgets;
         this.renderItems('budgets-list', budgets, this.renderBudgetItem, 'No budgets for this period.');
         document.querySelectorAll('.edit-budget-btn').forEach(btn => 
             btn.addEventListener('click', (e) => this.editBudget(e.currentTarget.dataset.id, budgets)));
@@ -776,9 +880,10 @@ class MoneyManager {
                     </div>
                 </div>
                 <div class="transaction-amount">${isIncome ? '+' : '-'}${this.formatCurrency(t.amount)}</div>
-                <div class="transaction-actions">
+                <div class="transaction-actions">${t.archived ? `
+                    <span class="archived-badge" title="Archived transactions are read-only"><i class="fas fa-archive"></i></span>` : `
                     <button class="action-btn-small" onclick="app.editTransaction(${t.id})"><i class="fas fa-edit"></i></button>
-                    <button class="action-btn-small" onclick="app.deleteTransaction(${t.id})"><i class="fas fa-trash"></i></button>
+                    <button class="action-btn-small" onclick="app.deleteTransaction(${t.id})"><i class="fas fa-trash"></i></button>`}
                 </div>
             </div>`;
     }
@@ -0,0 +1,55 @@
+"""
+Shared fixtures. ``src.main`` configures the app from the environment when
+it is imported, so the environment is set here first: a throwaway database,
+inline password hashing and PDF rendering, and no background purge worker
+or admission limits. Every test signs up its own users, so tests share the
+one app and database without seeing each other's rows.
+"""
+import atexit
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+DATA_DIR = tempfile.mkdtemp(prefix='money-manager-tests-')
+atexit.register(shutil.rmtree, DATA_DIR, ignore_errors=True)
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(DATA_DIR, 'app.db')}",
+    PASSWORD_HASH_WORKERS='0',
+    PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',  # fast; not what the tests check
+    PDF_RENDER_WORKERS='0',
+    PURGE_WORKER='0',
+    ADMISSION_CONTROL='0',
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app as flask_app  # noqa: E402
+
+_user_numbers = itertools.count(1)
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        yield flask_app
+
+
+@pytest.fixture
+def signup():
+    """Signs up a new user; returns ``(client, user_id)`` with the client logged in."""
+    def signup():
+        number = next(_user_numbers)
+        client = flask_app.test_client()
+        response = client.post('/api/auth/signup', json={
+            'username': f'user{number}', 'email': f'user{number}@example.com', 'password': 'test-password'})
+        assert response.status_code == 201, response.get_json()
+        return client, response.get_json()['user']['id']
+    return signup
+
+
+@pytest.fixture
+def client(signup):
+    return signup()[0]
@@ -0,0 +1,106 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from src.services import backup
+from src.services.backup import MANIFEST, apply_retention, create_backup, list_backups
+
+SECOND = datetime(2026, 5, 4, 3, 2, 1)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def utcnow(cls):
+        return SECOND
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / 'app.db'
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, value TEXT)')
+    conn.executemany('INSERT INTO t (value) VALUES (?)', [(f'row {i}',) for i in range(100)])
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+@pytest.fixture
+def same_second(monkeypatch):
+    """Every backup run starts in the same second."""
+    monkeypatch.setattr(backup, 'datetime', FrozenDatetime)
+
+
+def _run(database, backup_dir, keep):
+    return create_backup([database], str(backup_dir), sleep=0, keep=keep, log=lambda message: None)
+
+
+def _names(backup_dir):
+    return [os.path.basename(path) for path in list_backups(str(backup_dir))]
+
+
+def test_sets_from_the_same_second_sort_newest_first(database, tmp_path, same_second):
+    backup_dir = tmp_path / 'backups'
+    created = [os.path.basename(_run(database, backup_dir, keep=0)) for _ in range(3)]
+
+    assert created == ['20260504T030201Z', '20260504T030201Z-002', '20260504T030201Z-003']
+    assert _names(backup_dir) == created[::-1]
+
+
+def test_retention_keeps_the_newest_sets_from_the_same_second(database, tmp_path, same_second):
+    backup_dir = tmp_path / 'backups'
+    created = [os.path.basename(_run(database, backup_dir, keep=2)) for _ in range(4)]
+
+    assert _names(backup_dir) == [created[3], created[2]]
+
+
+def test_names_freed_by_retention_are_not_reused(database, tmp_path, same_second):
+    backup_dir = tmp_path / 'backups'
+    for _ in range(3):
+        _run(database, backup_dir, keep=1)
+    assert _names(backup_dir) == ['20260504T030201Z-003']
+
+    newest = os.path.basename(_run(database, backup_dir, keep=1))
+
+    assert newest == '20260504T030201Z-004'
+    assert _names(backup_dir) == [newest]
+
+
+def _fake_set(backup_dir, name, verified):
+    set_dir = backup_dir / name
+    set_dir.mkdir(parents=True)
+    (set_dir / MANIFEST).write_text(json.dumps({'files': [], 'verified': verified}))
+
+
+def test_failed_and_unverified_sets_do_not_count_toward_keep(tmp_path):
+    backup_dir = tmp_path / 'backups'
+    for name, verified in [('20260501T000000Z', True), ('20260502T000000Z', True),
+                           ('20260503T000000Z', False), ('20260504T000000Z', None),
+                           ('20260504T000000Z-002', True)]:
+        _fake_set(backup_dir, name, verified)
+
+    removed = apply_retention(str(backup_dir), keep=2)
+
+    assert [os.path.basename(path) for path in removed] == ['20260501T000000Z']
+    assert _names(backup_dir) == ['20260504T000000Z-002', '20260504T000000Z', '20260503T000000Z', '20260502T000000Z']
+
+
+def test_retention_waits_for_enough_verified_sets(tmp_path):
+    backup_dir = tmp_path / 'backups'
+    _fake_set(backup_dir, '20260501T000000Z', True)
+    _fake_set(backup_dir, '20260502T000000Z', False)
+
+    assert apply_retention(str(backup_dir), keep=2) == []
+    assert len(_names(backup_dir)) == 2
+
+
+def test_new_set_is_verified(database, tmp_path):
+    set_dir = _run(database, tmp_path / 'backups', keep=0)
+    manifest = backup.read_manifest(set_dir)
+
+    assert manifest['verified'] is True
+    assert [entry['integrity_check'] for entry in manifest['files']] == ['ok']
@@ -0,0 +1,143 @@
+from datetime import date
+
+import pytest
+
+from src.extensions import db
+from src.models.budget import Budget
+from src.models.budget_alert import BudgetAlert
+from src.models.transaction import Transaction
+from src.services.budget_alerts import crossed_thresholds
+
+FOOD, BILLS = 1, 2
+MARCH = date(2026, 3, 1)
+
+
+@pytest.fixture
+def budget(app, signup):
+    """A 100.00 monthly Food budget for March, alerting at 50%, 80% and 100%."""
+    _, user_id = signup()
+    budget = Budget(user_id=user_id, category_id=FOOD, amount_minor=10000, period='monthly', budget_month=MARCH,
+                    alert_thresholds='50,80,100')
+    db.session.add(budget)
+    db.session.commit()
+    return budget
+
+
+def _spend(budget, amount_minor, day=date(2026, 3, 10), category_id=FOOD, transaction_type='expense'):
+    transaction = Transaction(user_id=budget.user_id, category_id=category_id, amount_minor=amount_minor, date=day,
+                              transaction_type=transaction_type, description='test')
+    db.session.add(transaction)
+    db.session.commit()
+    return transaction
+
+
+def _spent(budget):
+    db.session.refresh(budget)
+    return budget.spent_minor
+
+
+def _alerted(budget):
+    return [alert.threshold for alert in
+            BudgetAlert.query.filter_by(budget_id=budget.id).order_by(BudgetAlert.id)]
+
+
+def test_expenses_in_the_period_are_counted(budget):
+    _spend(budget, 1250)
+    _spend(budget, 500, day=date(2026, 3, 31))
+
+    assert _spent(budget) == 1750
+
+
+def test_other_categories_periods_and_income_are_not_counted(budget):
+    _spend(budget, 1000, category_id=BILLS)
+    _spend(budget, 1000, day=date(2026, 2, 28))
+    _spend(budget, 1000, day=date(2026, 4, 1))
+    _spend(budget, 1000, transaction_type='income')
+
+    assert _spent(budget) == 0
+
+
+def test_edits_and_deletes_move_the_total(budget):
+    transaction = _spend(budget, 3000)
+
+    transaction.amount_minor = 2000
+    db.session.commit()
+    assert _spent(budget) == 2000
+
+    transaction.category_id = BILLS
+    db.session.commit()
+    assert _spent(budget) == 0
+
+    transaction.category_id = FOOD
+    transaction.date = date(2026, 4, 2)
+    db.session.commit()
+    assert _spent(budget) == 0
+
+    transaction.date = date(2026, 3, 2)
+    db.session.commit()
+    assert _spent(budget) == 2000
+
+    db.session.delete(transaction)
+    db.session.commit()
+    assert _spent(budget) == 0
+
+
+def test_changes_in_one_flush_are_netted(budget):
+    kept = _spend(budget, 4000)
+    db.session.add(Transaction(user_id=budget.user_id, category_id=FOOD, amount_minor=1500, date=date(2026, 3, 5),
+                               transaction_type='expense'))
+    kept.amount_minor = 1000
+    db.session.commit()
+
+    assert _spent(budget) == 2500
+
+
+def test_each_threshold_alerts_once_when_crossed(budget):
+    _spend(budget, 4999)
+    assert _alerted(budget) == []
+
+    _spend(budget, 1)  # exactly 50%
+    _spend(budget, 100)
+    assert _alerted(budget) == [50]
+
+    _spend(budget, 5000)  # 101%: past 80 and 100 in one write
+    assert _alerted(budget) == [50, 80, 100]
+    alert = BudgetAlert.query.filter_by(budget_id=budget.id, threshold=100).one()
+    assert (alert.amount_minor, alert.spent_minor) == (10000, 10100)
+
+
+def test_falling_below_a_threshold_rearms_it(budget):
+    transaction = _spend(budget, 8500)
+    assert _alerted(budget) == [50, 80]
+
+    transaction.amount_minor = 7000
+    db.session.commit()
+    assert _alerted(budget) == [50, 80]
+
+    _spend(budget, 1000)
+    assert _alerted(budget) == [50, 80, 80]
+
+
+def test_alerts_reach_the_api(signup):
+    client, _ = signup()
+    response = client.post('/api/budgets', json={'category_id': FOOD, 'amount': '20.00', 'period': 'monthly',
+                                                 'budget_month_str': '2026-03', 'alert_thresholds': [90]})
+    assert response.status_code == 201, response.get_json()
+    response = client.post('/api/transactions', json={'amount': '19.00', 'transaction_type': 'expense',
+                                                      'category_id': FOOD, 'date': '2026-03-03'})
+    assert response.status_code == 201
+
+    alerts = client.get('/api/budgets/alerts').get_json()
+
+    assert [(alert['threshold'], alert['category_name']) for alert in alerts] == [(90, 'Food')]
+
+
+@pytest.mark.parametrize('before, after, expected', [
+    (None, (9000, 10000), [50, 80]),          # a new budget counts every threshold it has reached
+    ((7900, 10000), (8000, 10000), [80]),
+    ((8000, 10000), (9000, 10000), []),       # already past 80
+    ((9000, 10000), (9000, 8000), [100]),     # lowering the amount can cross one too
+    ((9000, 10000), (4000, 10000), []),
+])
+def test_crossed_thresholds(before, after, expected):
+    assert crossed_thresholds([50, 80, 100], before, after) == expected
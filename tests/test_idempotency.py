@@ -0,0 +1,97 @@
+import hashlib
+import json
+from datetime import datetime
+
+from src.extensions import db
+from src.models.idempotency_key import IdempotencyKey
+from src.models.transaction import Transaction
+from src.services.idempotency import PENDING_LEASE
+
+EXPENSE = {'amount': '12.50', 'transaction_type': 'expense', 'category_id': 1, 'description': 'Lunch'}
+
+
+def _post(client, key, body=EXPENSE):
+    return client.post('/api/transactions', data=json.dumps(body), content_type='application/json',
+                       headers={'Idempotency-Key': key})
+
+
+def _fingerprint(body=EXPENSE):
+    """What the decorator records for ``_post(client, key, body)``."""
+    return hashlib.sha256(b'POST' + b'/api/transactions' + json.dumps(body).encode()).hexdigest()
+
+
+def _transaction_count(user_id):
+    return db.session.query(Transaction).filter_by(user_id=user_id).count()
+
+
+def test_retry_replays_the_stored_response(app, signup):
+    client, user_id = signup()
+    first = _post(client, 'retry-1')
+    retry = _post(client, 'retry-1')
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert _transaction_count(user_id) == 1
+
+
+def test_key_reused_for_a_different_payload_is_rejected(app, signup):
+    client, user_id = signup()
+    assert _post(client, 'reused').status_code == 201
+
+    response = _post(client, 'reused', {**EXPENSE, 'amount': '99.00'})
+
+    assert response.status_code == 422
+    assert _transaction_count(user_id) == 1
+
+
+def test_keys_are_scoped_to_their_user(app, signup):
+    (alice, alice_id), (bob, bob_id) = signup(), signup()
+    assert _post(alice, 'shared-key').status_code == 201
+
+    response = _post(bob, 'shared-key')
+
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert _transaction_count(alice_id) == _transaction_count(bob_id) == 1
+
+
+def _claim_pending(user_id, key, created_at):
+    now = datetime.utcnow()
+    db.session.add(IdempotencyKey(user_id=user_id, key=key, method='POST', path='/api/transactions',
+                                  request_hash=_fingerprint(), created_at=created_at, expires_at=now + PENDING_LEASE * 10))
+    db.session.commit()
+
+
+def test_request_still_in_flight_gets_409(app, signup):
+    client, user_id = signup()
+    _claim_pending(user_id, 'in-flight', datetime.utcnow())
+
+    response = _post(client, 'in-flight')
+
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert _transaction_count(user_id) == 0
+
+
+def test_abandoned_claim_is_taken_over_after_its_lease(app, signup):
+    client, user_id = signup()
+    _claim_pending(user_id, 'abandoned', datetime.utcnow() - PENDING_LEASE * 2)
+
+    response = _post(client, 'abandoned')
+
+    assert response.status_code == 201
+    assert _transaction_count(user_id) == 1
+    assert _post(client, 'abandoned').headers['Idempotent-Replayed'] == 'true'
+
+
+def test_validation_errors_are_replayed_too(app, signup):
+    client, user_id = signup()
+    invalid = {**EXPENSE, 'transaction_type': 'refund'}
+
+    first = _post(client, 'invalid', invalid)
+    retry = _post(client, 'invalid', invalid)
+
+    assert first.status_code == retry.status_code == 400
+    assert retry.headers['Idempotent-Replayed'] == 'true'
@@ -0,0 +1,100 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+from src.migrations import run_migrations
+
+# The tables as the first release created them, with money in REAL columns.
+FLOAT_SCHEMA = '''
+CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, email VARCHAR(120) NOT NULL UNIQUE,
+                   password_hash VARCHAR(255) NOT NULL, created_at DATETIME);
+CREATE TABLE category (id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL, description VARCHAR(200), created_at DATETIME);
+CREATE TABLE "transaction" (id INTEGER PRIMARY KEY, amount FLOAT NOT NULL, description VARCHAR(200),
+                            transaction_type VARCHAR(10) NOT NULL, date DATE NOT NULL, created_at DATETIME,
+                            user_id INTEGER NOT NULL REFERENCES user (id), category_id INTEGER REFERENCES category (id));
+CREATE TABLE budget (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES user (id),
+                     category_id INTEGER NOT NULL REFERENCES category (id), amount FLOAT NOT NULL,
+                     period VARCHAR(50) NOT NULL, budget_month DATE NOT NULL, created_at DATETIME, updated_at DATETIME);
+CREATE TABLE savings_goal (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES user (id),
+                           name VARCHAR(100) NOT NULL, target_amount FLOAT NOT NULL, current_amount FLOAT NOT NULL,
+                           target_date DATE, description VARCHAR(255), priority VARCHAR(50) NOT NULL,
+                           created_at DATETIME, updated_at DATETIME);
+CREATE TABLE recurring_transaction (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES user (id),
+                                    description VARCHAR(200) NOT NULL, amount FLOAT NOT NULL,
+                                    transaction_type VARCHAR(50) NOT NULL, category_id INTEGER REFERENCES category (id),
+                                    frequency VARCHAR(50) NOT NULL, interval INTEGER NOT NULL, start_date DATE NOT NULL,
+                                    end_date DATE, next_due_date DATE NOT NULL, is_active BOOLEAN NOT NULL,
+                                    created_at DATETIME, updated_at DATETIME);
+'''
+
+ROWS = '''
+INSERT INTO user (id, username, email, password_hash) VALUES (1, 'old', 'old@example.com', 'x');
+INSERT INTO category (id, name) VALUES (1, 'Food'), (7, 'Salary');
+INSERT INTO "transaction" (id, amount, description, transaction_type, date, user_id, category_id) VALUES
+    (1, 0.1 + 0.2, 'float sum', 'expense', '2024-03-02', 1, 1),
+    (2, 19.99, 'groceries', 'expense', '2024-03-15', 1, 1),
+    (3, 2500.75, 'salary', 'income', '2024-03-01', 1, 7),
+    (4, 4.5, 'last month', 'expense', '2024-02-28', 1, 1);
+INSERT INTO budget (id, user_id, category_id, amount, period, budget_month) VALUES (1, 1, 1, 300.1, 'monthly', '2024-03-01');
+INSERT INTO savings_goal (id, user_id, name, target_amount, current_amount, priority) VALUES (1, 1, 'Bike', 1234.56, 0.07, 'high');
+INSERT INTO recurring_transaction (id, user_id, description, amount, transaction_type, category_id, frequency, interval,
+                                   start_date, next_due_date, is_active) VALUES
+    (1, 1, 'rent', 999.999, 'expense', 1, 'monthly', 1, '2024-01-01', '2024-04-01', 1);
+'''
+
+
+@pytest.fixture
+def float_db(tmp_path):
+    path = tmp_path / 'old.db'
+    conn = sqlite3.connect(path)
+    conn.executescript(FLOAT_SCHEMA + ROWS)
+    conn.close()
+    engine = create_engine(f'sqlite:///{path}')
+    yield engine, path
+    engine.dispose()
+
+
+def _rows(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def _columns(path, table):
+    return [row[1] for row in _rows(path, f'PRAGMA table_info("{table}")')]
+
+
+def test_money_columns_become_rounded_minor_units(app, float_db):
+    engine, path = float_db
+    run_migrations(engine)
+
+    assert _rows(path, 'SELECT id, amount_minor, description FROM "transaction" ORDER BY id') == [
+        (1, 30, 'float sum'), (2, 1999, 'groceries'), (3, 250075, 'salary'), (4, 450, 'last month')]
+    assert _rows(path, 'SELECT target_amount_minor, current_amount_minor FROM savings_goal') == [(123456, 7)]
+    assert _rows(path, 'SELECT amount_minor FROM recurring_transaction') == [(100000,)]
+    assert _rows(path, 'SELECT amount_minor FROM budget') == [(30010,)]
+    for table in ('transaction', 'budget', 'savings_goal', 'recurring_transaction'):
+        assert not {'amount', 'target_amount', 'current_amount'} & set(_columns(path, table))
+    assert _rows(path, 'PRAGMA foreign_key_check') == []
+
+
+def test_budget_spending_is_counted_from_existing_expenses(app, float_db):
+    engine, path = float_db
+    run_migrations(engine)
+
+    # March's food expenses: 0.30 + 19.99; February's and the income are not counted.
+    assert _rows(path, 'SELECT spent_minor FROM budget') == [(2029,)]
+
+
+def test_migrations_are_idempotent(app, float_db):
+    engine, path = float_db
+    run_migrations(engine)
+    before = {table: _rows(path, f'SELECT * FROM "{table}" ORDER BY id')
+              for table in ('transaction', 'budget', 'savings_goal', 'recurring_transaction')}
+
+    run_migrations(engine)
+
+    assert {table: _rows(path, f'SELECT * FROM "{table}" ORDER BY id') for table in before} == before
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from src.extensions import db
+from src.models.purge_job import PurgeJob
+from src.models.transaction import Transaction
+from src.models.user import User
+from src.services import purge
+from src.services.purge import run_job, runnable_jobs, schedule_purge
+
+TRANSACTIONS = 12
+BATCH = 5
+
+
+class Crash(BaseException):
+    """Stands in for the runner's process dying: not an Exception, so the job is not marked failed."""
+
+
+def crash():
+    raise Crash()
+
+
+@pytest.fixture
+def user_with_data(app, signup):
+    client, user_id = signup()
+    response = client.post('/api/budgets', json={'category_id': 1, 'amount': '500', 'period': 'monthly',
+                                                 'budget_month_str': '2026-03'})
+    assert response.status_code == 201
+    response = client.post('/api/transactions/bulk', json=[
+        {'amount': '10', 'transaction_type': 'expense', 'category_id': 1, 'date': f'2026-03-{day:02d}'}
+        for day in range(1, TRANSACTIONS + 1)])
+    assert response.status_code == 201, response.get_json()
+    return user_id
+
+
+def _schedule(user_id, kind):
+    job_id = schedule_purge(user_id, kind).id
+    db.session.commit()
+    return job_id
+
+
+def _job(job_id):
+    db.session.expire_all()
+    return db.session.get(PurgeJob, job_id)
+
+
+def _expire_lease(job_id):
+    db.session.execute(update(PurgeJob).where(PurgeJob.id == job_id)
+                       .values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+
+def _pause_then(monkeypatch, action):
+    """Runs ``action`` at the first pause between chunks."""
+    def sleep(seconds):
+        monkeypatch.setattr(purge.time, 'sleep', lambda seconds: None)
+        action()
+    monkeypatch.setattr(purge.time, 'sleep', sleep)
+
+
+def _transaction_count(user_id):
+    return db.session.query(Transaction).filter_by(user_id=user_id).count()
+
+
+def test_crashed_run_resumes_after_its_lease_expires(user_with_data, monkeypatch):
+    user_id = user_with_data
+    job_id = _schedule(user_id, 'data')
+    _pause_then(monkeypatch, crash)
+
+    with pytest.raises(Crash):
+        run_job(job_id, batch_size=BATCH)
+    db.session.rollback()
+    assert _transaction_count(user_id) == TRANSACTIONS - BATCH
+    job = _job(job_id)
+    assert (job.status, job.step, job.to_dict()['tables']['transaction']) == ('running', 'transaction', BATCH)
+
+    # The lease is still live: nobody else may take the job yet.
+    assert job_id not in runnable_jobs()
+    assert run_job(job_id, batch_size=BATCH) is False
+
+    _expire_lease(job_id)
+    assert job_id in runnable_jobs()
+    assert run_job(job_id, batch_size=BATCH) is True
+
+    job = _job(job_id)
+    assert (job.status, job.lease_owner) == ('done', None)
+    assert _transaction_count(user_id) == 0
+    assert job.to_dict()['tables']['transaction'] == TRANSACTIONS  # no chunk counted twice
+    assert job.to_dict()['tables']['budget'] == 1
+    assert job.deleted == job.total
+    assert db.session.get(User, user_id) is not None  # a data purge keeps the account
+
+
+def test_runner_that_lost_its_lease_stops(user_with_data, monkeypatch):
+    user_id = user_with_data
+    job_id = _schedule(user_id, 'data')
+
+    def take_over():
+        # Another runner claims the job while this one pauses between chunks.
+        db.session.execute(update(PurgeJob).where(PurgeJob.id == job_id).values(lease_owner='other-runner'))
+        db.session.commit()
+    _pause_then(monkeypatch, take_over)
+
+    assert run_job(job_id, batch_size=BATCH) is False
+    job = _job(job_id)
+    assert (job.status, job.lease_owner, job.to_dict()['tables']['transaction']) == ('running', 'other-runner', BATCH)
+    assert _transaction_count(user_id) == TRANSACTIONS - BATCH  # the chunk it started after losing the lease rolled back
+
+    _expire_lease(job_id)
+    assert run_job(job_id, batch_size=BATCH) is True
+    assert _transaction_count(user_id) == 0
+    assert _job(job_id).deleted == _job(job_id).total
+
+
+def test_account_purge_removes_the_user_last(user_with_data, monkeypatch):
+    user_id = user_with_data
+    job_id = _schedule(user_id, 'account')
+    _pause_then(monkeypatch, crash)
+    with pytest.raises(Crash):
+        run_job(job_id, batch_size=BATCH)
+    db.session.rollback()
+    assert db.session.get(User, user_id) is not None
+
+    _expire_lease(job_id)
+    assert run_job(job_id, batch_size=BATCH) is True
+    db.session.expire_all()
+    assert db.session.get(User, user_id) is None
+    assert _transaction_count(user_id) == 0